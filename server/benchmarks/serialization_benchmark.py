@@ -0,0 +1,65 @@
+"""
+Compare the previous record-by-record JSON encoding of interaction data against
+the columnar fast path in src.utils.serialization.
+
+Run from the server directory with:
+    uv run python -m benchmarks.serialization_benchmark
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from src.utils.serialization import encode_json_object
+
+ROW_COUNTS = [100_000, 1_000_000]
+REPEATS = 3
+
+
+def make_interactions(n_rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(42)
+    return pd.DataFrame(
+        {
+            "interactionid": np.arange(n_rows, dtype=np.int32),
+            "uid": rng.integers(0, 50_000, n_rows, dtype=np.int32),
+            "iid": rng.integers(0, 20_000, n_rows, dtype=np.int32),
+            "ts": rng.integers(1_000_000_000, 1_700_000_000, n_rows, dtype=np.int64),
+        }
+    )
+
+
+def encode_records(df: pd.DataFrame) -> bytes:
+    content = {"shape": [50_000, 20_000], "training_data": df.to_dict(orient="records")}
+    return JSONResponse(content=jsonable_encoder(content)).body
+
+
+def encode_columnar(df: pd.DataFrame) -> bytes:
+    return encode_json_object({"shape": [50_000, 20_000]}, {"training_data": df})
+
+
+def best_time(encoder, df: pd.DataFrame) -> float:
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        encoder(df)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    print(f"{'rows':>10} {'records (s)':>12} {'columnar (s)':>13} {'speedup':>8}")
+    for n_rows in ROW_COUNTS:
+        df = make_interactions(n_rows)
+        records_time = best_time(encode_records, df)
+        columnar_time = best_time(encode_columnar, df)
+        print(
+            f"{n_rows:>10} {records_time:>12.3f} {columnar_time:>13.3f} "
+            f"{records_time / columnar_time:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
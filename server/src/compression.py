@@ -0,0 +1,186 @@
+import gzip
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+@dataclass(frozen=True)
+class CompressionRule:
+    # regular expression matched against the request path
+    path_pattern: str = r".*"
+    minimum_size: int = 1024
+    gzip_level: int = 6
+    brotli_quality: int = 4
+    zstd_level: int = 3
+
+
+# formats that are already compressed, or streamed, gain nothing from compression
+SKIPPED_MEDIA_TYPES = {
+    "application/gzip",
+    "application/vnd.apache.parquet",
+    "application/x-brotli",
+    "application/x-npz",
+    "application/zip",
+    "application/zstd",
+    "text/event-stream",
+}
+SKIPPED_MEDIA_TYPE_PREFIXES = ("image/", "video/", "audio/")
+
+# bodies larger than this are compressed in a worker thread to keep the event
+# loop free for other requests
+OFFLOAD_THRESHOLD = 64 * 1024
+
+
+def get_available_encodings() -> List[str]:
+    # in order of preference
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for entry in accept_encoding.split(","):
+        coding, _, params = entry.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+
+    for encoding in get_available_encodings():
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > 0:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: str, rule: CompressionRule) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=rule.zstd_level).compress(body)
+    if encoding == "br":
+        return brotli.compress(body, quality=rule.brotli_quality)
+    return gzip.compress(body, compresslevel=rule.gzip_level, mtime=0)
+
+
+def is_compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers:
+        return False
+    media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+    if media_type in SKIPPED_MEDIA_TYPES:
+        return False
+    return not media_type.startswith(SKIPPED_MEDIA_TYPE_PREFIXES)
+
+
+class CompressionMiddleware:
+    """
+    Compress complete response bodies with zstd, brotli or gzip depending on
+    what the client accepts and which encoders are installed. Thresholds and
+    levels are configured per route through CompressionRule, the first rule
+    whose pattern matches the path wins. Streamed responses pass through as is.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        rules: Sequence[CompressionRule] = (),
+        default_rule: Optional[CompressionRule] = CompressionRule(),
+        offload_threshold: int = OFFLOAD_THRESHOLD,
+    ):
+        self.app = app
+        self.rules = [(re.compile(rule.path_pattern), rule) for rule in rules]
+        self.default_rule = default_rule
+        self.offload_threshold = offload_threshold
+
+    def get_rule(self, path: str) -> Optional[CompressionRule]:
+        for pattern, rule in self.rules:
+            if pattern.fullmatch(path):
+                return rule
+        return self.default_rule
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        rule = self.get_rule(scope["path"])
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        if rule is None or encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = CompressionResponder(send, encoding, rule, self.offload_threshold)
+        await self.app(scope, receive, responder.send)
+
+
+class CompressionResponder:
+    def __init__(
+        self, send: Send, encoding: str, rule: CompressionRule, offload_threshold: int
+    ):
+        self._send = send
+        self.encoding = encoding
+        self.rule = rule
+        self.offload_threshold = offload_threshold
+        self.start_message: Optional[Message] = None
+        self.passthrough = False
+
+    async def send(self, message: Message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        headers = Headers(raw=self.start_message["headers"])
+        if (
+            message.get("more_body", False)
+            or len(body) < self.rule.minimum_size
+            or not is_compressible(headers)
+        ):
+            self.passthrough = True
+            await self._send(self.start_message)
+            await self._send(message)
+            return
+
+        if len(body) >= self.offload_threshold:
+            compressed = await anyio.to_thread.run_sync(
+                compress, body, self.encoding, self.rule
+            )
+        else:
+            compressed = compress(body, self.encoding, self.rule)
+
+        mutable_headers = MutableHeaders(raw=self.start_message["headers"])
+        mutable_headers["Content-Encoding"] = self.encoding
+        mutable_headers["Content-Length"] = str(len(compressed))
+        mutable_headers.add_vary_header("Accept-Encoding")
+        # a strong validator cannot be shared between content codings
+        etag = mutable_headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            mutable_headers["ETag"] = "W/" + etag
+        await self._send(self.start_message)
+        await self._send({"type": "http.response.body", "body": compressed})
@@ -1,4 +1,4 @@
-# stores k:v pair of UUID: EvaluatorStreamer
+# stores k:v pair of stream UUID: PinnedStream for streams with open sessions
 evaluator_stream_object_map = {}
 
 USE_SUPABASE = True
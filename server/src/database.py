@@ -1,6 +1,8 @@
 import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
 
-from sqlalchemy import Engine
+from sqlalchemy import JSON, Column, Engine, Index, text
 from sqlmodel import Field, SQLModel, create_engine
 
 from src.constants import USE_SUPABASE
@@ -10,10 +12,86 @@ from src.supabase_client.client import get_supabase_client
 
 class EvaluatorStreamModel(SQLModel, table=True):
     __tablename__ = "streams"
+    # ownership checks and listings are answered from the indexes alone
+    __table_args__ = (
+        Index("ix_streams_stream_id_user_id", "stream_id", "user_id"),
+        Index("ix_streams_user_id_created_at", "user_id", "created_at", "stream_id"),
+    )
     stream_id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     stream_object: bytes
     dataset_id: str
-    user_id: uuid.UUID
+    user_id: uuid.UUID = Field(index=True)
+    # bumped on every update, used to derive ETags without loading the stream
+    version: int = Field(default=0)
+    # window the stream is in, lets requests check predictions without loading it
+    current_window: int = Field(default=0)
+    # kept up to date on every update so listings do not load the stream, None
+    # until rows created before the column was added are backfilled
+    status: Optional[str] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    # settings fixed at creation, served without loading the stream, None for
+    # rows created before the column was added until they are read once
+    settings: Optional[Dict[str, Any]] = Field(default=None, sa_column=Column(JSON))
+    # set while a worker keeps the stream in memory under a lease, the stored
+    # stream object is then behind by the operations in stream_operations
+    lease_id: Optional[uuid.UUID] = None
+    lease_owner: Optional[str] = None
+    lease_expires_at: Optional[datetime] = None
+
+    # Needed for Column(JSON)
+    class Config:
+        arbitrary_types_allowed = True
+
+
+class StreamOperationModel(SQLModel, table=True):
+    __tablename__ = "stream_operations"
+    operation_id: Optional[int] = Field(default=None, primary_key=True)
+    stream_id: uuid.UUID = Field(foreign_key="streams.stream_id", index=True)
+    lease_id: uuid.UUID
+    # streamer method and its pickled (args, kwargs), replayed in operation order
+    method: str
+    arguments: bytes
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class PredictionSubmissionModel(SQLModel, table=True):
+    __tablename__ = "prediction_submissions"
+    submission_id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    stream_id: uuid.UUID = Field(foreign_key="streams.stream_id", index=True)
+    algorithm_id: uuid.UUID
+    # pickled prediction, cleared once the submission has been evaluated
+    prediction: bytes
+    status: str = Field(default="PENDING", index=True)
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    # set when a worker claims the submission to evaluate it
+    claimed_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+
+
+class IdempotencyRecordModel(SQLModel, table=True):
+    __tablename__ = "idempotency_records"
+    idempotency_key: str = Field(primary_key=True)
+    method: str
+    path: str
+    # sha256 of the request body, a key may not be reused for a different request
+    request_hash: str
+    # null while the first request with this key is still being processed
+    status_code: Optional[int] = None
+    response_headers: Optional[List[List[str]]] = Field(
+        default=None, sa_column=Column(JSON)
+    )
+    response_body: Optional[bytes] = None
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc), index=True
+    )
+    # when the request holding the key started, a claim that never got a
+    # response is taken over by a retry once it is old enough
+    claimed_at: Optional[datetime] = None
+
+    # Needed for Column(JSON)
+    class Config:
+        arbitrary_types_allowed = True
 
 
 # SQL Connection
@@ -25,6 +103,34 @@ connection_string = (
 )
 
 
+# create_all does not alter tables that already exist, so columns added to the
+# models after the table was first created are added here
+SCHEMA_UPDATES = [
+    "ALTER TABLE streams ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 0",
+    "ALTER TABLE streams ADD COLUMN IF NOT EXISTS current_window INTEGER NOT NULL DEFAULT 0",
+    "ALTER TABLE streams ADD COLUMN IF NOT EXISTS lease_id UUID",
+    "ALTER TABLE streams ADD COLUMN IF NOT EXISTS lease_owner VARCHAR",
+    "ALTER TABLE streams ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMP",
+    "CREATE INDEX IF NOT EXISTS ix_streams_user_id ON streams (user_id)",
+    "CREATE INDEX IF NOT EXISTS ix_streams_stream_id_user_id "
+    "ON streams (stream_id, user_id)",
+    "ALTER TABLE streams ADD COLUMN IF NOT EXISTS status VARCHAR",
+    "ALTER TABLE streams ADD COLUMN IF NOT EXISTS created_at TIMESTAMP NOT NULL "
+    "DEFAULT now()",
+    "CREATE INDEX IF NOT EXISTS ix_streams_user_id_created_at "
+    "ON streams (user_id, created_at, stream_id)",
+    "ALTER TABLE streams ADD COLUMN IF NOT EXISTS settings JSON",
+    "ALTER TABLE idempotency_records ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP",
+    "ALTER TABLE prediction_submissions ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP",
+]
+
+
+def apply_schema_updates(engine: Engine):
+    with engine.begin() as connection:
+        for statement in SCHEMA_UPDATES:
+            connection.execute(text(statement))
+
+
 def get_sql_connection() -> Engine:
     global _engine
     if _engine is None:
@@ -33,6 +139,7 @@ def get_sql_connection() -> Engine:
         _engine = create_engine(connection_string)
         print("Engine created with connection string: ", connection_string)
         SQLModel.metadata.create_all(_engine)
+        apply_schema_updates(_engine)
         print("Tables created")
     return _engine
 
@@ -3,6 +3,27 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 
 from src.supabase_client.client import init_supabase_client
+from src.utils.db_utils import (
+    delete_expired_idempotency_records,
+    recover_expired_stream_leases,
+)
+from src.utils.lease_manager import (
+    start_stream_lease_sweeper,
+    stop_stream_lease_sweeper,
+)
+from src.utils.state_events import (
+    start_state_event_listener,
+    stop_state_event_listener,
+)
+from src.utils.status_backfill import (
+    start_stream_status_backfill,
+    stop_stream_status_backfill,
+)
+from src.utils.submission_executor import shutdown_submission_executor
+from src.utils.submission_worker import (
+    resume_pending_submissions,
+    shutdown_drain_executor,
+)
 
 
 @asynccontextmanager
@@ -10,6 +31,26 @@ async def lifespan(app: FastAPI):
     try:
         print("Starting lifespan events")
         init_supabase_client()
+        try:
+            resume_pending_submissions()
+        except Exception as e:
+            print("Error resuming pending prediction submissions: ", str(e))
+        try:
+            delete_expired_idempotency_records()
+        except Exception as e:
+            print("Error deleting expired idempotency records: ", str(e))
+        try:
+            recover_expired_stream_leases()
+        except Exception as e:
+            print("Error recovering expired stream leases: ", str(e))
+        start_state_event_listener()
+        start_stream_lease_sweeper()
+        start_stream_status_backfill()
         yield
     finally:
         print("Shutting down lifespan events")
+        stop_stream_status_backfill()
+        stop_stream_lease_sweeper()
+        stop_state_event_listener()
+        shutdown_submission_executor()
+        shutdown_drain_executor()
@@ -0,0 +1,221 @@
+import hashlib
+import re
+from typing import List, Optional
+
+import anyio
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.utils.db_utils import (
+    DatabaseErrorException,
+    claim_idempotency_key,
+    release_idempotency_key,
+    save_idempotency_response,
+)
+
+IDEMPOTENCY_KEY_HEADER = "idempotency-key"
+IDEMPOTENT_REPLAYED_HEADER = "idempotent-replayed"
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+MUTATING_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+# transient rejections that a retry with the same key should get past
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429}
+
+
+def get_request_hash(scope: Scope, body: bytes) -> str:
+    digest = hashlib.sha256()
+    digest.update(scope["method"].encode("latin-1"))
+    digest.update(b"\0" + scope["path"].encode("utf-8"))
+    digest.update(b"\0" + scope.get("query_string", b""))
+    digest.update(b"\0" + body)
+    return digest.hexdigest()
+
+
+def get_scoped_idempotency_key(scope: Scope, idempotency_key: str) -> str:
+    """
+    Scope a key to the credentials of the caller, so callers that pick the same
+    key never see each other's responses. The header is used rather than the
+    user it names, which is only known once an endpoint has authenticated it
+    """
+    authorization = Headers(scope=scope).get("authorization", "")
+    principal = hashlib.sha256(authorization.encode("latin-1")).hexdigest()
+    return f"{principal}:{idempotency_key}"
+
+
+async def read_body(receive: Receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+class IdempotencyMiddleware:
+    """
+    Replay the stored response of a mutating request when it is retried with
+    the same Idempotency-Key header, without running the endpoint again.
+    Server errors and transient rejections such as 429 are not stored so the
+    request can be retried.
+    Keys are scoped to the Authorization header of the caller. Reusing a key
+    for a different request is rejected with 422, and a retry that arrives
+    while the first request is still running gets 409
+    """
+
+    def __init__(self, app: ASGIApp, excluded_path_pattern: Optional[str] = None):
+        self.app = app
+        self.excluded_path_pattern = (
+            re.compile(excluded_path_pattern) if excluded_path_pattern else None
+        )
+
+    def is_idempotent_request(self, scope: Scope) -> bool:
+        if scope["type"] != "http" or scope["method"] not in MUTATING_METHODS:
+            return False
+        if self.excluded_path_pattern and self.excluded_path_pattern.fullmatch(
+            scope["path"]
+        ):
+            return False
+        return True
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if not self.is_idempotent_request(scope):
+            await self.app(scope, receive, send)
+            return
+        idempotency_key = Headers(scope=scope).get(IDEMPOTENCY_KEY_HEADER)
+        if idempotency_key is None:
+            await self.app(scope, receive, send)
+            return
+        if not idempotency_key or len(idempotency_key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+            response = JSONResponse(
+                {
+                    "detail": "Idempotency-Key must be between 1 and "
+                    f"{MAX_IDEMPOTENCY_KEY_LENGTH} characters"
+                },
+                status_code=400,
+            )
+            await response(scope, receive, send)
+            return
+
+        idempotency_key = get_scoped_idempotency_key(scope, idempotency_key)
+        body = await read_body(receive)
+        request_hash = get_request_hash(scope, body)
+        try:
+            record = await anyio.to_thread.run_sync(
+                claim_idempotency_key,
+                idempotency_key,
+                scope["method"],
+                scope["path"],
+                request_hash,
+            )
+        except DatabaseErrorException as e:
+            response = JSONResponse({"detail": e.message}, status_code=e.status_code)
+            await response(scope, receive, send)
+            return
+
+        if record is not None:
+            await self.replay(record, request_hash, scope, receive, send)
+            return
+
+        recorder = ResponseRecorder(send)
+        body_sent = False
+
+        async def receive_body() -> Message:
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        try:
+            await self.app(scope, receive_body, recorder.send)
+        except BaseException:
+            await self.release(idempotency_key)
+            raise
+
+        if (
+            recorder.is_complete
+            and recorder.status_code < 500
+            and recorder.status_code not in RETRYABLE_STATUS_CODES
+        ):
+            try:
+                await anyio.to_thread.run_sync(
+                    save_idempotency_response,
+                    idempotency_key,
+                    recorder.status_code,
+                    recorder.headers,
+                    recorder.body,
+                )
+            except DatabaseErrorException as e:
+                print(
+                    f"Error saving response of Idempotency-Key {idempotency_key}: ", e
+                )
+                await self.release(idempotency_key)
+        else:
+            await self.release(idempotency_key)
+
+    async def replay(
+        self, record, request_hash: str, scope: Scope, receive: Receive, send: Send
+    ):
+        if record.request_hash != request_hash:
+            response = JSONResponse(
+                {"detail": "Idempotency-Key was already used for a different request"},
+                status_code=422,
+            )
+            await response(scope, receive, send)
+            return
+        if record.status_code is None:
+            response = JSONResponse(
+                {"detail": "A request with this Idempotency-Key is still in progress"},
+                status_code=409,
+            )
+            await response(scope, receive, send)
+            return
+
+        headers = [
+            (name.encode("latin-1"), value.encode("latin-1"))
+            for name, value in record.response_headers or []
+        ]
+        headers.append((IDEMPOTENT_REPLAYED_HEADER.encode("latin-1"), b"true"))
+        await send(
+            {
+                "type": "http.response.start",
+                "status": record.status_code,
+                "headers": headers,
+            }
+        )
+        await send({"type": "http.response.body", "body": record.response_body or b""})
+
+    async def release(self, idempotency_key: str):
+        try:
+            await anyio.to_thread.run_sync(release_idempotency_key, idempotency_key)
+        except DatabaseErrorException as e:
+            print(f"Error releasing Idempotency-Key {idempotency_key}: ", e)
+
+
+class ResponseRecorder:
+    def __init__(self, send: Send):
+        self._send = send
+        self.status_code: Optional[int] = None
+        self.headers: List[List[str]] = []
+        self.chunks: List[bytes] = []
+        self.is_complete = False
+
+    @property
+    def body(self) -> bytes:
+        return b"".join(self.chunks)
+
+    async def send(self, message: Message):
+        if message["type"] == "http.response.start":
+            self.status_code = message["status"]
+            self.headers = [
+                [name.decode("latin-1"), value.decode("latin-1")]
+                for name, value in message.get("headers", [])
+            ]
+        elif message["type"] == "http.response.body":
+            self.chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                self.is_complete = True
+        await self._send(message)
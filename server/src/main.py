@@ -1,15 +1,20 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
+from src.compression import CompressionMiddleware, CompressionRule
 from src.events import lifespan
+from src.idempotency import IdempotencyMiddleware
 from src.routers import (
     algorithm_management,
     authentication,
     data_handling,
+    evaluation_sessions,
     metrics,
     predictions,
     stream_management,
 )
+from src.utils.submission_executor import SubmissionQueueFullException
 
 app = FastAPI(lifespan=lifespan)
 
@@ -22,6 +27,9 @@ origins = [
     "https://streamsight-ui.vercel.app",
 ]
 
+# added first so it sits inside CORS and compression and stores plain responses
+app.add_middleware(IdempotencyMiddleware, excluded_path_pattern=r"/authentication/.*")
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -30,6 +38,40 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(
+    CompressionMiddleware,
+    rules=[
+        # interaction data is large and highly repetitive, favour ratio
+        CompressionRule(
+            path_pattern=r"/streams/[^/]+/algorithms/[^/]+/(training|unlabeled)-data",
+            minimum_size=4096,
+            gzip_level=6,
+            brotli_quality=5,
+            zstd_level=6,
+        ),
+        CompressionRule(
+            path_pattern=r"/streams/[^/]+/metrics",
+            minimum_size=2048,
+            gzip_level=5,
+            brotli_quality=4,
+            zstd_level=3,
+        ),
+    ],
+    default_rule=CompressionRule(minimum_size=1024, gzip_level=5),
+)
+
+
+@app.exception_handler(SubmissionQueueFullException)
+async def submission_queue_full_handler(
+    request: Request, e: SubmissionQueueFullException
+):
+    # endpoints let this through so every submission route answers the same way
+    return JSONResponse(
+        status_code=e.status_code,
+        content={"detail": e.message},
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
 
 @app.get("/", tags=["Healthcheck"])
 def healthcheck():
@@ -40,5 +82,6 @@ app.include_router(stream_management.router)
 app.include_router(algorithm_management.router)
 app.include_router(data_handling.router)
 app.include_router(predictions.router)
+app.include_router(evaluation_sessions.router)
 app.include_router(metrics.router)
 app.include_router(authentication.router)
@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from typing import List
+
+from pydantic import BaseModel, Field
 from streamsightv2.registries import AlgorithmStateEnum
 
 
@@ -10,6 +12,15 @@ class RegisterAlgorithmResponse(BaseModel):
     algorithm_uuid: str
 
 
+class BulkAlgorithmRegistrationRequest(BaseModel):
+    algorithm_names: List[str] = Field(..., min_length=1)
+
+
+class BulkRegisterAlgorithmResponse(BaseModel):
+    # in the order of the requested names
+    algorithm_uuids: List[str]
+
+
 class GetAlgorithmStateResponse(BaseModel):
     algorithm_state: AlgorithmStateEnum
 
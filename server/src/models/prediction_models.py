@@ -0,0 +1,38 @@
+from datetime import datetime
+from enum import Enum
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class SubmissionStatusEnum(str, Enum):
+    PENDING = "PENDING"
+    RUNNING = "RUNNING"
+    COMPLETED = "COMPLETED"
+    FAILED = "FAILED"
+
+
+class PredictionSubmissionStatus(BaseModel):
+    submission_id: str
+    stream_id: str
+    algorithm_id: str
+    status: SubmissionStatusEnum
+    error: Optional[str] = None
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+
+
+class PredictionUploadRequest(BaseModel):
+    shape: List[int] = Field(..., min_length=2, max_length=2)
+    nnz: int
+    data_dtype: str = "float64"
+    index_dtype: str = "int32"
+
+
+class PredictionUploadStatus(BaseModel):
+    upload_id: str
+    shape: List[int]
+    nnz: int
+    missing_rows: int
+    # half-open [start, end) row ranges that still have to be uploaded
+    missing_ranges: List[List[int]]
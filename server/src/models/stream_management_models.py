@@ -1,7 +1,10 @@
+from datetime import datetime
 from enum import Enum
 from typing import List
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+from src.settings import STREAM_STATUSES_MAX_IDS
 
 
 class Metric(str, Enum):
@@ -32,6 +35,10 @@ class StreamStatus(BaseModel):
     status: StreamStatusEnum
 
 
+class StreamStatusesRequest(BaseModel):
+    stream_ids: List[str] = Field(..., min_length=1, max_length=STREAM_STATUSES_MAX_IDS)
+
+
 class CreateStreamResponse(BaseModel):
     evaluator_stream_id: str
 
@@ -49,3 +56,12 @@ class StreamSettings(BaseModel):
 
 class StartStreamResponse(BaseModel):
     status: bool
+
+
+class StreamLeaseResponse(BaseModel):
+    lease_id: str
+    expires_at: datetime
+
+
+class ReleaseStreamLeaseResponse(BaseModel):
+    status: bool
@@ -1,17 +1,40 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+import json
+import uuid
+from typing import Annotated, AsyncIterator, Dict, Optional
+
+from fastapi import APIRouter, Header, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 
 from src.models.algorithm_management_models import (
     AlgorithmRegistrationRequest,
+    BulkAlgorithmRegistrationRequest,
+    BulkRegisterAlgorithmResponse,
     GetAlgorithmStateResponse,
     GetAllAlgorithmStateResponse,
     RegisterAlgorithmResponse,
 )
+from src.settings import STATE_EVENTS_KEEPALIVE_SECONDS
 from src.utils.db_utils import (
     DatabaseErrorException,
     GetEvaluatorStreamErrorException,
     get_stream_from_db,
+    get_stream_version,
     update_stream,
 )
+from src.utils.etag_utils import (
+    get_stream_etag,
+    is_etag_match,
+    not_modified_response,
+)
+from src.utils.state_events import (
+    AlgorithmStatesEvent,
+    get_algorithm_states,
+    subscribe,
+    unsubscribe,
+)
+from src.utils.stream_actor import run_stream_operation
 from src.utils.string_utils import split_string_by_last_underscore
 from src.utils.uuid_utils import (
     InvalidUUIDException,
@@ -28,11 +51,14 @@ def register_algorithm(
 ) -> RegisterAlgorithmResponse:
     try:
         uuid_obj = get_stream_uuid_object(stream_id)
-        evaluator_streamer = get_stream_from_db(uuid_obj)
-        algorithm_uuid = evaluator_streamer.register_algorithm(
-            algorithm_name=request.algorithm_name
+        algorithm_uuid, _ = run_stream_operation(
+            uuid_obj,
+            lambda evaluator_streamer: evaluator_streamer.register_algorithm(
+                algorithm_name=request.algorithm_name
+            ),
+            get_stream_from_db,
+            update_stream,
         )
-        update_stream(uuid_obj, evaluator_streamer)
     except (
         InvalidUUIDException,
         GetEvaluatorStreamErrorException,
@@ -47,12 +73,56 @@ def register_algorithm(
     return {"algorithm_uuid": str(algorithm_uuid)}
 
 
+@router.post("/streams/{stream_id}/algorithms/bulk")
+def register_algorithms(
+    stream_id: str, request: BulkAlgorithmRegistrationRequest
+) -> BulkRegisterAlgorithmResponse:
+    """
+    Register several algorithms in one load and persist of the stream. Nothing
+    is registered if any of them fails
+    """
+    try:
+        uuid_obj = get_stream_uuid_object(stream_id)
+        algorithm_uuids, _ = run_stream_operation(
+            uuid_obj,
+            lambda evaluator_streamer: [
+                evaluator_streamer.register_algorithm(algorithm_name=algorithm_name)
+                for algorithm_name in request.algorithm_names
+            ],
+            get_stream_from_db,
+            update_stream,
+        )
+    except (
+        InvalidUUIDException,
+        GetEvaluatorStreamErrorException,
+        DatabaseErrorException,
+    ) as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail="Error registering algorithms: " + str(e)
+        )
+
+    return {
+        "algorithm_uuids": [str(algorithm_uuid) for algorithm_uuid in algorithm_uuids]
+    }
+
+
 @router.get("/streams/{stream_id}/algorithms/{algorithm_id}/state")
-def get_algorithm_state(stream_id: str, algorithm_id: str) -> GetAlgorithmStateResponse:
+def get_algorithm_state(
+    stream_id: str,
+    algorithm_id: str,
+    response: Response,
+    if_none_match: Annotated[Optional[str], Header()] = None,
+) -> GetAlgorithmStateResponse:
     try:
         evaluator_streamer_uuid = get_stream_uuid_object(stream_id)
         algorithm_uuid = get_algo_uuid_object(algorithm_id)
-        evaluator_streamer = get_stream_from_db(evaluator_streamer_uuid)
+        version = get_stream_version(evaluator_streamer_uuid)
+        etag = get_stream_etag(evaluator_streamer_uuid, version)
+        if is_etag_match(if_none_match, etag):
+            return not_modified_response(etag)
+        evaluator_streamer = get_stream_from_db(evaluator_streamer_uuid, version)
         algorithm_state = evaluator_streamer.get_algorithm_state(algorithm_uuid).name
     except (InvalidUUIDException, GetEvaluatorStreamErrorException) as e:
         raise HTTPException(status_code=e.status_code, detail=e.message)
@@ -61,14 +131,23 @@ def get_algorithm_state(stream_id: str, algorithm_id: str) -> GetAlgorithmStateR
             status_code=500, detail="Error getting algorithm state: " + str(e)
         )
 
+    response.headers["ETag"] = etag
     return {"algorithm_state": algorithm_state}
 
 
 @router.get("/streams/{stream_id}/algorithms/state")
-def get_all_algorithm_state(stream_id: str) -> GetAllAlgorithmStateResponse:
+def get_all_algorithm_state(
+    stream_id: str,
+    response: Response,
+    if_none_match: Annotated[Optional[str], Header()] = None,
+) -> GetAllAlgorithmStateResponse:
     try:
         evaluator_streamer_uuid = get_stream_uuid_object(stream_id)
-        evaluator_streamer = get_stream_from_db(evaluator_streamer_uuid)
+        version = get_stream_version(evaluator_streamer_uuid)
+        etag = get_stream_etag(evaluator_streamer_uuid, version)
+        if is_etag_match(if_none_match, etag):
+            return not_modified_response(etag)
+        evaluator_streamer = get_stream_from_db(evaluator_streamer_uuid, version)
         algorithm_states = [
             {
                 "algorithm_uuid": split_string_by_last_underscore(key)[1],
@@ -84,16 +163,111 @@ def get_all_algorithm_state(stream_id: str) -> GetAllAlgorithmStateResponse:
             status_code=500, detail=f"Error getting all algorithm states: {str(e)}"
         )
 
+    response.headers["ETag"] = etag
     return {"algorithm_states": algorithm_states}
 
 
+def format_state_event(key: str, state: str) -> str:
+    algorithm_name, algorithm_uuid = split_string_by_last_underscore(key)
+    data = json.dumps(
+        {
+            "algorithm_uuid": algorithm_uuid,
+            "algorithm_name": algorithm_name,
+            "state": state,
+        }
+    )
+    return f"event: state\ndata: {data}\n\n"
+
+
+def is_streaming_completed(algorithm_states: Dict[str, str]) -> bool:
+    return bool(algorithm_states) and all(
+        state == "COMPLETED" for state in algorithm_states.values()
+    )
+
+
+async def stream_algorithm_state_events(
+    evaluator_streamer_uuid: uuid.UUID,
+    queue: "asyncio.Queue[AlgorithmStatesEvent]",
+    version: int,
+    algorithm_states: Dict[str, str],
+) -> AsyncIterator[str]:
+    try:
+        for key, state in algorithm_states.items():
+            yield format_state_event(key, state)
+        while not is_streaming_completed(algorithm_states):
+            try:
+                event = await asyncio.wait_for(
+                    queue.get(), timeout=STATE_EVENTS_KEEPALIVE_SECONDS
+                )
+            except asyncio.TimeoutError:
+                # keeps proxies from closing an idle connection
+                yield ": keepalive\n\n"
+                continue
+            if event.version <= version:
+                continue
+            for key, state in event.states.items():
+                if algorithm_states.get(key) != state:
+                    yield format_state_event(key, state)
+            version, algorithm_states = event.version, event.states
+    finally:
+        unsubscribe(evaluator_streamer_uuid, queue)
+
+
+@router.get("/streams/{stream_id}/algorithms/state/events")
+async def get_algorithm_state_events(stream_id: str):
+    """
+    Server-Sent Events of the algorithm states of a stream. The current state
+    of every algorithm is sent first, then each change as it is persisted. The
+    stream ends once every algorithm is COMPLETED
+    """
+    try:
+        evaluator_streamer_uuid = get_stream_uuid_object(stream_id)
+        # subscribe before reading the states so no change is missed in between
+        queue = subscribe(evaluator_streamer_uuid)
+        try:
+            version = await run_in_threadpool(
+                get_stream_version, evaluator_streamer_uuid
+            )
+            evaluator_streamer = await run_in_threadpool(
+                get_stream_from_db, evaluator_streamer_uuid
+            )
+            algorithm_states = get_algorithm_states(evaluator_streamer)
+        except BaseException:
+            unsubscribe(evaluator_streamer_uuid, queue)
+            raise
+    except (InvalidUUIDException, GetEvaluatorStreamErrorException) as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error getting algorithm state events: {str(e)}"
+        )
+
+    return StreamingResponse(
+        stream_algorithm_state_events(
+            evaluator_streamer_uuid, queue, version, algorithm_states
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/streams/{stream_id}/algorithms/{algorithm_id}/is-completed")
-def is_algorithm_streaming_completed(stream_id: str, algorithm_id: str) -> bool:
+def is_algorithm_streaming_completed(
+    stream_id: str,
+    algorithm_id: str,
+    response: Response,
+    if_none_match: Annotated[Optional[str], Header()] = None,
+) -> bool:
     try:
         evaluator_streamer_uuid = get_stream_uuid_object(stream_id)
         algorithm_uuid = get_algo_uuid_object(algorithm_id)
-        evaluator_streamer = get_stream_from_db(evaluator_streamer_uuid)
+        version = get_stream_version(evaluator_streamer_uuid)
+        etag = get_stream_etag(evaluator_streamer_uuid, version)
+        if is_etag_match(if_none_match, etag):
+            return not_modified_response(etag)
+        evaluator_streamer = get_stream_from_db(evaluator_streamer_uuid, version)
         algorithm_state = evaluator_streamer.get_algorithm_state(algorithm_uuid).name
+        response.headers["ETag"] = etag
         return algorithm_state == "COMPLETED"
     except (InvalidUUIDException, GetEvaluatorStreamErrorException) as e:
         raise HTTPException(status_code=e.status_code, detail=e.message)
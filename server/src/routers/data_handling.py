@@ -1,11 +1,34 @@
-from fastapi import APIRouter, HTTPException, Query
+import uuid
+from typing import Annotated, Dict, Optional
 
+from fastapi import APIRouter, Header, HTTPException, Query
+from streamsightv2.evaluators.evaluator_stream import EvaluatorStreamer
+from streamsightv2.matrix import InteractionMatrix
+
+from src.utils.dataframe_utils import (
+    InvalidColumnsException,
+    project_interaction_columns,
+    resolve_columns,
+)
 from src.utils.db_utils import (
     DatabaseErrorException,
     GetEvaluatorStreamErrorException,
     get_stream_from_db,
+    get_stream_version,
     update_stream,
 )
+from src.utils.etag_utils import (
+    get_stream_etag,
+    is_etag_match,
+    not_modified_response,
+)
+from src.utils.payload_cache import (
+    PayloadCacheKey,
+    get_cached_payload,
+    set_cached_payload,
+)
+from src.utils.serialization import encode_json_object, json_bytes_response
+from src.utils.stream_actor import run_stream_operation
 from src.utils.uuid_utils import (
     InvalidUUIDException,
     get_algo_uuid_object,
@@ -14,6 +37,72 @@ from src.utils.uuid_utils import (
 
 router = APIRouter(tags=["Data Handling"])
 
+COLUMNS_QUERY_DESCRIPTION = (
+    "Comma separated list of columns to return, takes precedence over "
+    "includeAdditionalFeatures"
+)
+
+
+def get_encoded_data_payload(
+    stream_id: uuid.UUID,
+    window: int,
+    data_key: str,
+    interaction_matrix: InteractionMatrix,
+    columns: Optional[str],
+    include_additional_features: bool,
+) -> bytes:
+    shape = interaction_matrix.shape
+    selected_columns = resolve_columns(
+        list(interaction_matrix._df.columns), columns, include_additional_features
+    )
+    cache_key = PayloadCacheKey(
+        stream_id, window, data_key, "json", tuple(selected_columns)
+    )
+    payload = get_cached_payload(cache_key)
+    if payload is not None:
+        return payload
+
+    # project straight from the underlying frame instead of deep copying it
+    df = project_interaction_columns(interaction_matrix._df, selected_columns)
+    payload = encode_json_object(
+        {"shape": [int(dimension) for dimension in shape]}, {data_key: df}
+    )
+    set_cached_payload(cache_key, payload)
+    return payload
+
+
+def get_window_payloads(
+    stream_id: uuid.UUID,
+    evaluator_streamer: EvaluatorStreamer,
+    algorithm_id: uuid.UUID,
+    columns: Optional[str],
+    include_additional_features: bool,
+) -> Dict[str, bytes]:
+    """
+    Release the training and unlabeled data of the current window to an
+    algorithm, encoded as the training-data and unlabeled-data endpoints do
+    """
+    training_data = evaluator_streamer.get_data(algorithm_id)
+    unlabeled_data = evaluator_streamer.get_unlabeled_data(algorithm_id)
+    return {
+        "training": get_encoded_data_payload(
+            stream_id,
+            evaluator_streamer._run_step,
+            "training_data",
+            training_data,
+            columns,
+            include_additional_features,
+        ),
+        "unlabeled": get_encoded_data_payload(
+            stream_id,
+            evaluator_streamer._run_step,
+            "unlabeled_data",
+            unlabeled_data,
+            columns,
+            include_additional_features,
+        ),
+    }
+
 
 @router.get("/streams/{stream_id}/algorithms/{algorithm_id}/training-data")
 def get_training_data(
@@ -22,23 +111,40 @@ def get_training_data(
     includeAdditionalFeatures: bool = Query(
         False, description="Include additional features in the training data"
     ),
+    columns: Optional[str] = Query(None, description=COLUMNS_QUERY_DESCRIPTION),
+    if_none_match: Annotated[Optional[str], Header()] = None,
 ):
     try:
         evaluator_streamer_uuid = get_stream_uuid_object(stream_id)
         algorithm_uuid = get_algo_uuid_object(algorithm_id)
-        evaluator_streamer = get_stream_from_db(evaluator_streamer_uuid)
-        interaction_matrix = evaluator_streamer.get_data(algorithm_uuid)
-        shape = interaction_matrix.shape
-        df = interaction_matrix.copy_df()
-        main_columns = ["interactionid", "uid", "iid", "ts"]
-        if includeAdditionalFeatures:
-            df_json = df.to_dict(orient="records")
-        else:
-            # only include the main columns if user does not want additional features
-            df_json = df[main_columns].to_dict(orient="records")
-        update_stream(evaluator_streamer_uuid, evaluator_streamer)
+        # nothing has changed on the stream since the client last fetched this data
+        etag = get_stream_etag(
+            evaluator_streamer_uuid, get_stream_version(evaluator_streamer_uuid)
+        )
+        if is_etag_match(if_none_match, etag):
+            return not_modified_response(etag)
+
+        # encoded inside the operation so unknown columns leave the stream as is
+        def fetch_training_data(evaluator_streamer: EvaluatorStreamer) -> bytes:
+            interaction_matrix = evaluator_streamer.get_data(algorithm_uuid)
+            return get_encoded_data_payload(
+                evaluator_streamer_uuid,
+                evaluator_streamer._run_step,
+                "training_data",
+                interaction_matrix,
+                columns,
+                includeAdditionalFeatures,
+            )
+
+        payload, version = run_stream_operation(
+            evaluator_streamer_uuid,
+            fetch_training_data,
+            get_stream_from_db,
+            update_stream,
+        )
     except (
         InvalidUUIDException,
+        InvalidColumnsException,
         GetEvaluatorStreamErrorException,
         DatabaseErrorException,
     ) as e:
@@ -48,7 +154,9 @@ def get_training_data(
             status_code=500, detail="Error Getting Training Data: " + str(e)
         )
 
-    return {"shape": shape, "training_data": df_json}
+    return json_bytes_response(
+        payload, headers={"ETag": get_stream_etag(evaluator_streamer_uuid, version)}
+    )
 
 
 @router.get("/streams/{stream_id}/algorithms/{algorithm_id}/unlabeled-data")
@@ -58,23 +166,40 @@ def get_unlabeled_data(
     includeAdditionalFeatures: bool = Query(
         False, description="Include additional features in the unlabeled data"
     ),
+    columns: Optional[str] = Query(None, description=COLUMNS_QUERY_DESCRIPTION),
+    if_none_match: Annotated[Optional[str], Header()] = None,
 ):
     try:
         evaluator_streamer_uuid = get_stream_uuid_object(stream_id)
         algorithm_uuid = get_algo_uuid_object(algorithm_id)
-        evaluator_streamer = get_stream_from_db(evaluator_streamer_uuid)
-        interaction_matrix = evaluator_streamer.get_unlabeled_data(algorithm_uuid)
-        shape = interaction_matrix.shape
-        df = interaction_matrix.copy_df()
-        main_columns = ["interactionid", "uid", "iid", "ts"]
-        if includeAdditionalFeatures:
-            df_json = df.to_dict(orient="records")
-        else:
-            # only include the main columns if user does not want additional features
-            df_json = df[main_columns].to_dict(orient="records")
-        update_stream(evaluator_streamer_uuid, evaluator_streamer)
+        # nothing has changed on the stream since the client last fetched this data
+        etag = get_stream_etag(
+            evaluator_streamer_uuid, get_stream_version(evaluator_streamer_uuid)
+        )
+        if is_etag_match(if_none_match, etag):
+            return not_modified_response(etag)
+
+        # encoded inside the operation so unknown columns leave the stream as is
+        def fetch_unlabeled_data(evaluator_streamer: EvaluatorStreamer) -> bytes:
+            interaction_matrix = evaluator_streamer.get_unlabeled_data(algorithm_uuid)
+            return get_encoded_data_payload(
+                evaluator_streamer_uuid,
+                evaluator_streamer._run_step,
+                "unlabeled_data",
+                interaction_matrix,
+                columns,
+                includeAdditionalFeatures,
+            )
+
+        payload, version = run_stream_operation(
+            evaluator_streamer_uuid,
+            fetch_unlabeled_data,
+            get_stream_from_db,
+            update_stream,
+        )
     except (
         InvalidUUIDException,
+        InvalidColumnsException,
         GetEvaluatorStreamErrorException,
         DatabaseErrorException,
     ) as e:
@@ -84,4 +209,6 @@ def get_unlabeled_data(
             status_code=500, detail=f"Error Getting Unlabeled Data: {str(e)}"
         )
 
-    return {"shape": shape, "unlabeled_data": df_json}
+    return json_bytes_response(
+        payload, headers={"ETag": get_stream_etag(evaluator_streamer_uuid, version)}
+    )
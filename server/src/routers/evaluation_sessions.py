@@ -0,0 +1,211 @@
+import asyncio
+import uuid
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
+from scipy.sparse import csr_matrix
+
+from src.routers.data_handling import COLUMNS_QUERY_DESCRIPTION, get_window_payloads
+from src.settings import EVALUATION_SESSION_POLL_SECONDS
+from src.utils.dataframe_utils import InvalidColumnsException
+from src.utils.db_utils import (
+    DatabaseErrorException,
+    GetEvaluatorStreamErrorException,
+    StreamVersionConflictException,
+)
+from src.utils.prediction_utils import InvalidPredictionException, prediction_from_npz
+from src.utils.serialization import encode_json_object
+from src.utils.stream_sessions import (
+    PinnedStream,
+    apply_session_prediction,
+    check_pinned_stream_version,
+    checkpoint_pinned_stream,
+    is_waiting_for_window,
+    pin_stream,
+    unpin_stream,
+)
+from src.utils.uuid_utils import (
+    InvalidUUIDException,
+    get_algo_uuid_object,
+    get_stream_uuid_object,
+)
+
+router = APIRouter(tags=["Evaluation Sessions"])
+
+# application close codes mirror the HTTP status of the error
+CLOSE_CODE_OFFSET = 4000
+
+
+async def release_window(
+    stream_id: uuid.UUID,
+    pinned: PinnedStream,
+    algorithm_id: uuid.UUID,
+    columns: Optional[str],
+    include_additional_features: bool,
+) -> Tuple[str, Optional[bytes]]:
+    """
+    Wait until every algorithm predicted the current window, then release the
+    next one to the algorithm. The stream is checkpointed when the window moves.
+    While waiting the stored version is checked every poll interval, so an
+    update made outside of the sessions ends the wait with a conflict
+    """
+    evaluator_streamer = pinned.evaluator_streamer
+    async with pinned.lock:
+        while not pinned.is_invalidated and is_waiting_for_window(
+            evaluator_streamer, algorithm_id
+        ):
+            try:
+                await asyncio.wait_for(
+                    pinned.changed.wait(), timeout=EVALUATION_SESSION_POLL_SECONDS
+                )
+            except TimeoutError:
+                await check_pinned_stream_version(stream_id, pinned)
+        if pinned.is_invalidated:
+            raise StreamVersionConflictException()
+        state = evaluator_streamer.get_algorithm_state(algorithm_id).name
+        if state == "COMPLETED":
+            return state, None
+
+        payloads = await run_in_threadpool(
+            get_window_payloads,
+            stream_id,
+            evaluator_streamer,
+            algorithm_id,
+            columns,
+            include_additional_features,
+        )
+        pinned.is_dirty = True
+        if evaluator_streamer._run_step != pinned.checkpointed_window:
+            await checkpoint_pinned_stream(stream_id, pinned)
+        pinned.changed.notify_all()
+        state = evaluator_streamer.get_algorithm_state(algorithm_id).name
+        return state, encode_json_object(
+            {"type": "window", "state": state, "window": evaluator_streamer._run_step},
+            payloads=payloads,
+        )
+
+
+async def receive_prediction(websocket: WebSocket) -> csr_matrix:
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(
+                message.get("code", status.WS_1000_NORMAL_CLOSURE)
+            )
+        if message.get("bytes") is None:
+            await websocket.send_json(
+                {
+                    "type": "error",
+                    "detail": "Predictions must be sent as binary NPZ frames",
+                }
+            )
+            continue
+        try:
+            return prediction_from_npz(message["bytes"])
+        except InvalidPredictionException as e:
+            await websocket.send_json({"type": "error", "detail": e.message})
+
+
+async def submit_prediction(
+    websocket: WebSocket,
+    stream_id: uuid.UUID,
+    pinned: PinnedStream,
+    algorithm_id: uuid.UUID,
+):
+    """Receive predictions until one is accepted for the current window"""
+    while True:
+        prediction = await receive_prediction(websocket)
+        async with pinned.lock:
+            if pinned.is_invalidated:
+                raise StreamVersionConflictException()
+            try:
+                await run_in_threadpool(
+                    apply_session_prediction,
+                    stream_id,
+                    pinned.evaluator_streamer,
+                    algorithm_id,
+                    prediction,
+                )
+            except InvalidPredictionException as e:
+                await websocket.send_json({"type": "error", "detail": e.message})
+                continue
+            pinned.is_dirty = True
+            pinned.changed.notify_all()
+            return
+
+
+async def close_with_error(websocket: WebSocket, status_code: int, detail: str):
+    await websocket.send_json({"type": "error", "detail": detail})
+    await websocket.close(code=CLOSE_CODE_OFFSET + status_code, reason=detail[:120])
+
+
+@router.websocket("/streams/{stream_id}/algorithms/{algorithm_id}/session")
+async def evaluation_session(
+    websocket: WebSocket,
+    stream_id: str,
+    algorithm_id: str,
+    includeAdditionalFeatures: bool = Query(
+        False, description="Include additional features in the released data"
+    ),
+    columns: Optional[str] = Query(None, description=COLUMNS_QUERY_DESCRIPTION),
+):
+    """
+    Drive an algorithm through a whole stream over one connection. The stream
+    is kept in memory for as long as sessions of it are open, and is only
+    persisted when a window moves on and when its last session ends.
+
+    The server sends JSON text frames: a "window" message with the training
+    and unlabeled data of each window, "completed" once the algorithm is done,
+    and "error" for rejected frames. The client answers every window with its
+    prediction as a binary frame holding a CSR matrix in NPZ format.
+    """
+    try:
+        evaluator_streamer_uuid = get_stream_uuid_object(stream_id)
+        algorithm_uuid = get_algo_uuid_object(algorithm_id)
+    except InvalidUUIDException as e:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=e.message)
+        return
+
+    await websocket.accept()
+    try:
+        pinned = await pin_stream(evaluator_streamer_uuid)
+    except (GetEvaluatorStreamErrorException, DatabaseErrorException) as e:
+        await close_with_error(websocket, e.status_code, e.message)
+        return
+
+    try:
+        while True:
+            state, payload = await release_window(
+                evaluator_streamer_uuid,
+                pinned,
+                algorithm_uuid,
+                columns,
+                includeAdditionalFeatures,
+            )
+            if payload is None:
+                await websocket.send_json({"type": "completed", "state": state})
+                await websocket.close()
+                return
+            await websocket.send_text(payload.decode("utf-8"))
+            await submit_prediction(
+                websocket, evaluator_streamer_uuid, pinned, algorithm_uuid
+            )
+    except WebSocketDisconnect:
+        pass
+    except (
+        InvalidColumnsException,
+        StreamVersionConflictException,
+        DatabaseErrorException,
+    ) as e:
+        await close_with_error(websocket, e.status_code, e.message)
+    except Exception as e:
+        await websocket.send_json(
+            {"type": "error", "detail": f"Error running evaluation session: {str(e)}"}
+        )
+        await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+    finally:
+        try:
+            await unpin_stream(evaluator_streamer_uuid, pinned)
+        except (StreamVersionConflictException, DatabaseErrorException) as e:
+            print(f"Error checkpointing stream {evaluator_streamer_uuid}: ", e.message)
@@ -1,13 +1,22 @@
-from fastapi import APIRouter, HTTPException
+from typing import Annotated, Optional
 
-from src.models.metrics_models import MacroMetric, Metrics, MicroMetric
+import pandas as pd
+from fastapi import APIRouter, Header, HTTPException, Response
+
+from src.models.metrics_models import Metrics
 from src.utils.db_utils import (
     DatabaseErrorException,
     GetEvaluatorStreamErrorException,
     get_stream_from_db,
+    get_stream_version,
     update_stream,
 )
-from src.utils.string_utils import split_string_by_last_underscore
+from src.utils.etag_utils import (
+    get_stream_etag,
+    is_etag_match,
+    not_modified_response,
+)
+from src.utils.serialization import encode_json_object, json_bytes_response
 from src.utils.uuid_utils import InvalidUUIDException, get_stream_uuid_object
 
 router = APIRouter(
@@ -15,59 +24,71 @@ router = APIRouter(
 )
 
 
+def build_metrics_frame(
+    metric_results: pd.DataFrame, score_column: str, count_column: str
+) -> pd.DataFrame:
+    metrics = metric_results.reset_index()
+    if metrics.empty:
+        return pd.DataFrame(
+            columns=[
+                "algorithm_name",
+                "algorithm_id",
+                "metric",
+                score_column,
+                count_column,
+            ]
+        )
+    # algorithms are identified as <algorithm_name>_<algorithm_id>
+    algorithm = metrics["Algorithm"].str.rsplit("_", n=1, expand=True)
+    return pd.DataFrame(
+        {
+            "algorithm_name": algorithm[0],
+            "algorithm_id": algorithm[1],
+            "metric": metrics["Metric"],
+            score_column: metrics[score_column].astype(float),
+            count_column: metrics[count_column].astype(int),
+        }
+    )
+
+
 @router.get("/streams/{stream_id}/metrics")
-def get_metrics(stream_id: str) -> Metrics:
+def get_metrics(
+    stream_id: str,
+    response: Response,
+    if_none_match: Annotated[Optional[str], Header()] = None,
+) -> Metrics:
     try:
         evaluator_streamer_uuid = get_stream_uuid_object(stream_id)
+        etag = get_stream_etag(
+            evaluator_streamer_uuid, get_stream_version(evaluator_streamer_uuid)
+        )
+        if is_etag_match(if_none_match, etag):
+            return not_modified_response(etag)
         evaluator_streamer = get_stream_from_db(evaluator_streamer_uuid)
 
         if not evaluator_streamer.has_predicted:
+            response.headers["ETag"] = etag
             return {
                 "micro_metrics": [],
                 "macro_metrics": [],
             }
 
-        micro_metrics = evaluator_streamer.metric_results("micro")
-        macro_metrics = evaluator_streamer.metric_results("macro")
-
-        micro_metrics_dict = micro_metrics.reset_index().to_dict(orient="records")
-        macro_metrics_dict = macro_metrics.reset_index().to_dict(orient="records")
+        micro_metrics = build_metrics_frame(
+            evaluator_streamer.metric_results("micro"), "micro_score", "num_user"
+        )
+        macro_metrics = build_metrics_frame(
+            evaluator_streamer.metric_results("macro"), "macro_score", "num_window"
+        )
 
-        micro_metrics_results: list[MicroMetric] = []
-        macro_metrics_results: list[MacroMetric] = []
-        for metric in micro_metrics_dict:
-            algorithm_name, algorithm_id = split_string_by_last_underscore(
-                metric["Algorithm"]
-            )
-            micro_metrics_results.append(
-                MicroMetric(
-                    algorithm_name=algorithm_name,
-                    algorithm_id=algorithm_id,
-                    metric=metric["Metric"],
-                    micro_score=metric["micro_score"],
-                    num_user=metric["num_user"],
-                )
-            )
-        for metric in macro_metrics_dict:
-            algorithm_name, algorithm_id = split_string_by_last_underscore(
-                metric["Algorithm"]
-            )
-            macro_metrics_results.append(
-                MacroMetric(
-                    algorithm_name=algorithm_name,
-                    algorithm_id=algorithm_id,
-                    metric=metric["Metric"],
-                    macro_score=metric["macro_score"],
-                    num_window=metric["num_window"],
-                )
-            )
+        version = update_stream(evaluator_streamer_uuid, evaluator_streamer)
 
-        update_stream(evaluator_streamer_uuid, evaluator_streamer)
-
-        return {
-            "micro_metrics": micro_metrics_results,
-            "macro_metrics": macro_metrics_results,
-        }
+        return json_bytes_response(
+            encode_json_object(
+                {},
+                {"micro_metrics": micro_metrics, "macro_metrics": macro_metrics},
+            ),
+            headers={"ETag": get_stream_etag(evaluator_streamer_uuid, version)},
+        )
     except (
         InvalidUUIDException,
         GetEvaluatorStreamErrorException,
@@ -1,21 +1,72 @@
-from typing import List, Union
+import json
+from typing import List, Optional, Tuple, Union
+from uuid import UUID
 
 import pandas as pd
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from pydantic import BaseModel, Field
 from scipy.sparse import csr_matrix
+from streamsightv2.evaluators.evaluator_stream import EvaluatorStreamer
 from streamsightv2.matrix import InteractionMatrix
 
+from src.models.prediction_models import (
+    PredictionSubmissionStatus,
+    PredictionUploadRequest,
+    PredictionUploadStatus,
+)
+from src.routers.data_handling import COLUMNS_QUERY_DESCRIPTION, get_window_payloads
+from src.utils.dataframe_utils import InvalidColumnsException
 from src.utils.db_utils import (
     DatabaseErrorException,
     GetEvaluatorStreamErrorException,
+    get_prediction_submission,
     get_stream_from_db,
+    get_stream_version,
+    get_stream_window,
     update_stream,
+    write_prediction_submission,
+)
+from src.utils.etag_utils import get_stream_etag
+from src.utils.prediction_utils import (
+    ARROW_FILE_MEDIA_TYPE,
+    ARROW_STREAM_MEDIA_TYPE,
+    MULTIPART_MEDIA_TYPE,
+    NPZ_MEDIA_TYPE,
+    OCTET_STREAM_MEDIA_TYPE,
+    InvalidPredictionException,
+    parse_shape,
+    prediction_frame_from_columns,
+    prediction_from_arrow,
+    prediction_from_buffers,
+    prediction_from_concatenated_buffer,
+    prediction_from_npz,
+    prediction_from_top_k,
+)
+from src.utils.prediction_validation import (
+    prevalidate_prediction,
+    submit_loaded_prediction,
+    validate_loaded_prediction,
+)
+from src.utils.serialization import encode_json_object, json_bytes_response
+from src.utils.stream_actor import run_stream_operation
+from src.utils.submission_executor import (
+    SubmissionQueueFullException,
+    run_submission,
+)
+from src.utils.submission_worker import schedule_stream_evaluation
+from src.utils.upload_sessions import (
+    PredictionUploadSession,
+    UploadSessionNotFoundException,
+    create_upload_session,
+    delete_upload_session,
+    get_upload_session,
 )
 from src.utils.uuid_utils import (
     InvalidUUIDException,
     get_algo_uuid_object,
     get_stream_uuid_object,
+    get_submission_uuid_object,
+    get_upload_uuid_object,
 )
 
 router = APIRouter(tags=["Predictions"])
@@ -35,50 +86,758 @@ class DataframeRecord(BaseModel):
     ts: int = Field(..., description="The timestamp of the interaction, required.")
 
 
+class AlgorithmPrediction(BaseModel):
+    algorithm_id: str
+    predictions: Union[List[DataframeRecord], PredictionCsrMatrix]
+
+
+def build_json_prediction(
+    predictions: Union[List[DataframeRecord], PredictionCsrMatrix],
+) -> Union[InteractionMatrix, csr_matrix]:
+    if isinstance(predictions, PredictionCsrMatrix):
+        return csr_matrix(
+            (predictions.data, predictions.indices, predictions.indptr),
+            shape=predictions.shape,
+        )
+    prediction_data = [prediction.model_dump() for prediction in predictions]
+    prediction_df = pd.DataFrame(prediction_data)
+    return InteractionMatrix(
+        prediction_df, item_ix="iid", user_ix="uid", timestamp_ix="ts"
+    )
+
+
+def submit_prediction_to_stream(
+    evaluator_streamer_uuid: UUID,
+    algorithm_uuid: UUID,
+    prediction: Union[InteractionMatrix, csr_matrix],
+):
+    # reject predictions for the current window before loading the stream
+    prevalidate_prediction(
+        evaluator_streamer_uuid, get_stream_window(evaluator_streamer_uuid), prediction
+    )
+
+    def apply_prediction(evaluator_streamer: EvaluatorStreamer):
+        validate_loaded_prediction(
+            evaluator_streamer_uuid, evaluator_streamer, prediction
+        )
+        submit_loaded_prediction(evaluator_streamer, algorithm_uuid, prediction)
+
+    run_stream_operation(
+        evaluator_streamer_uuid, apply_prediction, get_stream_from_db, update_stream
+    )
+
+
+def submit_predictions_to_stream(
+    evaluator_streamer_uuid: UUID,
+    predictions: List[Tuple[UUID, Union[InteractionMatrix, csr_matrix]]],
+):
+    """
+    Apply the predictions of several algorithms to one loaded streamer and
+    persist it once. Nothing is persisted if any of them fails
+    """
+    prevalidate_predictions(evaluator_streamer_uuid, predictions)
+
+    def apply_predictions(evaluator_streamer: EvaluatorStreamer):
+        # validate the whole batch before the streamer is changed
+        for algorithm_uuid, prediction in predictions:
+            try:
+                validate_loaded_prediction(
+                    evaluator_streamer_uuid, evaluator_streamer, prediction
+                )
+            except InvalidPredictionException as e:
+                raise InvalidPredictionException(
+                    message=f"Algorithm {algorithm_uuid}: {e.message}"
+                )
+        for algorithm_uuid, prediction in predictions:
+            try:
+                submit_loaded_prediction(evaluator_streamer, algorithm_uuid, prediction)
+            except Exception as e:
+                raise Exception(f"Algorithm {algorithm_uuid}: {str(e)}")
+
+    run_stream_operation(
+        evaluator_streamer_uuid, apply_predictions, get_stream_from_db, update_stream
+    )
+
+
+def step_algorithm(
+    evaluator_streamer_uuid: UUID,
+    algorithm_uuid: UUID,
+    prediction: Union[InteractionMatrix, csr_matrix],
+    columns: Optional[str],
+    include_additional_features: bool,
+) -> Tuple[bytes, int]:
+    """
+    Submit the prediction of an algorithm and release the training and
+    unlabeled data of its next window from one load and persist of the stream.
+    The data is only released once every algorithm has predicted, until then
+    the algorithm stays PREDICTED and has to fetch the data later
+    """
+    prevalidate_prediction(
+        evaluator_streamer_uuid, get_stream_window(evaluator_streamer_uuid), prediction
+    )
+
+    def apply_step(evaluator_streamer: EvaluatorStreamer) -> bytes:
+        validate_loaded_prediction(
+            evaluator_streamer_uuid, evaluator_streamer, prediction
+        )
+        state = submit_loaded_prediction(evaluator_streamer, algorithm_uuid, prediction)
+
+        payloads = {}
+        if (
+            state == "PREDICTED"
+            and evaluator_streamer.status_registry.is_all_predicted()
+        ):
+            payloads = get_window_payloads(
+                evaluator_streamer_uuid,
+                evaluator_streamer,
+                algorithm_uuid,
+                columns,
+                include_additional_features,
+            )
+            state = evaluator_streamer.get_algorithm_state(algorithm_uuid).name
+        return encode_json_object(
+            {"state": state, "window": evaluator_streamer._run_step},
+            payloads=payloads,
+        )
+
+    return run_stream_operation(
+        evaluator_streamer_uuid, apply_step, get_stream_from_db, update_stream
+    )
+
+
+def prevalidate_predictions(
+    evaluator_streamer_uuid: UUID,
+    predictions: List[Tuple[UUID, Union[InteractionMatrix, csr_matrix]]],
+):
+    window = get_stream_window(evaluator_streamer_uuid)
+    for algorithm_uuid, prediction in predictions:
+        try:
+            prevalidate_prediction(evaluator_streamer_uuid, window, prediction)
+        except InvalidPredictionException as e:
+            raise InvalidPredictionException(
+                message=f"Algorithm {algorithm_uuid}: {e.message}"
+            )
+
+
+def accept_predictions(
+    evaluator_streamer_uuid: UUID,
+    predictions: List[Tuple[UUID, Union[InteractionMatrix, csr_matrix]]],
+) -> List[UUID]:
+    # fails with 404 for unknown streams before anything is stored
+    prevalidate_predictions(evaluator_streamer_uuid, predictions)
+    return [
+        write_prediction_submission(evaluator_streamer_uuid, algorithm_uuid, prediction)
+        for algorithm_uuid, prediction in predictions
+    ]
+
+
+def load_json_body(body: bytes):
+    try:
+        return json.loads(body)
+    except ValueError:
+        raise InvalidPredictionException(message="Body must be valid JSON")
+
+
+def build_columnar_prediction(body: bytes) -> InteractionMatrix:
+    prediction_df = prediction_frame_from_columns(load_json_body(body))
+    return InteractionMatrix(
+        prediction_df, item_ix="iid", user_ix="uid", timestamp_ix="ts"
+    )
+
+
+def build_top_k_prediction(body: bytes) -> csr_matrix:
+    return prediction_from_top_k(load_json_body(body))
+
+
+def accept_prediction(
+    evaluator_streamer_uuid: UUID,
+    algorithm_uuid: UUID,
+    prediction: Union[InteractionMatrix, csr_matrix],
+) -> UUID:
+    # fails with 404 for unknown streams before anything is stored
+    prevalidate_prediction(
+        evaluator_streamer_uuid, get_stream_window(evaluator_streamer_uuid), prediction
+    )
+    return write_prediction_submission(
+        evaluator_streamer_uuid, algorithm_uuid, prediction
+    )
+
+
+async def dispatch_prediction(
+    response: Response,
+    evaluator_streamer_uuid: UUID,
+    algorithm_uuid: UUID,
+    prediction: Union[InteractionMatrix, csr_matrix],
+    asynchronous: bool,
+) -> dict:
+    if not asynchronous:
+        await run_submission(
+            submit_prediction_to_stream,
+            evaluator_streamer_uuid,
+            algorithm_uuid,
+            prediction,
+        )
+        return {"status": True}
+
+    submission_id = await run_submission(
+        accept_prediction, evaluator_streamer_uuid, algorithm_uuid, prediction
+    )
+    schedule_stream_evaluation(evaluator_streamer_uuid)
+    response.status_code = 202
+    response.headers["Location"] = (
+        f"/streams/{evaluator_streamer_uuid}/predictions/submissions/{submission_id}"
+    )
+    return {"status": True, "submission_id": str(submission_id)}
+
+
+ASYNC_QUERY_DESCRIPTION = (
+    "Store the prediction and return 202 with a submission ID instead of "
+    "evaluating it within the request"
+)
+
+
 @router.post("/streams/{stream_id}/algorithms/{algorithm_id}/predictions")
 async def submit_prediction(
     stream_id: str,
     algorithm_id: str,
     predictions: Union[List[DataframeRecord], PredictionCsrMatrix],
+    response: Response,
+    asynchronous: bool = Query(
+        False, alias="async", description=ASYNC_QUERY_DESCRIPTION
+    ),
 ):
     try:
         evaluator_streamer_uuid = get_stream_uuid_object(stream_id)
         algorithm_uuid = get_algo_uuid_object(algorithm_id)
-        evaluator_streamer = get_stream_from_db(evaluator_streamer_uuid)
-        if isinstance(predictions, list) and all(
-            isinstance(prediction, DataframeRecord) for prediction in predictions
-        ):
-            prediction_data = [prediction.model_dump() for prediction in predictions]
-            prediction_df = pd.DataFrame(prediction_data)
-            prediction_im = InteractionMatrix(
-                prediction_df, item_ix="iid", user_ix="uid", timestamp_ix="ts"
-            )
+        prediction = build_json_prediction(predictions)
+        return await dispatch_prediction(
+            response,
+            evaluator_streamer_uuid,
+            algorithm_uuid,
+            prediction,
+            asynchronous,
+        )
+    except (
+        InvalidUUIDException,
+        InvalidPredictionException,
+        GetEvaluatorStreamErrorException,
+        DatabaseErrorException,
+    ) as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    except SubmissionQueueFullException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error Submitting Prediction: {str(e)}"
+        )
+
+
+async def read_binary_prediction(
+    request: Request,
+    shape: Optional[str],
+    nnz: Optional[int],
+    data_dtype: str,
+    index_dtype: str,
+) -> csr_matrix:
+    media_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if media_type == MULTIPART_MEDIA_TYPE:
+        if shape is None:
+            raise InvalidPredictionException(message="shape is required")
+        form = await request.form()
+        buffers = {}
+        for name in ("data", "indices", "indptr"):
+            upload = form.get(name)
+            if upload is None or isinstance(upload, str):
+                raise InvalidPredictionException(message=f"Missing {name} file")
+            buffers[name] = await upload.read()
+        return prediction_from_buffers(
+            buffers["data"],
+            buffers["indices"],
+            buffers["indptr"],
+            parse_shape(shape),
+            data_dtype,
+            index_dtype,
+        )
+
+    body = await request.body()
+    if media_type == OCTET_STREAM_MEDIA_TYPE:
+        if shape is None or nnz is None:
+            raise InvalidPredictionException(message="shape and nnz are required")
+        return prediction_from_concatenated_buffer(
+            body, parse_shape(shape), nnz, data_dtype, index_dtype
+        )
+    if media_type == NPZ_MEDIA_TYPE:
+        return prediction_from_npz(body)
+    if media_type in (ARROW_STREAM_MEDIA_TYPE, ARROW_FILE_MEDIA_TYPE):
+        return prediction_from_arrow(
+            body, parse_shape(shape), file_format=media_type == ARROW_FILE_MEDIA_TYPE
+        )
+    raise InvalidPredictionException(
+        message=f"Unsupported content type: {media_type}", status_code=415
+    )
+
+
+@router.post("/streams/{stream_id}/algorithms/{algorithm_id}/predictions/binary")
+async def submit_binary_prediction(
+    stream_id: str,
+    algorithm_id: str,
+    request: Request,
+    response: Response,
+    shape: Optional[str] = Query(
+        None, description="Comma separated number of rows and columns, e.g. 100,500"
+    ),
+    nnz: Optional[int] = Query(
+        None, description="Number of stored values, required for octet-stream bodies"
+    ),
+    data_dtype: str = Query("float64", alias="dataDtype"),
+    index_dtype: str = Query("int32", alias="indexDtype"),
+    asynchronous: bool = Query(
+        False, alias="async", description=ASYNC_QUERY_DESCRIPTION
+    ),
+):
+    """
+    Submit a prediction as binary buffers instead of JSON lists. Accepts
+    multipart/form-data with little-endian data, indices and indptr files,
+    application/octet-stream with the three buffers concatenated in that order,
+    application/x-npz as written by scipy.sparse.save_npz, or an Arrow IPC table
+    with uid, iid and optional score columns when pyarrow is installed
+    """
+    try:
+        evaluator_streamer_uuid = get_stream_uuid_object(stream_id)
+        algorithm_uuid = get_algo_uuid_object(algorithm_id)
+        prediction = await read_binary_prediction(
+            request, shape, nnz, data_dtype, index_dtype
+        )
+        return await dispatch_prediction(
+            response,
+            evaluator_streamer_uuid,
+            algorithm_uuid,
+            prediction,
+            asynchronous,
+        )
+    except (
+        InvalidUUIDException,
+        InvalidPredictionException,
+        GetEvaluatorStreamErrorException,
+        DatabaseErrorException,
+    ) as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    except SubmissionQueueFullException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error Submitting Prediction: {str(e)}"
+        )
+
+
+COLUMNAR_PREDICTION_SCHEMA = {
+    "type": "object",
+    "required": ["uid", "iid", "ts"],
+    "properties": {
+        column: {"type": "array", "items": {"type": "integer"}}
+        for column in ("interactionid", "uid", "iid", "ts")
+    },
+}
+
+
+@router.post(
+    "/streams/{stream_id}/algorithms/{algorithm_id}/predictions/columnar",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": COLUMNAR_PREDICTION_SCHEMA}},
+        }
+    },
+)
+async def submit_columnar_prediction(
+    stream_id: str,
+    algorithm_id: str,
+    request: Request,
+    response: Response,
+    asynchronous: bool = Query(
+        False, alias="async", description=ASYNC_QUERY_DESCRIPTION
+    ),
+):
+    """
+    Submit a prediction as one JSON list per column. The body is parsed as is
+    and every column is checked once with numpy rather than validating a model
+    per record
+    """
+    try:
+        evaluator_streamer_uuid = get_stream_uuid_object(stream_id)
+        algorithm_uuid = get_algo_uuid_object(algorithm_id)
+        prediction = await run_submission(
+            build_columnar_prediction, await request.body()
+        )
+        return await dispatch_prediction(
+            response,
+            evaluator_streamer_uuid,
+            algorithm_uuid,
+            prediction,
+            asynchronous,
+        )
+    except (
+        InvalidUUIDException,
+        InvalidPredictionException,
+        GetEvaluatorStreamErrorException,
+        DatabaseErrorException,
+    ) as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    except SubmissionQueueFullException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error Submitting Prediction: {str(e)}"
+        )
+
 
-            evaluator_streamer.submit_prediction(algorithm_uuid, prediction_im)
-            assert evaluator_streamer.get_algorithm_state(algorithm_uuid).name in {
-                "PREDICTED",
-                "COMPLETED",
-            }
-        elif isinstance(predictions, PredictionCsrMatrix):
-            prediction_csr_matrix = csr_matrix(
-                (predictions.data, predictions.indices, predictions.indptr),
-                shape=predictions.shape,
+TOP_K_PREDICTION_SCHEMA = {
+    "type": "object",
+    "required": ["user_ids", "item_indices"],
+    "properties": {
+        "user_ids": {"type": "array", "items": {"type": "integer"}},
+        "item_indices": {
+            "type": "array",
+            "items": {"type": "array", "items": {"type": "integer"}},
+        },
+        "scores": {
+            "type": "array",
+            "items": {"type": "array", "items": {"type": "number"}},
+        },
+        "shape": {"type": "array", "items": {"type": "integer"}},
+    },
+}
+
+
+@router.post(
+    "/streams/{stream_id}/algorithms/{algorithm_id}/predictions/top-k",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": TOP_K_PREDICTION_SCHEMA}},
+        }
+    },
+)
+async def submit_top_k_prediction(
+    stream_id: str,
+    algorithm_id: str,
+    request: Request,
+    response: Response,
+    asynchronous: bool = Query(
+        False, alias="async", description=ASYNC_QUERY_DESCRIPTION
+    ),
+):
+    """
+    Submit an n_users x K matrix of recommended item indices, best first, with
+    optional scores. Pad short rows with -1
+    """
+    try:
+        evaluator_streamer_uuid = get_stream_uuid_object(stream_id)
+        algorithm_uuid = get_algo_uuid_object(algorithm_id)
+        prediction = await run_submission(build_top_k_prediction, await request.body())
+        return await dispatch_prediction(
+            response,
+            evaluator_streamer_uuid,
+            algorithm_uuid,
+            prediction,
+            asynchronous,
+        )
+    except (
+        InvalidUUIDException,
+        InvalidPredictionException,
+        GetEvaluatorStreamErrorException,
+        DatabaseErrorException,
+    ) as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    except SubmissionQueueFullException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error Submitting Prediction: {str(e)}"
+        )
+
+
+@router.get(
+    "/streams/{stream_id}/predictions/submissions/{submission_id}",
+    response_model=PredictionSubmissionStatus,
+)
+async def get_prediction_submission_status(stream_id: str, submission_id: str):
+    try:
+        evaluator_streamer_uuid = get_stream_uuid_object(stream_id)
+        submission_uuid = get_submission_uuid_object(submission_id)
+        submission = get_prediction_submission(submission_uuid)
+        if submission is None or submission.stream_id != evaluator_streamer_uuid:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Prediction submission with ID {submission_id} not found",
             )
-            evaluator_streamer.submit_prediction(algorithm_uuid, prediction_csr_matrix)
-            assert evaluator_streamer.get_algorithm_state(algorithm_uuid).name in {
-                "PREDICTED",
-                "COMPLETED",
-            }
-        update_stream(evaluator_streamer_uuid, evaluator_streamer)
+        return PredictionSubmissionStatus(
+            submission_id=str(submission.submission_id),
+            stream_id=str(submission.stream_id),
+            algorithm_id=str(submission.algorithm_id),
+            status=submission.status,
+            error=submission.error,
+            created_at=submission.created_at,
+            completed_at=submission.completed_at,
+        )
+    except (InvalidUUIDException, DatabaseErrorException) as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+
+
+def get_upload_status(session: PredictionUploadSession) -> PredictionUploadStatus:
+    missing_ranges = session.get_missing_ranges()
+    return PredictionUploadStatus(
+        upload_id=str(session.upload_id),
+        shape=list(session.shape),
+        nnz=session.nnz,
+        missing_rows=sum(end - start for start, end in missing_ranges),
+        missing_ranges=[list(missing_range) for missing_range in missing_ranges],
+    )
+
+
+@router.post(
+    "/streams/{stream_id}/algorithms/{algorithm_id}/predictions/uploads",
+    response_model=PredictionUploadStatus,
+    status_code=201,
+)
+async def create_prediction_upload(
+    stream_id: str, algorithm_id: str, upload: PredictionUploadRequest
+):
+    """
+    Open a chunked upload of a CSR prediction matrix. Rows are then uploaded in
+    ranges, in any order and in parallel, and submitted together on commit
+    """
+    try:
+        evaluator_streamer_uuid = get_stream_uuid_object(stream_id)
+        algorithm_uuid = get_algo_uuid_object(algorithm_id)
+        get_stream_version(evaluator_streamer_uuid)
+        session = create_upload_session(
+            evaluator_streamer_uuid,
+            algorithm_uuid,
+            tuple(upload.shape),
+            upload.nnz,
+            upload.data_dtype,
+            upload.index_dtype,
+        )
+        return get_upload_status(session)
+    except (
+        InvalidUUIDException,
+        InvalidPredictionException,
+        GetEvaluatorStreamErrorException,
+    ) as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+
+
+@router.put(
+    "/streams/{stream_id}/algorithms/{algorithm_id}/predictions/uploads/{upload_id}/rows",
+    response_model=PredictionUploadStatus,
+)
+async def upload_prediction_rows(
+    stream_id: str,
+    algorithm_id: str,
+    upload_id: str,
+    request: Request,
+    start: int = Query(..., description="First row of the chunk"),
+    end: int = Query(..., description="Row after the last row of the chunk"),
+):
+    """
+    Upload rows [start, end) as an application/octet-stream body holding the
+    little-endian data and indices of those rows followed by indptr[start:end + 1]
+    of the full matrix. Re-uploading a range overwrites it
+    """
+    try:
+        session = get_upload_session(
+            get_upload_uuid_object(upload_id),
+            get_stream_uuid_object(stream_id),
+            get_algo_uuid_object(algorithm_id),
+        )
+        session.write_rows(start, end, await request.body())
+        return get_upload_status(session)
+    except (
+        InvalidUUIDException,
+        InvalidPredictionException,
+        UploadSessionNotFoundException,
+    ) as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+
+
+@router.get(
+    "/streams/{stream_id}/algorithms/{algorithm_id}/predictions/uploads/{upload_id}",
+    response_model=PredictionUploadStatus,
+)
+async def get_prediction_upload(stream_id: str, algorithm_id: str, upload_id: str):
+    try:
+        session = get_upload_session(
+            get_upload_uuid_object(upload_id),
+            get_stream_uuid_object(stream_id),
+            get_algo_uuid_object(algorithm_id),
+        )
+        return get_upload_status(session)
+    except (InvalidUUIDException, UploadSessionNotFoundException) as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+
+
+@router.post(
+    "/streams/{stream_id}/algorithms/{algorithm_id}/predictions/uploads/{upload_id}/commit"
+)
+async def commit_prediction_upload(
+    stream_id: str,
+    algorithm_id: str,
+    upload_id: str,
+    response: Response,
+    asynchronous: bool = Query(
+        False, alias="async", description=ASYNC_QUERY_DESCRIPTION
+    ),
+):
+    try:
+        evaluator_streamer_uuid = get_stream_uuid_object(stream_id)
+        algorithm_uuid = get_algo_uuid_object(algorithm_id)
+        upload_uuid = get_upload_uuid_object(upload_id)
+        session = get_upload_session(
+            upload_uuid, evaluator_streamer_uuid, algorithm_uuid
+        )
+        prediction = session.build_matrix()
+        result = await dispatch_prediction(
+            response,
+            evaluator_streamer_uuid,
+            algorithm_uuid,
+            prediction,
+            asynchronous,
+        )
+        delete_upload_session(upload_uuid)
+        return result
     except (
         InvalidUUIDException,
+        InvalidPredictionException,
+        UploadSessionNotFoundException,
         GetEvaluatorStreamErrorException,
         DatabaseErrorException,
     ) as e:
         raise HTTPException(status_code=e.status_code, detail=e.message)
+    except SubmissionQueueFullException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error Submitting Prediction: {str(e)}"
         )
 
+
+@router.delete(
+    "/streams/{stream_id}/algorithms/{algorithm_id}/predictions/uploads/{upload_id}"
+)
+async def abort_prediction_upload(stream_id: str, algorithm_id: str, upload_id: str):
+    try:
+        upload_uuid = get_upload_uuid_object(upload_id)
+        get_upload_session(
+            upload_uuid,
+            get_stream_uuid_object(stream_id),
+            get_algo_uuid_object(algorithm_id),
+        )
+        delete_upload_session(upload_uuid)
+    except (InvalidUUIDException, UploadSessionNotFoundException) as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+
     return {"status": True}
+
+
+@router.post("/streams/{stream_id}/predictions/batch")
+async def submit_batch_prediction(
+    stream_id: str,
+    batch: List[AlgorithmPrediction],
+    response: Response,
+    asynchronous: bool = Query(
+        False, alias="async", description=ASYNC_QUERY_DESCRIPTION
+    ),
+):
+    """
+    Submit the predictions of several algorithms of a stream in one request.
+    The stream is loaded and persisted once for the whole batch
+    """
+    try:
+        evaluator_streamer_uuid = get_stream_uuid_object(stream_id)
+        algorithm_uuids = [get_algo_uuid_object(item.algorithm_id) for item in batch]
+        if not algorithm_uuids:
+            raise InvalidPredictionException(message="Batch must not be empty")
+        if len(set(algorithm_uuids)) != len(algorithm_uuids):
+            raise InvalidPredictionException(
+                message="Each algorithm may only appear once per batch"
+            )
+        predictions = [
+            (algorithm_uuid, build_json_prediction(item.predictions))
+            for algorithm_uuid, item in zip(algorithm_uuids, batch)
+        ]
+
+        if not asynchronous:
+            await run_submission(
+                submit_predictions_to_stream, evaluator_streamer_uuid, predictions
+            )
+            return {"status": True}
+
+        submission_ids = await run_submission(
+            accept_predictions, evaluator_streamer_uuid, predictions
+        )
+        schedule_stream_evaluation(evaluator_streamer_uuid)
+        response.status_code = 202
+        return {
+            "status": True,
+            "submission_ids": [str(submission_id) for submission_id in submission_ids],
+        }
+    except (
+        InvalidUUIDException,
+        InvalidPredictionException,
+        GetEvaluatorStreamErrorException,
+        DatabaseErrorException,
+    ) as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    except SubmissionQueueFullException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error Submitting Prediction: {str(e)}"
+        )
+
+
+@router.post("/streams/{stream_id}/algorithms/{algorithm_id}/step")
+async def step(
+    stream_id: str,
+    algorithm_id: str,
+    predictions: Union[List[DataframeRecord], PredictionCsrMatrix],
+    includeAdditionalFeatures: bool = Query(
+        False, description="Include additional features in the returned data"
+    ),
+    columns: Optional[str] = Query(None, description=COLUMNS_QUERY_DESCRIPTION),
+):
+    """
+    Submit the prediction of the current window and receive the training and
+    unlabeled data of the next window in the same format as the training-data
+    and unlabeled-data endpoints. Both are omitted while other algorithms have
+    yet to predict, and once the stream is COMPLETED
+    """
+    try:
+        evaluator_streamer_uuid = get_stream_uuid_object(stream_id)
+        algorithm_uuid = get_algo_uuid_object(algorithm_id)
+        prediction = build_json_prediction(predictions)
+        payload, version = await run_submission(
+            step_algorithm,
+            evaluator_streamer_uuid,
+            algorithm_uuid,
+            prediction,
+            columns,
+            includeAdditionalFeatures,
+        )
+    except (
+        InvalidUUIDException,
+        InvalidPredictionException,
+        InvalidColumnsException,
+        GetEvaluatorStreamErrorException,
+        DatabaseErrorException,
+    ) as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    except SubmissionQueueFullException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error Stepping Stream: {str(e)}")
+
+    return json_bytes_response(
+        payload, headers={"ETag": get_stream_etag(evaluator_streamer_uuid, version)}
+    )
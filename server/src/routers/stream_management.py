@@ -1,8 +1,8 @@
-from typing import Annotated, List, cast
+import uuid
+from datetime import datetime
+from typing import Annotated, List, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 from streamsightv2.datasets import (
     AmazonBookDataset,
     AmazonMovieDataset,
@@ -19,23 +19,59 @@ from streamsightv2.settings import SlidingWindowSetting
 
 from src.models.stream_management_models import (
     CreateStreamResponse,
+    ReleaseStreamLeaseResponse,
     StartStreamResponse,
     Stream,
+    StreamLeaseResponse,
     StreamSettings,
     StreamStatus,
+    StreamStatusEnum,
+    StreamStatusesRequest,
+)
+from src.settings import (
+    STREAM_LEASE_DEFAULT_SECONDS,
+    STREAM_LEASE_MAX_SECONDS,
+    STREAM_LIST_MAX_LIMIT,
 )
 from src.supabase_client.authentication import is_user_authenticated
 from src.utils.db_utils import (
     DatabaseErrorException,
     GetEvaluatorStreamErrorException,
+    StreamLeaseException,
+    acquire_stream_lease,
+    get_stored_stream_settings,
+    get_stored_stream_statuses,
     get_stream_from_db,
     get_stream_from_db_with_dataset_id,
-    get_user_stream_ids_from_db,
+    get_stream_version,
+    get_streamer_status,
+    get_streams_from_db,
+    get_user_streams_page,
     is_user_stream,
+    save_stream_settings,
     update_stream,
     write_stream_to_db,
 )
-from src.utils.uuid_utils import InvalidUUIDException, get_stream_uuid_object
+from src.utils.etag_utils import (
+    get_stream_etag,
+    is_etag_match,
+    not_modified_response,
+)
+from src.utils.lease_manager import extend_stream_lease, release_stream_lease
+from src.utils.pagination import (
+    NEXT_CURSOR_HEADER,
+    InvalidCursorException,
+    decode_cursor,
+    encode_cursor,
+)
+from src.utils.serialization import encode_json, json_bytes_response
+from src.utils.stream_actor import run_stream_operation
+from src.utils.stream_settings import get_streamer_settings
+from src.utils.uuid_utils import (
+    InvalidUUIDException,
+    get_lease_uuid_object,
+    get_stream_uuid_object,
+)
 
 router = APIRouter(tags=["Stream Management"])
 
@@ -51,6 +87,23 @@ dataset_map = {
 }
 
 
+def get_stream_statuses(stream_uuid_objs: List[uuid.UUID]) -> List[StreamStatus]:
+    stored = get_stored_stream_statuses(stream_uuid_objs)
+    # streams created before their status was stored, until it is backfilled,
+    # are loaded with one query instead of one query per stream
+    unknown = [stream_id for stream_id in stream_uuid_objs if stored[stream_id] is None]
+    evaluator_streamers = get_streams_from_db(unknown) if unknown else {}
+    return [
+        StreamStatus(
+            stream_id=str(stream_uuid_obj),
+            status=stored[stream_uuid_obj]
+            if stored[stream_uuid_obj] is not None
+            else get_streamer_status(evaluator_streamers[stream_uuid_obj]),
+        )
+        for stream_uuid_obj in stream_uuid_objs
+    ]
+
+
 @router.post("/streams")
 def create_stream(
     stream: Stream, user_id: Annotated[str, Depends(is_user_authenticated)]
@@ -102,41 +155,86 @@ def create_stream(
 
 
 @router.get("/streams/{stream_id}/status")
-def get_stream_status(stream_id: str) -> StreamStatus:
+def get_stream_status(
+    stream_id: str,
+    response: Response,
+    if_none_match: Annotated[Optional[str], Header()] = None,
+) -> StreamStatus:
     try:
         uuid_obj = get_stream_uuid_object(stream_id)
-        evaluator_streamer = get_stream_from_db(uuid_obj)
-        if not evaluator_streamer.has_started:
-            return StreamStatus(stream_id=stream_id, status="NOT_STARTED")
-        for value in evaluator_streamer.get_all_algorithm_status().values():
-            if value.name != "COMPLETED":
-                return StreamStatus(stream_id=stream_id, status="IN_PROGRESS")
+        version = get_stream_version(uuid_obj)
+        etag = get_stream_etag(uuid_obj, version)
+        if is_etag_match(if_none_match, etag):
+            return not_modified_response(etag)
+        response.headers["ETag"] = etag
+        evaluator_streamer = get_stream_from_db(uuid_obj, version)
+        return StreamStatus(
+            stream_id=stream_id, status=get_streamer_status(evaluator_streamer)
+        )
     except (InvalidUUIDException, GetEvaluatorStreamErrorException) as e:
         raise HTTPException(status_code=e.status_code, detail=e.message)
 
-    return StreamStatus(stream_id=stream_id, status="COMPLETED")
-
 
 @router.get("/streams/user")
 def get_user_stream_statuses(
     user_id: Annotated[str, Depends(is_user_authenticated)],
+    response: Response,
+    limit: Optional[int] = Query(
+        None,
+        ge=1,
+        le=STREAM_LIST_MAX_LIMIT,
+        description="Streams per page, all streams are returned when omitted",
+    ),
+    cursor: Optional[str] = Query(
+        None, description=f"{NEXT_CURSOR_HEADER} header of the previous page"
+    ),
+    dataset_id: Optional[str] = Query(None),
+    status: Optional[StreamStatusEnum] = Query(None),
+    created_after: Optional[datetime] = Query(None),
+    created_before: Optional[datetime] = Query(None),
+    order: Literal["asc", "desc"] = Query("asc", description="Order of creation"),
 ) -> List[StreamStatus]:
-    stream_statuses: list[StreamStatus] = []
+    """
+    Streams of the user ordered by creation time. When a limit is given and
+    more streams follow, the cursor of the next page is in the
+    X-Next-Cursor header
+    """
     try:
-        stream_uuid_objs = get_user_stream_ids_from_db(user_id)
-        for stream_uuid_obj in stream_uuid_objs:
-            evaluator_streamer = get_stream_from_db(stream_uuid_obj)
-            status = "COMPLETED"
-            for value in evaluator_streamer.get_all_algorithm_status().values():
-                if value.name != "COMPLETED":
-                    status = "IN_PROGRESS"
-            if not evaluator_streamer.has_started:
-                status = "NOT_STARTED"
-            stream_statuses.append(
-                StreamStatus(stream_id=str(stream_uuid_obj), status=status)
+        rows = get_user_streams_page(
+            user_id,
+            # one more than the page to tell whether another page follows
+            limit=None if limit is None else limit + 1,
+            after=decode_cursor(cursor) if cursor is not None else None,
+            descending=order == "desc",
+            dataset_id=dataset_id,
+            status=status.value if status is not None else None,
+            created_after=created_after,
+            created_before=created_before,
+        )
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            last_stream_id, _, last_created_at = rows[-1]
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+                last_created_at, last_stream_id
             )
-        return stream_statuses
-    except (DatabaseErrorException, GetEvaluatorStreamErrorException) as e:
+
+        # streams created before their status was stored, until it is backfilled
+        unknown = [stream_id for stream_id, stored, _ in rows if stored is None]
+        evaluator_streamers = get_streams_from_db(unknown) if unknown else {}
+        return [
+            StreamStatus(
+                stream_id=str(stream_id),
+                status=stored
+                if stored is not None
+                else get_streamer_status(evaluator_streamers[stream_id]),
+            )
+            for stream_id, stored, _ in rows
+        ]
+    except (
+        InvalidCursorException,
+        DatabaseErrorException,
+        GetEvaluatorStreamErrorException,
+    ) as e:
         raise HTTPException(status_code=e.status_code, detail=e.message)
     except Exception as e:
         raise HTTPException(
@@ -144,45 +242,66 @@ def get_user_stream_statuses(
         )
 
 
+@router.post("/streams/statuses")
+def get_streams_statuses(request: StreamStatusesRequest) -> List[StreamStatus]:
+    """Statuses of the given streams, in the order of the request"""
+    try:
+        stream_uuid_objs = [
+            get_stream_uuid_object(stream_id) for stream_id in request.stream_ids
+        ]
+        return get_stream_statuses(stream_uuid_objs)
+    except (InvalidUUIDException, GetEvaluatorStreamErrorException) as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error getting stream statuses: {str(e)}"
+        )
+
+
 @router.get("/streams/{stream_id}/settings")
-def get_stream_settings(stream_id: str) -> StreamSettings:
+def get_stream_settings(
+    stream_id: str, if_none_match: Annotated[Optional[str], Header()] = None
+) -> StreamSettings:
     try:
         uuid_obj = get_stream_uuid_object(stream_id)
-        evaluator_streamer, dataset_id = get_stream_from_db_with_dataset_id(uuid_obj)
-        if evaluator_streamer.setting._sliding_window_setting:
-            sliding_window_setting = cast(
-                SlidingWindowSetting, evaluator_streamer.setting
+        version = get_stream_version(uuid_obj)
+        etag = get_stream_etag(uuid_obj, version)
+        if is_etag_match(if_none_match, etag):
+            return not_modified_response(etag)
+        settings, dataset_id, current_window = get_stored_stream_settings(uuid_obj)
+        if settings is None:
+            # created before settings were stored, read them from the stream once
+            evaluator_streamer, dataset_id = get_stream_from_db_with_dataset_id(
+                uuid_obj, version
             )
-
-            n_seq_data = sliding_window_setting.n_seq_data
-            window_size = sliding_window_setting.window_size
-            background_t = sliding_window_setting.t
-            top_k = sliding_window_setting.top_K
-            metric_names = [entry.name for entry in evaluator_streamer.metric_entries]
-            number_of_windows = sliding_window_setting.num_split
+            settings = get_streamer_settings(evaluator_streamer)
             current_window = evaluator_streamer._run_step
+            if settings is None:
+                raise HTTPException(
+                    status_code=501,
+                    detail="Other settings are currently not supported",
+                )
+            save_stream_settings(uuid_obj, settings)
 
-            data = {
-                "n_seq_data": n_seq_data,
-                "window_size": window_size,
-                "background_t": background_t,
-                "top_k": top_k,
-                "metrics": metric_names,
-                "dataset_id": dataset_id,
-                "number_of_windows": number_of_windows,
-                "current_window": current_window,
-            }
-
-            json_data = jsonable_encoder(data)
-
-            return JSONResponse(content=json_data)
-        else:
-            raise HTTPException(
-                status_code=501, detail="Other settings are currently not supported"
-            )
+        data = {
+            "n_seq_data": settings["n_seq_data"],
+            "window_size": settings["window_size"],
+            "background_t": settings["background_t"],
+            "top_k": settings["top_k"],
+            "metrics": settings["metrics"],
+            "dataset_id": dataset_id,
+            "number_of_windows": settings["number_of_windows"],
+            "current_window": current_window,
+        }
+
+        return json_bytes_response(encode_json(data), headers={"ETag": etag})
     except HTTPException:
         raise
-    except (InvalidUUIDException, GetEvaluatorStreamErrorException) as e:
+    except (
+        InvalidUUIDException,
+        GetEvaluatorStreamErrorException,
+        DatabaseErrorException,
+    ) as e:
         raise HTTPException(status_code=e.status_code, detail=e.message)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -192,9 +311,12 @@ def get_stream_settings(stream_id: str) -> StreamSettings:
 def start_stream(stream_id: str) -> StartStreamResponse:
     try:
         uuid_obj = get_stream_uuid_object(stream_id)
-        evaluator_streamer = get_stream_from_db(uuid_obj)
-        evaluator_streamer.start_stream()
-        update_stream(uuid_obj, evaluator_streamer)
+        run_stream_operation(
+            uuid_obj,
+            lambda evaluator_streamer: evaluator_streamer.start_stream(),
+            get_stream_from_db,
+            update_stream,
+        )
         return {"status": True}
     except (
         InvalidUUIDException,
@@ -208,6 +330,79 @@ def start_stream(stream_id: str) -> StartStreamResponse:
         raise HTTPException(status_code=500, detail=f"Error Starting Stream: {str(e)}")
 
 
+LEASE_DURATION_QUERY = Query(
+    STREAM_LEASE_DEFAULT_SECONDS,
+    ge=1,
+    le=STREAM_LEASE_MAX_SECONDS,
+    description="Seconds until the lease runs out unless it is renewed",
+)
+
+
+@router.post("/streams/{stream_id}/lease", status_code=201)
+def lease_stream(
+    stream_id: str, duration: int = LEASE_DURATION_QUERY
+) -> StreamLeaseResponse:
+    """
+    Lease the stream to the worker serving this request. Until the lease is
+    released or runs out, that worker keeps the stream in memory and stores
+    only a record of each change, so requests for the stream have to reach it
+    """
+    try:
+        uuid_obj = get_stream_uuid_object(stream_id)
+        lease = acquire_stream_lease(uuid_obj, duration)
+        return {"lease_id": str(lease.lease_id), "expires_at": lease.expires_at}
+    except (
+        InvalidUUIDException,
+        GetEvaluatorStreamErrorException,
+        StreamLeaseException,
+        DatabaseErrorException,
+    ) as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error Leasing Stream: {str(e)}")
+
+
+@router.post("/streams/{stream_id}/lease/{lease_id}/renew")
+def renew_stream_lease(
+    stream_id: str, lease_id: str, duration: int = LEASE_DURATION_QUERY
+) -> StreamLeaseResponse:
+    try:
+        uuid_obj = get_stream_uuid_object(stream_id)
+        lease_uuid_obj = get_lease_uuid_object(lease_id)
+        expires_at = extend_stream_lease(uuid_obj, lease_uuid_obj, duration)
+        return {"lease_id": lease_id, "expires_at": expires_at}
+    except (
+        InvalidUUIDException,
+        StreamLeaseException,
+        DatabaseErrorException,
+    ) as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error Renewing Stream Lease: {str(e)}"
+        )
+
+
+@router.delete("/streams/{stream_id}/lease/{lease_id}")
+def release_lease(stream_id: str, lease_id: str) -> ReleaseStreamLeaseResponse:
+    """Store the leased stream and end the lease"""
+    try:
+        uuid_obj = get_stream_uuid_object(stream_id)
+        lease_uuid_obj = get_lease_uuid_object(lease_id)
+        release_stream_lease(uuid_obj, lease_uuid_obj)
+        return {"status": True}
+    except (
+        InvalidUUIDException,
+        StreamLeaseException,
+        DatabaseErrorException,
+    ) as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error Releasing Stream Lease: {str(e)}"
+        )
+
+
 @router.get("/streams/{stream_id}/check_access")
 def check_stream_access(
     stream_id: str, user_id: Annotated[str, Depends(is_user_authenticated)]
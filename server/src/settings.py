@@ -13,3 +13,70 @@ DBNAME = os.getenv("dbname")
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 SERVER_BASE_URL = os.getenv("SERVER_BASE_URL")
+
+# upper bound on the memory held by the per-window encoded payload cache
+PAYLOAD_CACHE_MAX_BYTES = int(os.getenv("PAYLOAD_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+# prediction submissions run in a bounded thread pool per worker process, and
+# requests beyond the queue limit are turned away with 429 and Retry-After
+SUBMISSION_MAX_WORKERS = int(os.getenv("SUBMISSION_MAX_WORKERS", 4))
+SUBMISSION_MAX_QUEUE = int(os.getenv("SUBMISSION_MAX_QUEUE", 16))
+SUBMISSION_RETRY_AFTER_SECONDS = int(os.getenv("SUBMISSION_RETRY_AFTER_SECONDS", 2))
+# asynchronous submissions are evaluated on a pool of their own, one stream per
+# thread, so background work never takes the slots of waiting requests
+SUBMISSION_DRAIN_MAX_WORKERS = int(os.getenv("SUBMISSION_DRAIN_MAX_WORKERS", 2))
+# submissions claimed by a worker that has not finished them within this time,
+# e.g. because it died, are put back to pending on startup
+SUBMISSION_CLAIM_TIMEOUT_SECONDS = int(
+    os.getenv("SUBMISSION_CLAIM_TIMEOUT_SECONDS", 5 * 60)
+)
+
+# chunked prediction uploads are assembled in memory and dropped when idle
+UPLOAD_SESSION_TTL_SECONDS = int(os.getenv("UPLOAD_SESSION_TTL_SECONDS", 60 * 60))
+UPLOAD_SESSION_MAX_BYTES = int(
+    os.getenv("UPLOAD_SESSION_MAX_BYTES", 1024 * 1024 * 1024)
+)
+
+# replies to requests sent with an Idempotency-Key are kept this long
+IDEMPOTENCY_KEY_TTL_SECONDS = int(
+    os.getenv("IDEMPOTENCY_KEY_TTL_SECONDS", 24 * 60 * 60)
+)
+# a key whose request has not answered within this time, e.g. because its
+# worker died, may be claimed again by a retry
+IDEMPOTENCY_CLAIM_TIMEOUT_SECONDS = int(
+    os.getenv("IDEMPOTENCY_CLAIM_TIMEOUT_SECONDS", 5 * 60)
+)
+
+# number of streams whose current-window prediction validation index is cached
+VALIDATION_INDEX_CACHE_SIZE = int(os.getenv("VALIDATION_INDEX_CACHE_SIZE", 128))
+
+# relay algorithm state events between worker processes through postgres
+# LISTEN/NOTIFY, without it events only reach subscribers of the same process
+STATE_EVENTS_LISTEN_NOTIFY = os.getenv(
+    "STATE_EVENTS_LISTEN_NOTIFY", "false"
+).lower() in ("1", "true", "yes")
+STATE_EVENTS_KEEPALIVE_SECONDS = int(os.getenv("STATE_EVENTS_KEEPALIVE_SECONDS", 15))
+
+# a leased stream is kept in memory by the worker that holds the lease and is
+# flushed to the database when the lease is released or runs out
+STREAM_LEASE_DEFAULT_SECONDS = int(os.getenv("STREAM_LEASE_DEFAULT_SECONDS", 5 * 60))
+STREAM_LEASE_MAX_SECONDS = int(os.getenv("STREAM_LEASE_MAX_SECONDS", 60 * 60))
+STREAM_LEASE_SWEEP_SECONDS = int(os.getenv("STREAM_LEASE_SWEEP_SECONDS", 5))
+
+# evaluation sessions waiting for other algorithms check this often whether the
+# stream was updated through the REST endpoints in the meantime
+EVALUATION_SESSION_POLL_SECONDS = float(os.getenv("EVALUATION_SESSION_POLL_SECONDS", 5))
+
+# streams looked up together are unpickled on this many threads
+STREAM_DECODE_MAX_WORKERS = int(os.getenv("STREAM_DECODE_MAX_WORKERS", 4))
+
+# streams created before their status was stored get it in the background after
+# startup, this many at a time
+STREAM_STATUS_BACKFILL_BATCH_SIZE = int(
+    os.getenv("STREAM_STATUS_BACKFILL_BATCH_SIZE", 50)
+)
+
+# largest page the stream listing returns when a limit is requested
+STREAM_LIST_MAX_LIMIT = int(os.getenv("STREAM_LIST_MAX_LIMIT", 100))
+# most streams whose statuses one request may look up
+STREAM_STATUSES_MAX_IDS = int(os.getenv("STREAM_STATUSES_MAX_IDS", 100))
@@ -0,0 +1,64 @@
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+MAIN_COLUMNS = ["interactionid", "uid", "iid", "ts"]
+ID_COLUMNS = {"interactionid", "uid", "iid"}
+TIMESTAMP_COLUMN = "ts"
+
+_INT32_INFO = np.iinfo(np.int32)
+
+
+class InvalidColumnsException(Exception):
+    def __init__(self, message="Invalid columns requested", status_code=400):
+        self.message = message
+        self.status_code = status_code
+        super().__init__(self.message)
+
+
+def resolve_columns(
+    available_columns: List[str],
+    columns: Optional[str],
+    include_additional_features: bool,
+) -> List[str]:
+    if columns is None:
+        if include_additional_features:
+            return list(available_columns)
+        return list(MAIN_COLUMNS)
+
+    requested_columns = list(
+        dict.fromkeys(column.strip() for column in columns.split(",") if column.strip())
+    )
+    if not requested_columns:
+        raise InvalidColumnsException(message="At least one column must be requested")
+    unknown_columns = [
+        column for column in requested_columns if column not in available_columns
+    ]
+    if unknown_columns:
+        raise InvalidColumnsException(
+            message=f"Unknown columns requested: {', '.join(unknown_columns)}"
+        )
+    return requested_columns
+
+
+def downcast_column(column: str, series: pd.Series) -> pd.Series:
+    if not pd.api.types.is_integer_dtype(series.dtype):
+        return series
+    if column == TIMESTAMP_COLUMN:
+        return series.astype(np.int64)
+    if column in ID_COLUMNS and series.dtype != np.int32 and len(series) > 0:
+        if series.min() >= _INT32_INFO.min and series.max() <= _INT32_INFO.max:
+            return series.astype(np.int32)
+    return series
+
+
+def project_interaction_columns(df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """
+    Select columns from an interaction dataframe without copying the whole frame,
+    downcasting ID columns to int32 and timestamps to int64
+    """
+    return pd.DataFrame(
+        {column: downcast_column(column, df[column]) for column in columns},
+        copy=False,
+    )
@@ -1,11 +1,42 @@
 import pickle
 import uuid
-from typing import Tuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
 
+from sqlalchemy import delete, func, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import defer
 from sqlmodel import Session, select
 from streamsightv2.evaluators.evaluator_stream import EvaluatorStreamer
 
-from src.database import EvaluatorStreamModel, get_sql_connection
+from src.database import (
+    EvaluatorStreamModel,
+    IdempotencyRecordModel,
+    PredictionSubmissionModel,
+    StreamOperationModel,
+    get_sql_connection,
+)
+from src.models.prediction_models import SubmissionStatusEnum
+from src.models.stream_management_models import StreamStatusEnum
+from src.settings import (
+    IDEMPOTENCY_CLAIM_TIMEOUT_SECONDS,
+    IDEMPOTENCY_KEY_TTL_SECONDS,
+    STREAM_DECODE_MAX_WORKERS,
+    SUBMISSION_CLAIM_TIMEOUT_SECONDS,
+)
+from src.utils.single_flight import SingleFlight
+from src.utils.state_events import get_algorithm_states, publish_algorithm_states
+from src.utils.stream_leases import (
+    WORKER_ID,
+    LeasedEvaluatorStreamer,
+    StreamLease,
+    add_stream_lease,
+    as_utc,
+    get_stream_lease,
+    replay_stream_operations,
+)
+from src.utils.stream_settings import get_streamer_settings
 
 
 class GetEvaluatorStreamErrorException(Exception):
@@ -24,20 +55,157 @@ class DatabaseErrorException(Exception):
         super().__init__(self.message)
 
 
-def get_stream_from_db(stream_id: uuid.UUID) -> EvaluatorStreamer:
+class StreamVersionConflictException(Exception):
+    def __init__(
+        self,
+        message="Evaluator stream was modified by another request",
+        status_code=409,
+    ):
+        self.message = message
+        self.status_code = status_code
+        super().__init__(self.message)
+
+
+class StreamLeaseException(Exception):
+    def __init__(self, message="Evaluator stream is already leased", status_code=409):
+        self.message = message
+        self.status_code = status_code
+        super().__init__(self.message)
+
+
+# stream rows being read, keyed by stream ID and version
+_stream_row_reads = SingleFlight()
+
+
+def lock_stream(session: Session, stream_id: uuid.UUID) -> EvaluatorStreamModel:
+    evaluator_stream = session.exec(
+        select(EvaluatorStreamModel)
+        .where(EvaluatorStreamModel.stream_id == stream_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    ).first()
+    if not evaluator_stream:
+        raise GetEvaluatorStreamErrorException(
+            message=f"Evaluator stream with ID {stream_id} not found",
+            status_code=404,
+        )
+    return evaluator_stream
+
+
+def is_lease_active(evaluator_stream: EvaluatorStreamModel) -> bool:
+    return evaluator_stream.lease_id is not None and as_utc(
+        evaluator_stream.lease_expires_at
+    ) > datetime.now(timezone.utc)
+
+
+def get_streamer_status(evaluator_streamer: EvaluatorStreamer) -> StreamStatusEnum:
+    if not evaluator_streamer.has_started:
+        return StreamStatusEnum.NOT_STARTED
+    for value in evaluator_streamer.get_all_algorithm_status().values():
+        if value.name != "COMPLETED":
+            return StreamStatusEnum.IN_PROGRESS
+    return StreamStatusEnum.COMPLETED
+
+
+def unpickle_stream(stream_object: bytes) -> EvaluatorStreamer:
+    eval_streamer: EvaluatorStreamer = pickle.loads(stream_object)
+    eval_streamer.restore()
+    return eval_streamer
+
+
+def recover_expired_lease(
+    session: Session, evaluator_stream: EvaluatorStreamModel
+) -> EvaluatorStreamer:
+    """
+    Bring a locked stream whose lease ran out up to date by replaying the
+    operations recorded under the lease, and clear the lease. The caller commits
+    """
+    eval_streamer = unpickle_stream(evaluator_stream.stream_object)
+    operations = session.exec(
+        select(StreamOperationModel.method, StreamOperationModel.arguments)
+        .where(StreamOperationModel.stream_id == evaluator_stream.stream_id)
+        .where(StreamOperationModel.lease_id == evaluator_stream.lease_id)
+        .order_by(StreamOperationModel.operation_id)
+    ).all()
+    if operations:
+        replay_stream_operations(eval_streamer, operations)
+        evaluator_stream.current_window = eval_streamer._run_step
+        evaluator_stream.status = get_streamer_status(eval_streamer).value
+        eval_streamer.prepare_dump()
+        try:
+            evaluator_stream.stream_object = pickle.dumps(eval_streamer)
+        finally:
+            eval_streamer.restore()
+        evaluator_stream.version = evaluator_stream.version + 1
+        session.execute(
+            delete(StreamOperationModel)
+            .where(StreamOperationModel.stream_id == evaluator_stream.stream_id)
+            .where(StreamOperationModel.lease_id == evaluator_stream.lease_id)
+        )
+    evaluator_stream.lease_id = None
+    evaluator_stream.lease_owner = None
+    evaluator_stream.lease_expires_at = None
+    session.add(evaluator_stream)
+    return eval_streamer
+
+
+def load_stream_object(
+    session: Session, evaluator_stream: EvaluatorStreamModel
+) -> EvaluatorStreamer:
+    """Unpickle a stored stream, the stored object of a leased stream is stale"""
+    if evaluator_stream.lease_id is not None:
+        evaluator_stream = lock_stream(session, evaluator_stream.stream_id)
+    if is_lease_active(evaluator_stream):
+        raise GetEvaluatorStreamErrorException(
+            message=f"Evaluator stream with ID {evaluator_stream.stream_id} "
+            "is leased by another worker",
+            status_code=409,
+        )
+    if evaluator_stream.lease_id is not None:
+        eval_streamer = recover_expired_lease(session, evaluator_stream)
+        session.commit()
+        return eval_streamer
+    return unpickle_stream(evaluator_stream.stream_object)
+
+
+def read_stream_row(stream_id: uuid.UUID) -> EvaluatorStreamModel:
+    with Session(get_sql_connection()) as session:
+        evaluator_stream = session.get(EvaluatorStreamModel, stream_id)
+        if not evaluator_stream:
+            raise GetEvaluatorStreamErrorException(
+                message=f"Evaluator stream with ID {stream_id} not found",
+                status_code=404,
+            )
+        session.expunge(evaluator_stream)
+        return evaluator_stream
+
+
+def get_stream_row(
+    stream_id: uuid.UUID, version: Optional[int] = None
+) -> EvaluatorStreamModel:
+    """
+    Read the row of a stream. Callers that already read the stream version share
+    one query with concurrent reads of that version, in which case the row is
+    shared between them and must not be modified
+    """
+    if version is None:
+        return read_stream_row(stream_id)
+    return _stream_row_reads.do(
+        (stream_id, version), lambda: read_stream_row(stream_id)
+    )
+
+
+def get_stream_from_db(
+    stream_id: uuid.UUID, version: Optional[int] = None
+) -> EvaluatorStreamer:
+    lease = get_stream_lease(stream_id)
+    if lease is not None:
+        return lease.streamer
     try:
+        evaluator_stream = get_stream_row(stream_id, version)
+        # every caller unpickles its own streamer, requests modify it
         with Session(get_sql_connection()) as session:
-            evaluator_stream = session.get(EvaluatorStreamModel, stream_id)
-            if not evaluator_stream:
-                raise GetEvaluatorStreamErrorException(
-                    message=f"Evaluator stream with ID {stream_id} not found",
-                    status_code=404,
-                )
-            eval_streamer: EvaluatorStreamer = pickle.loads(
-                evaluator_stream.stream_object
-            )
-            eval_streamer.restore()
-            return eval_streamer
+            return load_stream_object(session, evaluator_stream)
     except GetEvaluatorStreamErrorException as e:
         raise e
     except Exception as e:
@@ -47,20 +215,15 @@ def get_stream_from_db(stream_id: uuid.UUID) -> EvaluatorStreamer:
 
 
 def get_stream_from_db_with_dataset_id(
-    stream_id: uuid.UUID,
+    stream_id: uuid.UUID, version: Optional[int] = None
 ) -> Tuple[EvaluatorStreamer, str]:
+    lease = get_stream_lease(stream_id)
+    if lease is not None:
+        return lease.streamer, lease.dataset_id
     try:
+        evaluator_stream = get_stream_row(stream_id, version)
         with Session(get_sql_connection()) as session:
-            evaluator_stream = session.get(EvaluatorStreamModel, stream_id)
-            if not evaluator_stream:
-                raise GetEvaluatorStreamErrorException(
-                    message=f"Evaluator stream with ID {stream_id} not found",
-                    status_code=404,
-                )
-            eval_streamer: EvaluatorStreamer = pickle.loads(
-                evaluator_stream.stream_object
-            )
-            eval_streamer.restore()
+            eval_streamer = load_stream_object(session, evaluator_stream)
             return eval_streamer, evaluator_stream.dataset_id
     except GetEvaluatorStreamErrorException as e:
         raise e
@@ -70,19 +233,94 @@ def get_stream_from_db_with_dataset_id(
         )
 
 
+def get_streams_from_db(
+    stream_ids: List[uuid.UUID],
+) -> Dict[uuid.UUID, EvaluatorStreamer]:
+    """
+    Load several streams with one query and unpickle them in parallel. Leased
+    streams are loaded one by one, their stored object may be behind
+    """
+    stream_ids = list(dict.fromkeys(stream_ids))
+    eval_streamers: Dict[uuid.UUID, EvaluatorStreamer] = {}
+    try:
+        with Session(get_sql_connection()) as session:
+            rows = session.exec(
+                select(
+                    EvaluatorStreamModel.stream_id,
+                    EvaluatorStreamModel.stream_object,
+                    EvaluatorStreamModel.lease_id,
+                ).where(EvaluatorStreamModel.stream_id.in_(stream_ids))
+            ).all()
+        missing = set(stream_ids) - {row.stream_id for row in rows}
+        if missing:
+            raise GetEvaluatorStreamErrorException(
+                message="Evaluator streams not found: "
+                + ", ".join(
+                    str(stream_id) for stream_id in stream_ids if stream_id in missing
+                ),
+                status_code=404,
+            )
+
+        stored = [row for row in rows if row.lease_id is None]
+        for row in rows:
+            if row.lease_id is not None:
+                eval_streamers[row.stream_id] = get_stream_from_db(row.stream_id)
+        if stored:
+            with ThreadPoolExecutor(
+                max_workers=min(STREAM_DECODE_MAX_WORKERS, len(stored)),
+                thread_name_prefix="stream-decode",
+            ) as executor:
+                decoded = executor.map(
+                    unpickle_stream, [row.stream_object for row in stored]
+                )
+                for row, eval_streamer in zip(stored, decoded):
+                    eval_streamers[row.stream_id] = eval_streamer
+        return eval_streamers
+    except GetEvaluatorStreamErrorException as e:
+        raise e
+    except Exception as e:
+        raise GetEvaluatorStreamErrorException(
+            message="Error getting evaluator streams from database: " + str(e)
+        )
+
+
+def get_stored_stream_statuses(
+    stream_ids: List[uuid.UUID],
+) -> Dict[uuid.UUID, Optional[str]]:
+    """Stored statuses of several streams, None for streams not backfilled yet"""
+    try:
+        with Session(get_sql_connection()) as session:
+            rows = session.exec(
+                select(
+                    EvaluatorStreamModel.stream_id, EvaluatorStreamModel.status
+                ).where(EvaluatorStreamModel.stream_id.in_(stream_ids))
+            ).all()
+        statuses = {row.stream_id: row.status for row in rows}
+        missing = [stream_id for stream_id in stream_ids if stream_id not in statuses]
+        if missing:
+            raise GetEvaluatorStreamErrorException(
+                message="Evaluator streams not found: "
+                + ", ".join(str(stream_id) for stream_id in dict.fromkeys(missing)),
+                status_code=404,
+            )
+        return statuses
+    except GetEvaluatorStreamErrorException as e:
+        raise e
+    except Exception as e:
+        raise GetEvaluatorStreamErrorException(
+            message="Error getting evaluator stream statuses from database: " + str(e)
+        )
+
+
 def is_user_stream(stream_id: uuid.UUID, user_id: str) -> bool:
     try:
         with Session(get_sql_connection()) as session:
             statement = (
-                select(EvaluatorStreamModel)
+                select(EvaluatorStreamModel.stream_id)
                 .where(EvaluatorStreamModel.stream_id == stream_id)
                 .where(EvaluatorStreamModel.user_id == user_id)
             )
-            results = session.exec(statement)
-            stream = results.first()
-            if not stream:
-                return False
-            return True
+            return session.exec(statement).first() is not None
     except GetEvaluatorStreamErrorException as e:
         raise e
     except Exception as e:
@@ -91,31 +329,415 @@ def is_user_stream(stream_id: uuid.UUID, user_id: str) -> bool:
         )
 
 
-def update_stream(stream_id: uuid.UUID, evaluator_streamer: EvaluatorStreamer):
+def get_stream_version(stream_id: uuid.UUID) -> int:
+    try:
+        with Session(get_sql_connection()) as session:
+            statement = select(EvaluatorStreamModel.version).where(
+                EvaluatorStreamModel.stream_id == stream_id
+            )
+            version = session.exec(statement).first()
+            if version is None:
+                raise GetEvaluatorStreamErrorException(
+                    message=f"Evaluator stream with ID {stream_id} not found",
+                    status_code=404,
+                )
+            return version
+    except GetEvaluatorStreamErrorException as e:
+        raise e
+    except Exception as e:
+        raise GetEvaluatorStreamErrorException(
+            message="Error getting evaluator stream version from database: " + str(e)
+        )
+
+
+def get_stream_window(stream_id: uuid.UUID) -> int:
     try:
         with Session(get_sql_connection()) as session:
-            statement = select(EvaluatorStreamModel).where(
+            statement = select(EvaluatorStreamModel.current_window).where(
                 EvaluatorStreamModel.stream_id == stream_id
             )
+            current_window = session.exec(statement).first()
+            if current_window is None:
+                raise GetEvaluatorStreamErrorException(
+                    message=f"Evaluator stream with ID {stream_id} not found",
+                    status_code=404,
+                )
+            return current_window
+    except GetEvaluatorStreamErrorException as e:
+        raise e
+    except Exception as e:
+        raise GetEvaluatorStreamErrorException(
+            message="Error getting evaluator stream window from database: " + str(e)
+        )
+
+
+def store_stream_object(
+    stream: EvaluatorStreamModel, evaluator_streamer: EvaluatorStreamer
+):
+    """
+    Write a loaded streamer back to its row and bump the version. A leased
+    streamer stays in memory, its operations are already in the write-ahead log
+    """
+    stream.current_window = evaluator_streamer._run_step
+    stream.status = get_streamer_status(evaluator_streamer).value
+    if isinstance(evaluator_streamer, LeasedEvaluatorStreamer):
+        if stream.lease_id != evaluator_streamer._lease.lease_id:
+            raise DatabaseErrorException(
+                message=f"Lease of evaluator stream with ID {stream.stream_id} "
+                "has ended",
+                status_code=409,
+            )
+    elif stream.lease_id is not None:
+        raise DatabaseErrorException(
+            message=f"Evaluator stream with ID {stream.stream_id} "
+            "was leased while it was being updated",
+            status_code=409,
+        )
+    else:
+        evaluator_streamer.prepare_dump()
+        stream.stream_object = pickle.dumps(evaluator_streamer)
+    stream.version = EvaluatorStreamModel.version + 1
+
+
+def get_stored_stream_settings(
+    stream_id: uuid.UUID,
+) -> Tuple[Optional[Dict[str, Any]], str, int]:
+    """Stored settings, dataset and current window of a stream from one row read"""
+    try:
+        with Session(get_sql_connection()) as session:
+            row = session.exec(
+                select(
+                    EvaluatorStreamModel.settings,
+                    EvaluatorStreamModel.dataset_id,
+                    EvaluatorStreamModel.current_window,
+                ).where(EvaluatorStreamModel.stream_id == stream_id)
+            ).first()
+            if row is None:
+                raise GetEvaluatorStreamErrorException(
+                    message=f"Evaluator stream with ID {stream_id} not found",
+                    status_code=404,
+                )
+            return row.settings, row.dataset_id, row.current_window
+    except GetEvaluatorStreamErrorException as e:
+        raise e
+    except Exception as e:
+        raise GetEvaluatorStreamErrorException(
+            message="Error getting evaluator stream settings from database: " + str(e)
+        )
+
+
+def save_stream_settings(stream_id: uuid.UUID, settings: Dict[str, Any]):
+    """Store the settings of a stream created before they were stored"""
+    try:
+        with Session(get_sql_connection()) as session:
+            session.execute(
+                update(EvaluatorStreamModel)
+                .where(EvaluatorStreamModel.stream_id == stream_id)
+                .where(EvaluatorStreamModel.settings.is_(None))
+                .values(settings=settings)
+            )
+            session.commit()
+    except Exception as e:
+        raise DatabaseErrorException("Error saving stream settings: " + str(e))
+
+
+def update_stream(stream_id: uuid.UUID, evaluator_streamer: EvaluatorStreamer) -> int:
+    try:
+        with Session(get_sql_connection()) as session:
+            # the stored object is overwritten, never read
+            statement = (
+                select(EvaluatorStreamModel)
+                .where(EvaluatorStreamModel.stream_id == stream_id)
+                .options(defer(EvaluatorStreamModel.stream_object))
+            )
             results = session.exec(statement)
             stream = results.first()
 
-            evaluator_streamer.prepare_dump()
-            stream.stream_object = pickle.dumps(evaluator_streamer)
+            algorithm_states = get_algorithm_states(evaluator_streamer)
+            store_stream_object(stream, evaluator_streamer)
 
             session.add(stream)
             session.commit()
-            session.refresh(stream)
+            session.refresh(stream, ["version"])
+            publish_algorithm_states(stream_id, stream.version, algorithm_states)
+            return stream.version
+    except DatabaseErrorException as e:
+        raise e
     except Exception as e:
         raise DatabaseErrorException(
             "Error updating evaluator stream in database: " + str(e)
         )
 
 
+def checkpoint_stream(
+    stream_id: uuid.UUID, evaluator_streamer: EvaluatorStreamer, version: int
+) -> int:
+    """
+    Persist a stream that is kept in memory, provided nobody else has updated it
+    since the given version. The streamer remains usable afterwards
+    """
+    algorithm_states = get_algorithm_states(evaluator_streamer)
+    values = {
+        "current_window": evaluator_streamer._run_step,
+        "status": get_streamer_status(evaluator_streamer).value,
+        "version": EvaluatorStreamModel.version + 1,
+    }
+    if isinstance(evaluator_streamer, LeasedEvaluatorStreamer):
+        # the lease owns the stored object until it is flushed
+        lease_condition = (
+            EvaluatorStreamModel.lease_id == evaluator_streamer._lease.lease_id
+        )
+    else:
+        lease_condition = EvaluatorStreamModel.lease_id.is_(None)
+        evaluator_streamer.prepare_dump()
+        try:
+            values["stream_object"] = pickle.dumps(evaluator_streamer)
+        finally:
+            evaluator_streamer.restore()
+
+    try:
+        with Session(get_sql_connection()) as session:
+            new_version = session.execute(
+                update(EvaluatorStreamModel)
+                .where(
+                    EvaluatorStreamModel.stream_id == stream_id,
+                    EvaluatorStreamModel.version == version,
+                    lease_condition,
+                )
+                .values(**values)
+                .returning(EvaluatorStreamModel.version)
+            ).scalar_one_or_none()
+            session.commit()
+    except Exception as e:
+        raise DatabaseErrorException(
+            "Error checkpointing evaluator stream in database: " + str(e)
+        )
+    if new_version is None:
+        raise StreamVersionConflictException()
+    publish_algorithm_states(stream_id, new_version, algorithm_states)
+    return new_version
+
+
+def record_stream_operation(lease: StreamLease, method: str, arguments: bytes) -> int:
+    if lease.is_released:
+        raise DatabaseErrorException(
+            message=f"Lease of evaluator stream with ID {lease.stream_id} has ended",
+            status_code=409,
+        )
+    try:
+        with Session(get_sql_connection()) as session:
+            operation = StreamOperationModel(
+                stream_id=lease.stream_id,
+                lease_id=lease.lease_id,
+                method=method,
+                arguments=arguments,
+            )
+            session.add(operation)
+            session.commit()
+            return operation.operation_id
+    except Exception as e:
+        raise DatabaseErrorException("Error recording stream operation: " + str(e))
+
+
+def discard_stream_operations(
+    lease: StreamLease, operation_ids: List[int]
+) -> EvaluatorStreamer:
+    """
+    Remove failed operations from the write-ahead log and rebuild the leased
+    streamer from its stored object and the operations that remain
+    """
+    try:
+        with Session(get_sql_connection()) as session:
+            session.execute(
+                delete(StreamOperationModel)
+                .where(StreamOperationModel.stream_id == lease.stream_id)
+                .where(StreamOperationModel.lease_id == lease.lease_id)
+                .where(StreamOperationModel.operation_id.in_(operation_ids))
+            )
+            stream_object = session.exec(
+                select(EvaluatorStreamModel.stream_object).where(
+                    EvaluatorStreamModel.stream_id == lease.stream_id,
+                    EvaluatorStreamModel.lease_id == lease.lease_id,
+                )
+            ).one_or_none()
+            if stream_object is None:
+                raise StreamLeaseException(
+                    message=f"Lease of evaluator stream with ID {lease.stream_id} "
+                    "has ended"
+                )
+            operations = session.exec(
+                select(StreamOperationModel.method, StreamOperationModel.arguments)
+                .where(StreamOperationModel.stream_id == lease.stream_id)
+                .where(StreamOperationModel.lease_id == lease.lease_id)
+                .order_by(StreamOperationModel.operation_id)
+            ).all()
+            eval_streamer = unpickle_stream(stream_object)
+            replay_stream_operations(eval_streamer, operations)
+            session.commit()
+            return eval_streamer
+    except StreamLeaseException as e:
+        raise e
+    except Exception as e:
+        raise DatabaseErrorException("Error discarding stream operations: " + str(e))
+
+
+def acquire_stream_lease(stream_id: uuid.UUID, duration: int) -> StreamLease:
+    """
+    Lease a stream to this worker, which then keeps it in memory and records
+    its operations instead of storing the stream after every request
+    """
+    try:
+        with Session(get_sql_connection()) as session:
+            evaluator_stream = lock_stream(session, stream_id)
+            if is_lease_active(evaluator_stream):
+                raise StreamLeaseException(
+                    message=f"Evaluator stream with ID {stream_id} is already leased"
+                )
+            if evaluator_stream.lease_id is not None:
+                eval_streamer = recover_expired_lease(session, evaluator_stream)
+            else:
+                eval_streamer = unpickle_stream(evaluator_stream.stream_object)
+
+            lease_id = uuid.uuid4()
+            expires_at = datetime.now(timezone.utc) + timedelta(seconds=duration)
+            evaluator_stream.lease_id = lease_id
+            evaluator_stream.lease_owner = WORKER_ID
+            evaluator_stream.lease_expires_at = expires_at
+            session.add(evaluator_stream)
+            session.commit()
+            lease = StreamLease(
+                stream_id,
+                lease_id,
+                expires_at,
+                evaluator_stream.dataset_id,
+                eval_streamer,
+                record_stream_operation,
+                discard_stream_operations,
+            )
+    except (GetEvaluatorStreamErrorException, StreamLeaseException) as e:
+        raise e
+    except Exception as e:
+        raise DatabaseErrorException("Error acquiring stream lease: " + str(e))
+    add_stream_lease(lease)
+    return lease
+
+
+def renew_stream_lease(lease: StreamLease, duration: int) -> datetime:
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=duration)
+    try:
+        with Session(get_sql_connection()) as session:
+            result = session.execute(
+                update(EvaluatorStreamModel)
+                .where(
+                    EvaluatorStreamModel.stream_id == lease.stream_id,
+                    EvaluatorStreamModel.lease_id == lease.lease_id,
+                )
+                .values(lease_expires_at=expires_at)
+            )
+            session.commit()
+    except Exception as e:
+        raise DatabaseErrorException("Error renewing stream lease: " + str(e))
+    if result.rowcount == 0:
+        raise StreamLeaseException(
+            message=f"Lease of evaluator stream with ID {lease.stream_id} has ended"
+        )
+    lease.expires_at = expires_at
+    return expires_at
+
+
+def flush_stream_lease(lease: StreamLease, release: bool = False) -> int:
+    """
+    Store the leased streamer and drop the operations recorded so far, clearing
+    the lease when it is released
+    """
+    with lease.lock:
+        if lease.is_released:
+            raise StreamLeaseException(
+                message=f"Lease of evaluator stream with ID {lease.stream_id} has ended"
+            )
+        evaluator_streamer = lease.evaluator_streamer
+        current_window = evaluator_streamer._run_step
+        status = get_streamer_status(evaluator_streamer).value
+        algorithm_states = get_algorithm_states(evaluator_streamer)
+        evaluator_streamer.prepare_dump()
+        try:
+            stream_object = pickle.dumps(evaluator_streamer)
+        finally:
+            evaluator_streamer.restore()
+
+        values = {
+            "stream_object": stream_object,
+            "current_window": current_window,
+            "status": status,
+            "version": EvaluatorStreamModel.version + 1,
+        }
+        if release:
+            values.update(lease_id=None, lease_owner=None, lease_expires_at=None)
+        try:
+            with Session(get_sql_connection()) as session:
+                new_version = session.execute(
+                    update(EvaluatorStreamModel)
+                    .where(
+                        EvaluatorStreamModel.stream_id == lease.stream_id,
+                        EvaluatorStreamModel.lease_id == lease.lease_id,
+                    )
+                    .values(**values)
+                    .returning(EvaluatorStreamModel.version)
+                ).scalar_one_or_none()
+                session.execute(
+                    delete(StreamOperationModel)
+                    .where(StreamOperationModel.stream_id == lease.stream_id)
+                    .where(StreamOperationModel.lease_id == lease.lease_id)
+                )
+                session.commit()
+        except Exception as e:
+            raise DatabaseErrorException("Error flushing stream lease: " + str(e))
+        if new_version is None:
+            # the lease ran out and another worker recovered the stream
+            lease.is_released = True
+            raise StreamLeaseException(
+                message=f"Lease of evaluator stream with ID {lease.stream_id} has ended"
+            )
+        lease.operation_ids = []
+        if release:
+            lease.is_released = True
+    publish_algorithm_states(lease.stream_id, new_version, algorithm_states)
+    return new_version
+
+
+def recover_expired_stream_leases():
+    """Replay the operations of leases that ran out without being released"""
+    try:
+        with Session(get_sql_connection()) as session:
+            stream_ids = session.exec(
+                select(EvaluatorStreamModel.stream_id)
+                .where(EvaluatorStreamModel.lease_id.is_not(None))
+                .where(
+                    EvaluatorStreamModel.lease_expires_at <= datetime.now(timezone.utc)
+                )
+            ).all()
+        for stream_id in stream_ids:
+            with Session(get_sql_connection()) as session:
+                evaluator_stream = lock_stream(session, stream_id)
+                if evaluator_stream.lease_id is None or is_lease_active(
+                    evaluator_stream
+                ):
+                    continue
+                recover_expired_lease(session, evaluator_stream)
+                session.commit()
+    except Exception as e:
+        raise DatabaseErrorException(
+            "Error recovering expired stream leases: " + str(e)
+        )
+
+
 def write_stream_to_db(
     evaluator_streamer: EvaluatorStreamer, dataset_id: str, user_id: str
 ):
     try:
+        current_window = evaluator_streamer._run_step
+        status = get_streamer_status(evaluator_streamer).value
+        settings = get_streamer_settings(evaluator_streamer)
         evaluator_streamer.prepare_dump()
         evaluator_stream_obj = pickle.dumps(evaluator_streamer)
 
@@ -124,6 +746,9 @@ def write_stream_to_db(
                 stream_object=evaluator_stream_obj,
                 dataset_id=dataset_id,
                 user_id=uuid.UUID(user_id),
+                current_window=current_window,
+                status=status,
+                settings=settings,
             )
             session.add(new_stream)
             session.commit()
@@ -134,16 +759,407 @@ def write_stream_to_db(
         )
 
 
-def get_user_stream_ids_from_db(user_id: str) -> list[uuid.UUID]:
+def get_user_streams_page(
+    user_id: str,
+    limit: Optional[int] = None,
+    after: Optional[Tuple[datetime, uuid.UUID]] = None,
+    descending: bool = False,
+    dataset_id: Optional[str] = None,
+    status: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+) -> List[Tuple[uuid.UUID, Optional[str], datetime]]:
+    """
+    Page through the streams of a user ordered by creation time, starting after
+    the (created_at, stream_id) of the last stream of the previous page
+    """
     try:
         with Session(get_sql_connection()) as session:
-            statement = select(EvaluatorStreamModel).where(
-                EvaluatorStreamModel.user_id == user_id
+            statement = select(
+                EvaluatorStreamModel.stream_id,
+                EvaluatorStreamModel.status,
+                EvaluatorStreamModel.created_at,
+            ).where(EvaluatorStreamModel.user_id == user_id)
+            if dataset_id is not None:
+                statement = statement.where(
+                    EvaluatorStreamModel.dataset_id == dataset_id
+                )
+            if status is not None:
+                statement = statement.where(EvaluatorStreamModel.status == status)
+            if created_after is not None:
+                statement = statement.where(
+                    EvaluatorStreamModel.created_at >= created_after
+                )
+            if created_before is not None:
+                statement = statement.where(
+                    EvaluatorStreamModel.created_at < created_before
+                )
+            keyset = tuple_(
+                EvaluatorStreamModel.created_at, EvaluatorStreamModel.stream_id
             )
-            query_results = session.exec(statement)
-            results = query_results.all()
-            return [result.stream_id for result in results]
+            if after is not None:
+                statement = statement.where(
+                    keyset < tuple_(*after) if descending else keyset > tuple_(*after)
+                )
+            if descending:
+                statement = statement.order_by(
+                    EvaluatorStreamModel.created_at.desc(),
+                    EvaluatorStreamModel.stream_id.desc(),
+                )
+            else:
+                statement = statement.order_by(
+                    EvaluatorStreamModel.created_at, EvaluatorStreamModel.stream_id
+                )
+            if limit is not None:
+                statement = statement.limit(limit)
+            return [tuple(row) for row in session.exec(statement).all()]
+    except Exception as e:
+        raise DatabaseErrorException(
+            "Error getting user streams from database: " + str(e)
+        )
+
+
+def backfill_stream_statuses(
+    after: Optional[uuid.UUID], batch_size: int
+) -> Optional[uuid.UUID]:
+    """
+    Store the status of the next batch of streams created before it was kept in
+    its own column, returning the last stream of the batch or None when no
+    stream after the given one is missing its status
+    """
+    try:
+        with Session(get_sql_connection()) as session:
+            statement = (
+                select(EvaluatorStreamModel.stream_id)
+                .where(EvaluatorStreamModel.status.is_(None))
+                .order_by(EvaluatorStreamModel.stream_id)
+                .limit(batch_size)
+            )
+            if after is not None:
+                statement = statement.where(EvaluatorStreamModel.stream_id > after)
+            stream_ids = session.exec(statement).all()
+        if not stream_ids:
+            return None
+        evaluator_streamers = get_streams_from_db(stream_ids)
+        with Session(get_sql_connection()) as session:
+            for stream_id in stream_ids:
+                status = get_streamer_status(evaluator_streamers[stream_id]).value
+                session.execute(
+                    update(EvaluatorStreamModel)
+                    .where(EvaluatorStreamModel.stream_id == stream_id)
+                    .where(EvaluatorStreamModel.status.is_(None))
+                    .values(status=status)
+                )
+            session.commit()
+        return stream_ids[-1]
+    except Exception as e:
+        raise DatabaseErrorException("Error backfilling stream statuses: " + str(e))
+
+
+def write_prediction_submission(
+    stream_id: uuid.UUID, algorithm_id: uuid.UUID, prediction: Any
+) -> uuid.UUID:
+    try:
+        with Session(get_sql_connection()) as session:
+            submission = PredictionSubmissionModel(
+                stream_id=stream_id,
+                algorithm_id=algorithm_id,
+                prediction=pickle.dumps(prediction),
+            )
+            session.add(submission)
+            session.commit()
+            return submission.submission_id
+    except Exception as e:
+        raise DatabaseErrorException(
+            "Error writing prediction submission to database: " + str(e)
+        )
+
+
+def get_prediction_submission(
+    submission_id: uuid.UUID,
+) -> Optional[PredictionSubmissionModel]:
+    try:
+        with Session(get_sql_connection()) as session:
+            statement = select(
+                PredictionSubmissionModel.submission_id,
+                PredictionSubmissionModel.stream_id,
+                PredictionSubmissionModel.algorithm_id,
+                PredictionSubmissionModel.status,
+                PredictionSubmissionModel.error,
+                PredictionSubmissionModel.created_at,
+                PredictionSubmissionModel.completed_at,
+            ).where(PredictionSubmissionModel.submission_id == submission_id)
+            return session.exec(statement).first()
+    except Exception as e:
+        raise DatabaseErrorException(
+            "Error getting prediction submission from database: " + str(e)
+        )
+
+
+def claim_pending_prediction_submissions(stream_id: uuid.UUID) -> List[Any]:
+    """
+    Move the pending submissions of a stream to RUNNING and return them, so a
+    submission is evaluated by only one of the workers that drain the stream
+    """
+    try:
+        with Session(get_sql_connection()) as session:
+            submissions = session.execute(
+                update(PredictionSubmissionModel)
+                .where(PredictionSubmissionModel.stream_id == stream_id)
+                .where(
+                    PredictionSubmissionModel.status
+                    == SubmissionStatusEnum.PENDING.value
+                )
+                .values(
+                    status=SubmissionStatusEnum.RUNNING.value,
+                    claimed_at=datetime.now(timezone.utc),
+                )
+                .returning(
+                    PredictionSubmissionModel.submission_id,
+                    PredictionSubmissionModel.algorithm_id,
+                    PredictionSubmissionModel.prediction,
+                    PredictionSubmissionModel.created_at,
+                )
+            ).all()
+            session.commit()
+            return sorted(submissions, key=lambda submission: submission.created_at)
+    except Exception as e:
+        raise DatabaseErrorException(
+            "Error claiming pending prediction submissions in database: " + str(e)
+        )
+
+
+def release_prediction_submissions(submission_ids: List[uuid.UUID]):
+    """Put claimed submissions that were not evaluated back to pending"""
+    try:
+        with Session(get_sql_connection()) as session:
+            session.execute(
+                update(PredictionSubmissionModel)
+                .where(PredictionSubmissionModel.submission_id.in_(submission_ids))
+                .where(
+                    PredictionSubmissionModel.status
+                    == SubmissionStatusEnum.RUNNING.value
+                )
+                .values(status=SubmissionStatusEnum.PENDING.value, claimed_at=None)
+            )
+            session.commit()
+    except Exception as e:
+        raise DatabaseErrorException(
+            "Error releasing prediction submissions in database: " + str(e)
+        )
+
+
+def release_stale_submission_claims():
+    """Put submissions claimed by a worker that went away back to pending"""
+    try:
+        with Session(get_sql_connection()) as session:
+            stale_before = datetime.now(timezone.utc) - timedelta(
+                seconds=SUBMISSION_CLAIM_TIMEOUT_SECONDS
+            )
+            session.execute(
+                update(PredictionSubmissionModel)
+                .where(
+                    PredictionSubmissionModel.status
+                    == SubmissionStatusEnum.RUNNING.value
+                )
+                .where(
+                    func.coalesce(
+                        PredictionSubmissionModel.claimed_at,
+                        PredictionSubmissionModel.created_at,
+                    )
+                    < stale_before
+                )
+                .values(status=SubmissionStatusEnum.PENDING.value, claimed_at=None)
+            )
+            session.commit()
+    except Exception as e:
+        raise DatabaseErrorException(
+            "Error releasing stale prediction submission claims: " + str(e)
+        )
+
+
+def get_streams_with_pending_submissions() -> List[uuid.UUID]:
+    try:
+        with Session(get_sql_connection()) as session:
+            statement = (
+                select(PredictionSubmissionModel.stream_id)
+                .where(
+                    PredictionSubmissionModel.status
+                    == SubmissionStatusEnum.PENDING.value
+                )
+                .distinct()
+            )
+            return list(session.exec(statement).all())
+    except Exception as e:
+        raise DatabaseErrorException(
+            "Error getting streams with pending submissions from database: " + str(e)
+        )
+
+
+def store_submission_results(session: Session, errors: Dict[uuid.UUID, Optional[str]]):
+    completed_at = datetime.now(timezone.utc)
+    submissions = session.exec(
+        select(PredictionSubmissionModel)
+        .where(PredictionSubmissionModel.submission_id.in_(list(errors)))
+        .options(defer(PredictionSubmissionModel.prediction))
+    ).all()
+    for submission in submissions:
+        error = errors[submission.submission_id]
+        submission.status = (
+            SubmissionStatusEnum.FAILED.value
+            if error is not None
+            else SubmissionStatusEnum.COMPLETED.value
+        )
+        submission.error = error
+        submission.prediction = b""
+        submission.completed_at = completed_at
+        session.add(submission)
+
+
+def mark_prediction_submissions(errors: Dict[uuid.UUID, Optional[str]]):
+    """Mark evaluated submissions whose stream was persisted by another request"""
+    try:
+        with Session(get_sql_connection()) as session:
+            store_submission_results(session, errors)
+            session.commit()
+    except Exception as e:
+        raise DatabaseErrorException(
+            "Error marking prediction submissions in database: " + str(e)
+        )
+
+
+def complete_prediction_submissions(
+    stream_id: uuid.UUID,
+    evaluator_streamer: EvaluatorStreamer,
+    errors: Dict[uuid.UUID, Optional[str]],
+) -> int:
+    """
+    Persist the stream and mark its evaluated submissions in one transaction,
+    so a crash cannot leave submissions pending that were already applied
+    """
+    try:
+        with Session(get_sql_connection()) as session:
+            stream = session.exec(
+                select(EvaluatorStreamModel)
+                .where(EvaluatorStreamModel.stream_id == stream_id)
+                .options(defer(EvaluatorStreamModel.stream_object))
+            ).first()
+            algorithm_states = get_algorithm_states(evaluator_streamer)
+            store_stream_object(stream, evaluator_streamer)
+            session.add(stream)
+            store_submission_results(session, errors)
+            session.commit()
+            session.refresh(stream, ["version"])
+            publish_algorithm_states(stream_id, stream.version, algorithm_states)
+            return stream.version
+    except DatabaseErrorException as e:
+        raise e
+    except Exception as e:
+        raise DatabaseErrorException(
+            "Error completing prediction submissions in database: " + str(e)
+        )
+
+
+def claim_idempotency_key(
+    idempotency_key: str, method: str, path: str, request_hash: str
+) -> Optional[IdempotencyRecordModel]:
+    """
+    Atomically claim an idempotency key for a request, returns None when the
+    key was claimed and the existing record when it is already in use. A claim
+    of the same request that has not answered within the claim timeout is
+    taken over
+    """
+    try:
+        with Session(get_sql_connection()) as session:
+            now = datetime.now(timezone.utc)
+            expired_before = now - timedelta(seconds=IDEMPOTENCY_KEY_TTL_SECONDS)
+            session.execute(
+                delete(IdempotencyRecordModel)
+                .where(IdempotencyRecordModel.idempotency_key == idempotency_key)
+                .where(IdempotencyRecordModel.created_at < expired_before)
+            )
+            result = session.execute(
+                insert(IdempotencyRecordModel)
+                .values(
+                    idempotency_key=idempotency_key,
+                    method=method,
+                    path=path,
+                    request_hash=request_hash,
+                    created_at=now,
+                    claimed_at=now,
+                )
+                .on_conflict_do_nothing(index_elements=["idempotency_key"])
+            )
+            if result.rowcount != 1:
+                stale_before = now - timedelta(
+                    seconds=IDEMPOTENCY_CLAIM_TIMEOUT_SECONDS
+                )
+                result = session.execute(
+                    update(IdempotencyRecordModel)
+                    .where(
+                        IdempotencyRecordModel.idempotency_key == idempotency_key,
+                        IdempotencyRecordModel.request_hash == request_hash,
+                        IdempotencyRecordModel.status_code.is_(None),
+                        func.coalesce(
+                            IdempotencyRecordModel.claimed_at,
+                            IdempotencyRecordModel.created_at,
+                        )
+                        < stale_before,
+                    )
+                    .values(claimed_at=now)
+                )
+            session.commit()
+            if result.rowcount == 1:
+                return None
+            return session.get(IdempotencyRecordModel, idempotency_key)
+    except Exception as e:
+        raise DatabaseErrorException("Error claiming idempotency key: " + str(e))
+
+
+def save_idempotency_response(
+    idempotency_key: str,
+    status_code: int,
+    response_headers: List[List[str]],
+    response_body: bytes,
+):
+    try:
+        with Session(get_sql_connection()) as session:
+            record = session.get(IdempotencyRecordModel, idempotency_key)
+            record.status_code = status_code
+            record.response_headers = response_headers
+            record.response_body = response_body
+            session.add(record)
+            session.commit()
+    except Exception as e:
+        raise DatabaseErrorException("Error saving idempotent response: " + str(e))
+
+
+def release_idempotency_key(idempotency_key: str):
+    try:
+        with Session(get_sql_connection()) as session:
+            session.execute(
+                delete(IdempotencyRecordModel)
+                .where(IdempotencyRecordModel.idempotency_key == idempotency_key)
+                .where(IdempotencyRecordModel.status_code.is_(None))
+            )
+            session.commit()
+    except Exception as e:
+        raise DatabaseErrorException("Error releasing idempotency key: " + str(e))
+
+
+def delete_expired_idempotency_records():
+    try:
+        with Session(get_sql_connection()) as session:
+            expired_before = datetime.now(timezone.utc) - timedelta(
+                seconds=IDEMPOTENCY_KEY_TTL_SECONDS
+            )
+            session.execute(
+                delete(IdempotencyRecordModel).where(
+                    IdempotencyRecordModel.created_at < expired_before
+                )
+            )
+            session.commit()
     except Exception as e:
         raise DatabaseErrorException(
-            "Error getting user stream IDs from database: " + str(e)
+            "Error deleting expired idempotency records: " + str(e)
         )
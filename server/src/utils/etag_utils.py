@@ -0,0 +1,24 @@
+import uuid
+from typing import Optional
+
+from fastapi import Response
+
+
+def get_stream_etag(stream_id: uuid.UUID, version: int) -> str:
+    return f'"{stream_id}-{version}"'
+
+
+def is_etag_match(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison function
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
+
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
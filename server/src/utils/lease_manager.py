@@ -0,0 +1,93 @@
+import threading
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from src.settings import STREAM_LEASE_SWEEP_SECONDS
+from src.utils.db_utils import (
+    DatabaseErrorException,
+    StreamLeaseException,
+    flush_stream_lease,
+    renew_stream_lease,
+)
+from src.utils.stream_leases import (
+    StreamLease,
+    get_stream_lease,
+    get_stream_leases,
+    remove_stream_lease,
+)
+
+_sweeper_thread: Optional[threading.Thread] = None
+_sweeper_stop = threading.Event()
+
+
+def get_owned_stream_lease(stream_id: uuid.UUID, lease_id: uuid.UUID) -> StreamLease:
+    lease = get_stream_lease(stream_id)
+    if lease is None or lease.lease_id != lease_id:
+        # the lease may be held by another worker, which has to serve it
+        raise StreamLeaseException(
+            message=f"Lease {lease_id} of evaluator stream with ID {stream_id} "
+            "is not held by this worker"
+        )
+    return lease
+
+
+def extend_stream_lease(
+    stream_id: uuid.UUID, lease_id: uuid.UUID, duration: int
+) -> datetime:
+    lease = get_owned_stream_lease(stream_id, lease_id)
+    try:
+        return renew_stream_lease(lease, duration)
+    except StreamLeaseException:
+        remove_stream_lease(lease)
+        raise
+
+
+def release_stream_lease(stream_id: uuid.UUID, lease_id: uuid.UUID) -> int:
+    """Store the leased stream and end the lease"""
+    lease = get_owned_stream_lease(stream_id, lease_id)
+    try:
+        version = flush_stream_lease(lease, release=True)
+    except StreamLeaseException:
+        remove_stream_lease(lease)
+        raise
+    remove_stream_lease(lease)
+    return version
+
+
+def expire_stream_leases(release_all: bool = False):
+    for lease in get_stream_leases():
+        if not release_all and not lease.is_expired():
+            continue
+        try:
+            flush_stream_lease(lease, release=True)
+        except (StreamLeaseException, DatabaseErrorException) as e:
+            # the recorded operations are replayed by whoever loads the stream next
+            print(f"Error releasing lease of stream {lease.stream_id}: ", e.message)
+        remove_stream_lease(lease)
+
+
+def sweep_stream_leases():
+    while not _sweeper_stop.wait(STREAM_LEASE_SWEEP_SECONDS):
+        expire_stream_leases()
+
+
+def start_stream_lease_sweeper():
+    global _sweeper_thread
+    if _sweeper_thread is not None:
+        return
+    _sweeper_stop.clear()
+    _sweeper_thread = threading.Thread(
+        target=sweep_stream_leases, name="stream-lease-sweeper", daemon=True
+    )
+    _sweeper_thread.start()
+
+
+def stop_stream_lease_sweeper():
+    """Stop the sweeper and release every lease this worker holds"""
+    global _sweeper_thread
+    if _sweeper_thread is not None:
+        _sweeper_stop.set()
+        _sweeper_thread.join(timeout=STREAM_LEASE_SWEEP_SECONDS * 2)
+        _sweeper_thread = None
+    expire_stream_leases(release_all=True)
@@ -0,0 +1,28 @@
+import base64
+import uuid
+from datetime import datetime
+from typing import Tuple
+
+# header carrying the cursor of the next page, absent on the last page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class InvalidCursorException(Exception):
+    def __init__(self, message="Invalid pagination cursor", status_code=400):
+        self.message = message
+        self.status_code = status_code
+        super().__init__(self.message)
+
+
+def encode_cursor(created_at: datetime, stream_id: uuid.UUID) -> str:
+    value = f"{created_at.isoformat()}|{stream_id}"
+    return base64.urlsafe_b64encode(value.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    try:
+        value = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, stream_id = value.split("|")
+        return datetime.fromisoformat(created_at), uuid.UUID(stream_id)
+    except ValueError:
+        raise InvalidCursorException()
@@ -0,0 +1,60 @@
+import threading
+import uuid
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+
+from src.settings import PAYLOAD_CACHE_MAX_BYTES
+
+
+class PayloadCacheKey(NamedTuple):
+    stream_id: uuid.UUID
+    window: int
+    kind: str
+    format: str
+    columns: Tuple[str, ...]
+
+
+# every algorithm of a stream is served the same data within a window, so the
+# encoded response body is shared across algorithms until the window moves on
+_payload_cache: "OrderedDict[PayloadCacheKey, bytes]" = OrderedDict()
+_payload_cache_bytes = 0
+_payload_cache_lock = threading.Lock()
+
+
+def get_cached_payload(key: PayloadCacheKey) -> Optional[bytes]:
+    with _payload_cache_lock:
+        payload = _payload_cache.get(key)
+        if payload is not None:
+            _payload_cache.move_to_end(key)
+        return payload
+
+
+def set_cached_payload(key: PayloadCacheKey, payload: bytes):
+    global _payload_cache_bytes
+    if len(payload) > PAYLOAD_CACHE_MAX_BYTES:
+        return
+    with _payload_cache_lock:
+        # payloads of earlier windows of this stream will never be requested again
+        for stale_key in [
+            cached_key
+            for cached_key in _payload_cache
+            if cached_key.stream_id == key.stream_id and cached_key.window != key.window
+        ]:
+            _payload_cache_bytes -= len(_payload_cache.pop(stale_key))
+
+        previous = _payload_cache.pop(key, None)
+        if previous is not None:
+            _payload_cache_bytes -= len(previous)
+        _payload_cache[key] = payload
+        _payload_cache_bytes += len(payload)
+
+        while _payload_cache_bytes > PAYLOAD_CACHE_MAX_BYTES:
+            _, evicted = _payload_cache.popitem(last=False)
+            _payload_cache_bytes -= len(evicted)
+
+
+def clear_payload_cache():
+    global _payload_cache_bytes
+    with _payload_cache_lock:
+        _payload_cache.clear()
+        _payload_cache_bytes = 0
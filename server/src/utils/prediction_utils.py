@@ -0,0 +1,384 @@
+import io
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+NPZ_MEDIA_TYPE = "application/x-npz"
+OCTET_STREAM_MEDIA_TYPE = "application/octet-stream"
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+ARROW_FILE_MEDIA_TYPE = "application/vnd.apache.arrow.file"
+MULTIPART_MEDIA_TYPE = "multipart/form-data"
+
+DATA_DTYPES = {"float32", "float64"}
+INDEX_DTYPES = {"int32", "int64"}
+
+
+class InvalidPredictionException(Exception):
+    def __init__(self, message="Invalid prediction", status_code=400):
+        self.message = message
+        self.status_code = status_code
+        super().__init__(self.message)
+
+
+def parse_shape(shape: Optional[str]) -> Optional[Tuple[int, int]]:
+    if shape is None:
+        return None
+    try:
+        dimensions = tuple(int(dimension) for dimension in shape.split(","))
+    except ValueError:
+        raise InvalidPredictionException(message=f"Invalid shape: {shape}")
+    if len(dimensions) != 2 or min(dimensions) < 0:
+        raise InvalidPredictionException(message=f"Invalid shape: {shape}")
+    return dimensions
+
+
+def parse_dtype(name: str, allowed_dtypes: set) -> np.dtype:
+    if name not in allowed_dtypes:
+        raise InvalidPredictionException(
+            message=f"Unsupported dtype {name}, expected one of: "
+            f"{', '.join(sorted(allowed_dtypes))}"
+        )
+    # buffers are always sent little-endian regardless of the server platform
+    return np.dtype(name).newbyteorder("<")
+
+
+def array_from_buffer(buffer: bytes, dtype: np.dtype, name: str) -> np.ndarray:
+    if len(buffer) % dtype.itemsize != 0:
+        raise InvalidPredictionException(
+            message=f"Size of {name} buffer is not a multiple of {dtype.itemsize} bytes"
+        )
+    # astype to the native byte order gives a writeable array with a single copy
+    return np.frombuffer(buffer, dtype=dtype).astype(dtype.newbyteorder("="))
+
+
+def build_prediction_matrix(
+    data: np.ndarray,
+    indices: np.ndarray,
+    indptr: np.ndarray,
+    shape: Tuple[int, int],
+) -> csr_matrix:
+    """
+    Check CSR components with vectorised numpy operations and wrap them in a
+    csr_matrix without copying
+    """
+    if data.ndim != 1 or indices.ndim != 1 or indptr.ndim != 1:
+        raise InvalidPredictionException(message="data, indices and indptr must be 1-D")
+    if not np.issubdtype(data.dtype, np.number):
+        raise InvalidPredictionException(message="data must be numeric")
+    if not np.issubdtype(indices.dtype, np.integer) or not np.issubdtype(
+        indptr.dtype, np.integer
+    ):
+        raise InvalidPredictionException(message="indices and indptr must be integers")
+
+    num_rows, num_columns = shape
+    if len(indptr) != num_rows + 1:
+        raise InvalidPredictionException(
+            message=f"indptr must have {num_rows + 1} entries, got {len(indptr)}"
+        )
+    if len(data) != len(indices):
+        raise InvalidPredictionException(
+            message="data and indices must have the same length"
+        )
+    if indptr[0] != 0 or indptr[-1] != len(indices):
+        raise InvalidPredictionException(
+            message="indptr must start at 0 and end at the number of stored values"
+        )
+    if np.any(np.diff(indptr) < 0):
+        raise InvalidPredictionException(message="indptr must be non-decreasing")
+    if len(indices) and (indices.min() < 0 or indices.max() >= num_columns):
+        raise InvalidPredictionException(message="indices out of bounds for shape")
+    if not np.isfinite(data).all():
+        raise InvalidPredictionException(message="data must be finite")
+
+    return csr_matrix((data, indices, indptr), shape=shape, copy=False)
+
+
+def prediction_from_buffers(
+    data_buffer: bytes,
+    indices_buffer: bytes,
+    indptr_buffer: bytes,
+    shape: Tuple[int, int],
+    data_dtype: str = "float64",
+    index_dtype: str = "int32",
+) -> csr_matrix:
+    data_type = parse_dtype(data_dtype, DATA_DTYPES)
+    index_type = parse_dtype(index_dtype, INDEX_DTYPES)
+    return build_prediction_matrix(
+        array_from_buffer(data_buffer, data_type, "data"),
+        array_from_buffer(indices_buffer, index_type, "indices"),
+        array_from_buffer(indptr_buffer, index_type, "indptr"),
+        shape,
+    )
+
+
+def prediction_from_concatenated_buffer(
+    buffer: bytes,
+    shape: Tuple[int, int],
+    nnz: int,
+    data_dtype: str = "float64",
+    index_dtype: str = "int32",
+) -> csr_matrix:
+    """
+    Split a single body laid out as data, indices then indptr, where data and
+    indices hold nnz values and indptr holds rows + 1 values
+    """
+    data_type = parse_dtype(data_dtype, DATA_DTYPES)
+    index_type = parse_dtype(index_dtype, INDEX_DTYPES)
+    data_end = nnz * data_type.itemsize
+    indices_end = data_end + nnz * index_type.itemsize
+    expected_size = indices_end + (shape[0] + 1) * index_type.itemsize
+    if nnz < 0 or len(buffer) != expected_size:
+        raise InvalidPredictionException(
+            message=f"Expected a body of {expected_size} bytes, got {len(buffer)}"
+        )
+    view = memoryview(buffer)
+    return prediction_from_buffers(
+        view[:data_end],
+        view[data_end:indices_end],
+        view[indices_end:],
+        shape,
+        data_dtype,
+        index_dtype,
+    )
+
+
+def prediction_from_npz(buffer: bytes) -> csr_matrix:
+    """Read a matrix written by scipy.sparse.save_npz or np.savez"""
+    try:
+        with np.load(io.BytesIO(buffer), allow_pickle=False) as npz:
+            arrays = {key: npz[key] for key in npz.files}
+    except Exception as e:
+        raise InvalidPredictionException(message=f"Invalid NPZ file: {str(e)}")
+
+    missing_keys = [
+        key for key in ("data", "indices", "indptr", "shape") if key not in arrays
+    ]
+    if missing_keys:
+        raise InvalidPredictionException(
+            message=f"NPZ file is missing arrays: {', '.join(missing_keys)}"
+        )
+    if "format" in arrays and arrays["format"].item() not in (b"csr", "csr"):
+        raise InvalidPredictionException(message="NPZ matrix must be in CSR format")
+    shape = tuple(int(dimension) for dimension in arrays["shape"])
+    if len(shape) != 2:
+        raise InvalidPredictionException(message="NPZ shape must be 2-D")
+    return build_prediction_matrix(
+        arrays["data"], arrays["indices"], arrays["indptr"], shape
+    )
+
+
+def prediction_from_arrow(
+    buffer: bytes, shape: Optional[Tuple[int, int]], file_format: bool = False
+) -> csr_matrix:
+    """
+    Read an Arrow table with uid and iid columns and an optional score column,
+    one row per recommended item. Without an explicit shape the matrix is sized
+    to the largest user and item IDs
+    """
+    if pyarrow is None:
+        raise InvalidPredictionException(
+            message="Arrow uploads require pyarrow to be installed", status_code=415
+        )
+    try:
+        if file_format:
+            table = pyarrow.ipc.open_file(pyarrow.py_buffer(buffer)).read_all()
+        else:
+            table = pyarrow.ipc.open_stream(pyarrow.py_buffer(buffer)).read_all()
+    except Exception as e:
+        raise InvalidPredictionException(message=f"Invalid Arrow table: {str(e)}")
+
+    missing_columns = [
+        column for column in ("uid", "iid") if column not in table.column_names
+    ]
+    if missing_columns:
+        raise InvalidPredictionException(
+            message=f"Arrow table is missing columns: {', '.join(missing_columns)}"
+        )
+    try:
+        user_ids = table.column("uid").to_numpy()
+        item_ids = table.column("iid").to_numpy()
+        if "score" in table.column_names:
+            scores = table.column("score").to_numpy().astype(np.float64, copy=False)
+        else:
+            scores = np.ones(len(user_ids), dtype=np.float64)
+    except Exception as e:
+        raise InvalidPredictionException(message=f"Invalid Arrow columns: {str(e)}")
+
+    return prediction_from_coordinates(user_ids, item_ids, scores, shape)
+
+
+def prediction_from_coordinates(
+    user_ids: np.ndarray,
+    item_ids: np.ndarray,
+    scores: np.ndarray,
+    shape: Optional[Tuple[int, int]],
+) -> csr_matrix:
+    if not np.issubdtype(user_ids.dtype, np.integer) or not np.issubdtype(
+        item_ids.dtype, np.integer
+    ):
+        raise InvalidPredictionException(message="uid and iid must be integers")
+    if len(user_ids) and (user_ids.min() < 0 or item_ids.min() < 0):
+        raise InvalidPredictionException(message="uid and iid must be non-negative")
+    if shape is None:
+        shape = (
+            int(user_ids.max()) + 1 if len(user_ids) else 0,
+            int(item_ids.max()) + 1 if len(item_ids) else 0,
+        )
+    elif len(user_ids) and (user_ids.max() >= shape[0] or item_ids.max() >= shape[1]):
+        raise InvalidPredictionException(message="uid or iid out of bounds for shape")
+    if not np.isfinite(scores).all():
+        raise InvalidPredictionException(message="score must be finite")
+    matrix = csr_matrix((scores, (user_ids, item_ids)), shape=shape)
+    # converting from coordinates sums repeated entries, so fewer stored values
+    # means an item was predicted twice for the same user
+    if matrix.nnz != len(user_ids):
+        raise InvalidPredictionException(
+            message="Each item may only be predicted once per user"
+        )
+    return matrix
+
+
+PREDICTION_COLUMNS = ("interactionid", "uid", "iid", "ts")
+
+
+def prediction_frame_from_columns(columns: dict) -> pd.DataFrame:
+    """
+    Build a prediction dataframe from a columnar payload such as
+    {"uid": [...], "iid": [...], "ts": [...], "interactionid": [...]}, checking
+    each column once with numpy instead of validating every record.
+    interactionid may be omitted, in which case rows are numbered in order
+    """
+    if not isinstance(columns, dict):
+        raise InvalidPredictionException(message="Prediction must be a JSON object")
+    missing_columns = [
+        column for column in ("uid", "iid", "ts") if column not in columns
+    ]
+    if missing_columns:
+        raise InvalidPredictionException(
+            message=f"Missing columns: {', '.join(missing_columns)}"
+        )
+
+    arrays = {}
+    for column in PREDICTION_COLUMNS:
+        if column not in columns:
+            continue
+        values = columns[column]
+        if not isinstance(values, list):
+            raise InvalidPredictionException(message=f"{column} must be a list")
+        try:
+            array = np.asarray(values)
+        except (TypeError, ValueError, OverflowError):
+            raise InvalidPredictionException(
+                message=f"{column} must only contain integers"
+            )
+        # empty lists come back as float64, anything else must be integral
+        if len(array) and (
+            array.ndim != 1 or not np.issubdtype(array.dtype, np.integer)
+        ):
+            raise InvalidPredictionException(
+                message=f"{column} must only contain integers"
+            )
+        arrays[column] = array.astype(np.int64, copy=False)
+
+    lengths = {len(array) for array in arrays.values()}
+    if len(lengths) != 1:
+        raise InvalidPredictionException(
+            message="All columns must have the same length"
+        )
+    length = lengths.pop()
+    if "interactionid" not in arrays:
+        arrays["interactionid"] = np.arange(length, dtype=np.int64)
+    for column in ("uid", "iid"):
+        if length and arrays[column].min() < 0:
+            raise InvalidPredictionException(message=f"{column} must be non-negative")
+
+    return pd.DataFrame(
+        {column: arrays[column] for column in PREDICTION_COLUMNS}, copy=False
+    )
+
+
+TOP_K_PADDING = -1
+
+
+def prediction_from_top_k(payload: dict) -> csr_matrix:
+    """
+    Build a prediction matrix from {"user_ids": [...], "item_indices": [[...]]}
+    where row r of item_indices holds the top K items of user_ids[r], best
+    first. Rows with fewer than K items are padded with -1. Optional scores of
+    the same shape are used as is, otherwise items are scored K - rank so the
+    ranking is preserved. shape defaults to the largest ids + 1
+    """
+    if not isinstance(payload, dict):
+        raise InvalidPredictionException(message="Prediction must be a JSON object")
+    missing_fields = [
+        field for field in ("user_ids", "item_indices") if field not in payload
+    ]
+    if missing_fields:
+        raise InvalidPredictionException(
+            message=f"Missing fields: {', '.join(missing_fields)}"
+        )
+
+    try:
+        user_ids = np.asarray(payload["user_ids"])
+        item_indices = np.asarray(payload["item_indices"])
+        scores = (
+            np.asarray(payload["scores"], dtype=np.float64)
+            if payload.get("scores") is not None
+            else None
+        )
+    except (TypeError, ValueError, OverflowError):
+        raise InvalidPredictionException(
+            message="user_ids, item_indices and scores must be rectangular numeric arrays"
+        )
+
+    if user_ids.ndim != 1 or (
+        len(user_ids) and not np.issubdtype(user_ids.dtype, np.integer)
+    ):
+        raise InvalidPredictionException(message="user_ids must be a list of integers")
+    if len(user_ids) == 0 and item_indices.size == 0:
+        item_indices = item_indices.reshape(0, 0).astype(np.int64)
+    if item_indices.ndim != 2 or not np.issubdtype(item_indices.dtype, np.integer):
+        raise InvalidPredictionException(
+            message="item_indices must be a list of equally long integer lists"
+        )
+    if item_indices.shape[0] != len(user_ids):
+        raise InvalidPredictionException(
+            message="item_indices must have one row per user id"
+        )
+    if scores is None:
+        num_items = item_indices.shape[1]
+        scores = np.broadcast_to(
+            np.arange(num_items, 0, -1, dtype=np.float64), item_indices.shape
+        )
+    elif scores.shape != item_indices.shape:
+        raise InvalidPredictionException(
+            message="scores must have the same shape as item_indices"
+        )
+    if np.any(item_indices < TOP_K_PADDING):
+        raise InvalidPredictionException(
+            message=f"item_indices must be non-negative or {TOP_K_PADDING} for padding"
+        )
+
+    shape = payload.get("shape")
+    if shape is not None:
+        if (
+            not isinstance(shape, list)
+            or len(shape) != 2
+            or not all(isinstance(dimension, int) for dimension in shape)
+        ):
+            raise InvalidPredictionException(message="shape must be [rows, columns]")
+        shape = tuple(shape)
+
+    mask = item_indices != TOP_K_PADDING
+    rows = np.repeat(user_ids.astype(np.int64), item_indices.shape[1])
+    return prediction_from_coordinates(
+        rows[mask.ravel()], item_indices[mask], scores[mask], shape
+    )
@@ -0,0 +1,148 @@
+import threading
+import uuid
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from streamsightv2.evaluators.evaluator_stream import EvaluatorStreamer
+from streamsightv2.matrix import InteractionMatrix
+
+from src.settings import VALIDATION_INDEX_CACHE_SIZE
+from src.utils.prediction_utils import InvalidPredictionException
+
+
+class PredictionValidationIndex(NamedTuple):
+    window: int
+    # shape of the ground truth the prediction is scored against
+    ground_truth_shape: Optional[Tuple[int, int]]
+    ignore_unknown_user: bool
+    ignore_unknown_item: bool
+    # sorted ids of every user and item the stream has exposed so far
+    user_ids: np.ndarray
+    item_ids: np.ndarray
+
+
+# the user and item base of a stream only changes when its window moves on, so
+# one index per stream is enough and is replaced on the next window
+_validation_indexes: "OrderedDict[uuid.UUID, PredictionValidationIndex]" = OrderedDict()
+_validation_indexes_lock = threading.Lock()
+
+
+def build_validation_index(
+    evaluator_streamer: EvaluatorStreamer,
+) -> PredictionValidationIndex:
+    user_item_base = evaluator_streamer.user_item_base
+    ground_truth = evaluator_streamer._ground_truth_data_cache
+    ground_truth_shape = getattr(ground_truth, "shape", None)
+    return PredictionValidationIndex(
+        window=evaluator_streamer._run_step,
+        ground_truth_shape=tuple(ground_truth_shape) if ground_truth_shape else None,
+        ignore_unknown_user=evaluator_streamer.ignore_unknown_user,
+        ignore_unknown_item=evaluator_streamer.ignore_unknown_item,
+        user_ids=np.sort(np.fromiter(user_item_base.global_user_ids, dtype=np.int64)),
+        item_ids=np.sort(np.fromiter(user_item_base.global_item_ids, dtype=np.int64)),
+    )
+
+
+def get_validation_index(
+    stream_id: uuid.UUID, window: int
+) -> Optional[PredictionValidationIndex]:
+    with _validation_indexes_lock:
+        index = _validation_indexes.get(stream_id)
+        if index is None or index.window != window:
+            return None
+        _validation_indexes.move_to_end(stream_id)
+        return index
+
+
+def set_validation_index(stream_id: uuid.UUID, index: PredictionValidationIndex):
+    with _validation_indexes_lock:
+        _validation_indexes[stream_id] = index
+        _validation_indexes.move_to_end(stream_id)
+        while len(_validation_indexes) > VALIDATION_INDEX_CACHE_SIZE:
+            _validation_indexes.popitem(last=False)
+
+
+def clear_validation_indexes():
+    with _validation_indexes_lock:
+        _validation_indexes.clear()
+
+
+def validate_prediction(
+    index: PredictionValidationIndex,
+    prediction: Union[InteractionMatrix, csr_matrix],
+):
+    """
+    Reject predictions the streamer would refuse, using the same rules as
+    EvaluatorStreamer.submit_prediction but with vectorised lookups
+    """
+    if isinstance(prediction, InteractionMatrix):
+        df = prediction._df
+        user_ids = df[InteractionMatrix.USER_IX].to_numpy()
+        item_ids = df[InteractionMatrix.ITEM_IX].to_numpy()
+        # the streamer rejects unknown ids in an InteractionMatrix whatever the
+        # ignore_unknown flags say, those only apply to csr predictions
+        if not np.isin(user_ids, index.user_ids).all():
+            raise InvalidPredictionException(
+                message="Prediction contains user ids unknown to the stream"
+            )
+        if not np.isin(item_ids, index.item_ids).all():
+            raise InvalidPredictionException(
+                message="Prediction contains item ids unknown to the stream"
+            )
+    elif isinstance(prediction, csr_matrix) and index.ground_truth_shape:
+        num_users, num_items = index.ground_truth_shape
+        if prediction.shape[0] < num_users and not index.ignore_unknown_user:
+            raise InvalidPredictionException(
+                message=f"Prediction must have at least {num_users} rows, "
+                f"got {prediction.shape[0]}"
+            )
+        if (
+            not index.ignore_unknown_item
+            and prediction.nnz
+            and prediction.indices.max() >= num_items
+        ):
+            raise InvalidPredictionException(
+                message=f"Prediction contains item ids beyond the {num_items} "
+                "items of the current window"
+            )
+
+
+def prevalidate_prediction(
+    stream_id: uuid.UUID,
+    window: int,
+    prediction: Union[InteractionMatrix, csr_matrix],
+):
+    """Validate against the cached index of the window, if there is one"""
+    index = get_validation_index(stream_id, window)
+    if index is not None:
+        validate_prediction(index, prediction)
+
+
+def validate_loaded_prediction(
+    stream_id: uuid.UUID,
+    evaluator_streamer: EvaluatorStreamer,
+    prediction: Union[InteractionMatrix, csr_matrix],
+):
+    """Validate against a loaded streamer, caching its index for later requests"""
+    index = get_validation_index(stream_id, evaluator_streamer._run_step)
+    if index is None:
+        index = build_validation_index(evaluator_streamer)
+        set_validation_index(stream_id, index)
+    validate_prediction(index, prediction)
+
+
+def submit_loaded_prediction(
+    evaluator_streamer: EvaluatorStreamer,
+    algorithm_id: uuid.UUID,
+    prediction: Union[InteractionMatrix, csr_matrix],
+) -> str:
+    """
+    Submit a validated prediction and check the streamer took it, it only warns
+    about some predictions it ignores. Returns the new state of the algorithm
+    """
+    evaluator_streamer.submit_prediction(algorithm_id, prediction)
+    state = evaluator_streamer.get_algorithm_state(algorithm_id).name
+    assert state in {"PREDICTED", "COMPLETED"}, f"Prediction was not accepted: {state}"
+    return state
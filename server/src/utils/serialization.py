@@ -0,0 +1,50 @@
+import json
+from typing import Any, Dict, Mapping, Optional
+
+import pandas as pd
+from fastapi.responses import Response
+
+JSON_MEDIA_TYPE = "application/json"
+
+
+def encode_json(value: Any) -> bytes:
+    return json.dumps(value, separators=(",", ":"), allow_nan=False).encode("utf-8")
+
+
+def dataframe_to_json_records(df: pd.DataFrame) -> bytes:
+    """
+    Encode a dataframe as a JSON array of records column by column with the
+    pandas C encoder, without materialising a Python dict per row. The pandas
+    encoder keeps at most 15 significant digits, so frames with float columns
+    go through json.dumps, which writes floats that round-trip exactly
+    """
+    if df.select_dtypes(include="floating").columns.empty:
+        return df.to_json(orient="records").encode("utf-8")
+    records = df.astype(object).where(df.notna(), None).to_dict(orient="records")
+    return encode_json(records)
+
+
+def encode_json_object(
+    fields: Mapping[str, Any],
+    frames: Optional[Dict[str, pd.DataFrame]] = None,
+    payloads: Optional[Dict[str, bytes]] = None,
+) -> bytes:
+    """
+    Encode a JSON object whose plain fields go through json.dumps, whose
+    dataframe fields are spliced in as pre-encoded record arrays and whose
+    payload fields are already encoded JSON values
+    """
+    members = [
+        encode_json(key) + b":" + encode_json(value) for key, value in fields.items()
+    ]
+    for key, df in (frames or {}).items():
+        members.append(encode_json(key) + b":" + dataframe_to_json_records(df))
+    for key, payload in (payloads or {}).items():
+        members.append(encode_json(key) + b":" + payload)
+    return b"{" + b",".join(members) + b"}"
+
+
+def json_bytes_response(
+    payload: bytes, headers: Optional[Mapping[str, str]] = None
+) -> Response:
+    return Response(content=payload, media_type=JSON_MEDIA_TYPE, headers=headers)
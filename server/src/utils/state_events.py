@@ -0,0 +1,183 @@
+import asyncio
+import json
+import select
+import threading
+import uuid
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import text
+from streamsightv2.evaluators.evaluator_stream import EvaluatorStreamer
+
+from src.database import get_sql_connection
+from src.settings import STATE_EVENTS_LISTEN_NOTIFY
+
+STATE_EVENTS_CHANNEL = "algorithm_states"
+# postgres rejects NOTIFY payloads of 8000 bytes or more
+MAX_NOTIFY_PAYLOAD_BYTES = 7999
+LISTEN_POLL_SECONDS = 1.0
+LISTEN_RECONNECT_SECONDS = 5.0
+
+
+class AlgorithmStatesEvent(NamedTuple):
+    stream_id: uuid.UUID
+    # version of the stream the states were read from, so late events of an
+    # older version can be told apart from newer ones
+    version: int
+    # algorithm states keyed by "<name>_<uuid>" as the streamer reports them
+    states: Dict[str, str]
+
+
+_subscribers: Dict[
+    uuid.UUID,
+    List[Tuple[asyncio.AbstractEventLoop, "asyncio.Queue[AlgorithmStatesEvent]"]],
+] = {}
+_subscribers_lock = threading.Lock()
+
+_listener_thread: Optional[threading.Thread] = None
+_listener_stop = threading.Event()
+
+
+def get_algorithm_states(evaluator_streamer: EvaluatorStreamer) -> Dict[str, str]:
+    return {
+        key: value.name
+        for key, value in evaluator_streamer.get_all_algorithm_status().items()
+    }
+
+
+def subscribe(stream_id: uuid.UUID) -> "asyncio.Queue[AlgorithmStatesEvent]":
+    """Subscribe the running event loop to state changes of a stream"""
+    queue: "asyncio.Queue[AlgorithmStatesEvent]" = asyncio.Queue()
+    with _subscribers_lock:
+        _subscribers.setdefault(stream_id, []).append(
+            (asyncio.get_running_loop(), queue)
+        )
+    return queue
+
+
+def unsubscribe(stream_id: uuid.UUID, queue: "asyncio.Queue[AlgorithmStatesEvent]"):
+    with _subscribers_lock:
+        subscribers = [
+            subscriber
+            for subscriber in _subscribers.get(stream_id, [])
+            if subscriber[1] is not queue
+        ]
+        if subscribers:
+            _subscribers[stream_id] = subscribers
+        else:
+            _subscribers.pop(stream_id, None)
+
+
+def get_subscriber_count(stream_id: uuid.UUID) -> int:
+    with _subscribers_lock:
+        return len(_subscribers.get(stream_id, []))
+
+
+def publish_local(event: AlgorithmStatesEvent):
+    """Hand an event to the subscribers of this process, from any thread"""
+    with _subscribers_lock:
+        subscribers = list(_subscribers.get(event.stream_id, []))
+    for loop, queue in subscribers:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, event)
+        except RuntimeError:
+            # the loop of the subscriber has been closed
+            unsubscribe(event.stream_id, queue)
+
+
+def encode_event(event: AlgorithmStatesEvent) -> str:
+    return json.dumps(
+        {
+            "stream_id": str(event.stream_id),
+            "version": event.version,
+            "states": event.states,
+        },
+        separators=(",", ":"),
+    )
+
+
+def decode_event(payload: str) -> AlgorithmStatesEvent:
+    message = json.loads(payload)
+    return AlgorithmStatesEvent(
+        uuid.UUID(message["stream_id"]), message["version"], message["states"]
+    )
+
+
+def publish_algorithm_states(
+    stream_id: uuid.UUID, version: int, states: Dict[str, str]
+):
+    """
+    Publish the algorithm states of a stream after they were persisted. With
+    the LISTEN/NOTIFY bridge enabled the event goes through postgres so the
+    subscribers of every worker receive it, including the ones of this process
+    """
+    event = AlgorithmStatesEvent(stream_id, version, states)
+    if not STATE_EVENTS_LISTEN_NOTIFY:
+        publish_local(event)
+        return
+
+    payload = encode_event(event)
+    if len(payload.encode("utf-8")) > MAX_NOTIFY_PAYLOAD_BYTES:
+        print(f"Algorithm states of stream {stream_id} are too large to NOTIFY")
+        publish_local(event)
+        return
+    try:
+        with get_sql_connection().begin() as connection:
+            connection.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": STATE_EVENTS_CHANNEL, "payload": payload},
+            )
+    except Exception as e:
+        print(f"Error notifying algorithm states of stream {stream_id}: ", e)
+        publish_local(event)
+
+
+def listen_for_state_events():
+    while not _listener_stop.is_set():
+        connection = None
+        try:
+            connection = get_sql_connection().raw_connection()
+            # LISTEN needs autocommit, keep the connection out of the pool
+            connection.detach()
+            connection.driver_connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {STATE_EVENTS_CHANNEL}")
+            driver_connection = connection.driver_connection
+            while not _listener_stop.is_set():
+                readable, _, _ = select.select(
+                    [driver_connection], [], [], LISTEN_POLL_SECONDS
+                )
+                if not readable:
+                    continue
+                driver_connection.poll()
+                while driver_connection.notifies:
+                    notification = driver_connection.notifies.pop(0)
+                    try:
+                        publish_local(decode_event(notification.payload))
+                    except (ValueError, KeyError) as e:
+                        print("Ignoring malformed algorithm states event: ", e)
+        except Exception as e:
+            print("Error listening for algorithm states events: ", e)
+            _listener_stop.wait(LISTEN_RECONNECT_SECONDS)
+        finally:
+            if connection is not None:
+                connection.close()
+
+
+def start_state_event_listener():
+    global _listener_thread
+    if not STATE_EVENTS_LISTEN_NOTIFY or _listener_thread is not None:
+        return
+    _listener_stop.clear()
+    _listener_thread = threading.Thread(
+        target=listen_for_state_events, name="state-events-listener", daemon=True
+    )
+    _listener_thread.start()
+
+
+def stop_state_event_listener():
+    global _listener_thread
+    if _listener_thread is None:
+        return
+    _listener_stop.set()
+    _listener_thread.join(timeout=LISTEN_POLL_SECONDS * 2)
+    _listener_thread = None
@@ -0,0 +1,45 @@
+import threading
+from typing import Optional
+
+from src.settings import STREAM_STATUS_BACKFILL_BATCH_SIZE
+from src.utils.db_utils import DatabaseErrorException, backfill_stream_statuses
+
+_backfill_thread: Optional[threading.Thread] = None
+_backfill_stop = threading.Event()
+
+
+def run_stream_status_backfill():
+    """
+    Store the missing statuses batch by batch, so startup does not wait for every
+    old stream to be unpickled. The listing works them out until then
+    """
+    after = None
+    while not _backfill_stop.is_set():
+        try:
+            after = backfill_stream_statuses(after, STREAM_STATUS_BACKFILL_BATCH_SIZE)
+        except DatabaseErrorException as e:
+            # the remaining streams are backfilled on the next startup
+            print("Error backfilling stream statuses: ", e.message)
+            return
+        if after is None:
+            return
+
+
+def start_stream_status_backfill():
+    global _backfill_thread
+    if _backfill_thread is not None:
+        return
+    _backfill_stop.clear()
+    _backfill_thread = threading.Thread(
+        target=run_stream_status_backfill, name="stream-status-backfill", daemon=True
+    )
+    _backfill_thread.start()
+
+
+def stop_stream_status_backfill():
+    """Stop the backfill once the batch it is storing is done"""
+    global _backfill_thread
+    if _backfill_thread is not None:
+        _backfill_stop.set()
+        _backfill_thread.join()
+        _backfill_thread = None
@@ -0,0 +1,149 @@
+import threading
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from streamsightv2.evaluators.evaluator_stream import EvaluatorStreamer
+
+from src.utils.stream_leases import LeasedEvaluatorStreamer
+
+StreamOperationFn = Callable[[EvaluatorStreamer], Any]
+
+
+class QueuedStreamOperation:
+    def __init__(self, operation: StreamOperationFn):
+        self.operation = operation
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.version: Optional[int] = None
+        self.is_finished = False
+        # set once the operation finished or its caller has to apply the next batch
+        self.ready = threading.Event()
+
+
+# operations waiting per stream, a stream is in the map while a batch is applied
+_queues: Dict[uuid.UUID, List[QueuedStreamOperation]] = {}
+_queues_lock = threading.Lock()
+
+
+def run_stream_operation(
+    stream_id: uuid.UUID,
+    operation: StreamOperationFn,
+    load_stream: Callable[[uuid.UUID], EvaluatorStreamer],
+    persist_stream: Callable[[uuid.UUID, EvaluatorStreamer], int],
+) -> Tuple[Any, int]:
+    """
+    Apply an operation to the stream and persist it, returning the result of
+    the operation and the new stream version. Operations on a stream run one
+    batch at a time in this worker; operations queued while a batch is applied
+    form the next batch, which shares one load and one persist of the stream
+    """
+    queued = QueuedStreamOperation(operation)
+    with _queues_lock:
+        queue = _queues.get(stream_id)
+        is_applying = queue is not None
+        if queue is None:
+            queue = _queues[stream_id] = []
+        queue.append(queued)
+
+    if is_applying:
+        queued.ready.wait()
+    if not queued.is_finished:
+        apply_next_batch(stream_id, load_stream, persist_stream)
+
+    if queued.error is not None:
+        raise queued.error
+    return queued.result, queued.version
+
+
+def apply_next_batch(
+    stream_id: uuid.UUID,
+    load_stream: Callable[[uuid.UUID], EvaluatorStreamer],
+    persist_stream: Callable[[uuid.UUID, EvaluatorStreamer], int],
+):
+    with _queues_lock:
+        batch = _queues[stream_id]
+        _queues[stream_id] = []
+    try:
+        apply_batch(stream_id, batch, load_stream, persist_stream)
+    finally:
+        for queued in batch:
+            queued.is_finished = True
+        with _queues_lock:
+            queue = _queues[stream_id]
+            if queue:
+                # the first waiting caller applies the next batch
+                queue[0].ready.set()
+            else:
+                del _queues[stream_id]
+        for queued in batch:
+            queued.ready.set()
+
+
+def apply_batch(
+    stream_id: uuid.UUID,
+    batch: List[QueuedStreamOperation],
+    load_stream: Callable[[uuid.UUID], EvaluatorStreamer],
+    persist_stream: Callable[[uuid.UUID, EvaluatorStreamer], int],
+):
+    try:
+        evaluator_streamer = load_stream(stream_id)
+        applied: List[QueuedStreamOperation] = []
+        is_stale = False
+        for queued in batch:
+            if is_stale:
+                evaluator_streamer = reapply(stream_id, applied, load_stream)
+                is_stale = False
+            if isinstance(evaluator_streamer, LeasedEvaluatorStreamer):
+                apply_leased_operation(queued, evaluator_streamer)
+                if queued.error is None:
+                    applied.append(queued)
+                continue
+            try:
+                queued.result = queued.operation(evaluator_streamer)
+                applied.append(queued)
+            except Exception as e:
+                queued.error = e
+                is_stale = True
+        if not applied:
+            return
+        if is_stale:
+            evaluator_streamer = reapply(stream_id, applied, load_stream)
+        version = persist_stream(stream_id, evaluator_streamer)
+        for queued in applied:
+            queued.version = version
+    except Exception as e:
+        for queued in batch:
+            if queued.error is None:
+                queued.error = e
+
+
+def apply_leased_operation(
+    queued: QueuedStreamOperation, evaluator_streamer: LeasedEvaluatorStreamer
+):
+    """
+    Apply an operation to a leased streamer, which is only loaded once. When the
+    operation fails, the lease drops the operations it recorded
+    """
+    lease = evaluator_streamer._lease
+    with lease.lock:
+        num_operations = len(lease.operation_ids)
+        try:
+            queued.result = queued.operation(evaluator_streamer)
+        except Exception as e:
+            queued.error = e
+            lease.rollback(num_operations)
+
+
+def reapply(
+    stream_id: uuid.UUID,
+    applied: List[QueuedStreamOperation],
+    load_stream: Callable[[uuid.UUID], EvaluatorStreamer],
+) -> EvaluatorStreamer:
+    """
+    Drop what a failed operation changed by loading the stream again and
+    applying the operations before it, which are deterministic
+    """
+    evaluator_streamer = load_stream(stream_id)
+    for queued in applied:
+        queued.result = queued.operation(evaluator_streamer)
+    return evaluator_streamer
@@ -0,0 +1,158 @@
+import functools
+import os
+import pickle
+import socket
+import threading
+import uuid
+import warnings
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from streamsightv2.evaluators.evaluator_stream import EvaluatorStreamer
+
+# identifies this worker process as the owner of the leases it takes
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+# streamer methods that change its state, recorded before they are applied.
+# These are all the methods a request persisted the streamer after calling
+RECORDED_METHODS = {
+    "register_algorithm",
+    "start_stream",
+    "get_data",
+    "get_unlabeled_data",
+    "submit_prediction",
+    "metric_results",
+}
+
+
+def as_utc(value: datetime) -> datetime:
+    # timestamps read back from the database are naive UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class StreamLease:
+    def __init__(
+        self,
+        stream_id: uuid.UUID,
+        lease_id: uuid.UUID,
+        expires_at: datetime,
+        dataset_id: str,
+        evaluator_streamer: EvaluatorStreamer,
+        record_operation: Callable[["StreamLease", str, bytes], int],
+        discard_operations: Callable[["StreamLease", List[int]], EvaluatorStreamer],
+    ):
+        self.stream_id = stream_id
+        self.lease_id = lease_id
+        self.expires_at = as_utc(expires_at)
+        self.dataset_id = dataset_id
+        self.evaluator_streamer = evaluator_streamer
+        self.record_operation = record_operation
+        self.discard_operations = discard_operations
+        # operations recorded since the streamer was last flushed
+        self.operation_ids: List[int] = []
+        # set once the streamer was flushed for the last time
+        self.is_released = False
+        # held by every operation on the streamer and while it is flushed
+        self.lock = threading.RLock()
+        self.streamer = LeasedEvaluatorStreamer(self)
+
+    def is_expired(self, now: Optional[datetime] = None) -> bool:
+        return self.expires_at <= (now or datetime.now(timezone.utc))
+
+    def apply(self, method: str, *args, **kwargs):
+        with self.lock:
+            # write ahead, an operation that is not recorded is not applied
+            operation_id = self.record_operation(
+                self, method, pickle.dumps((args, kwargs))
+            )
+            self.operation_ids.append(operation_id)
+            try:
+                return getattr(self.evaluator_streamer, method)(*args, **kwargs)
+            except Exception:
+                self.rollback(len(self.operation_ids) - 1)
+                raise
+
+    def rollback(self, num_operations: int):
+        """
+        Drop the operations recorded after the first num_operations, along with
+        whatever they changed, by rebuilding the streamer from the stored object
+        and the operations kept in the write-ahead log
+        """
+        with self.lock:
+            discarded = self.operation_ids[num_operations:]
+            if not discarded:
+                return
+            try:
+                self.evaluator_streamer = self.discard_operations(self, discarded)
+            except Exception:
+                # the streamer in memory can not be trusted anymore, the lease
+                # runs out and the stream is recovered from the log
+                self.is_released = True
+                raise
+            del self.operation_ids[num_operations:]
+
+    def call(self, method: str, *args, **kwargs):
+        with self.lock:
+            return getattr(self.evaluator_streamer, method)(*args, **kwargs)
+
+
+class LeasedEvaluatorStreamer:
+    """
+    Stands in for a leased streamer in the request handlers, recording every
+    state change in the write-ahead log before applying it to the streamer.
+    Every access holds the lease lock, so a request never reads the streamer
+    while another request changes it or while it is flushed
+    """
+
+    def __init__(self, lease: StreamLease):
+        self._lease = lease
+
+    def __getattr__(self, name: str):
+        if name in RECORDED_METHODS:
+            return functools.partial(self._lease.apply, name)
+        with self._lease.lock:
+            value = getattr(self._lease.evaluator_streamer, name)
+        if callable(value):
+            return functools.partial(self._lease.call, name)
+        return value
+
+
+_leases: Dict[uuid.UUID, StreamLease] = {}
+_leases_lock = threading.Lock()
+
+
+def get_stream_lease(stream_id: uuid.UUID) -> Optional[StreamLease]:
+    with _leases_lock:
+        return _leases.get(stream_id)
+
+
+def get_stream_leases() -> List[StreamLease]:
+    with _leases_lock:
+        return list(_leases.values())
+
+
+def add_stream_lease(lease: StreamLease):
+    with _leases_lock:
+        _leases[lease.stream_id] = lease
+
+
+def remove_stream_lease(lease: StreamLease):
+    with _leases_lock:
+        if _leases.get(lease.stream_id) is lease:
+            del _leases[lease.stream_id]
+
+
+def replay_stream_operations(
+    evaluator_streamer: EvaluatorStreamer, operations: Iterable[Tuple[str, bytes]]
+):
+    """Apply recorded operations to the streamer they were recorded against"""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for method, arguments in operations:
+            args, kwargs = pickle.loads(arguments)
+            try:
+                getattr(evaluator_streamer, method)(*args, **kwargs)
+            except Exception:
+                # a failed operation is discarded from the log, unless the
+                # worker went away before it could; it fails the same way again
+                pass
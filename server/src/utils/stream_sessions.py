@@ -0,0 +1,140 @@
+import asyncio
+import threading
+import uuid
+from typing import Union
+
+from fastapi.concurrency import run_in_threadpool
+from scipy.sparse import csr_matrix
+from streamsightv2.evaluators.evaluator_stream import EvaluatorStreamer
+from streamsightv2.matrix import InteractionMatrix
+
+from src import constants
+from src.utils.db_utils import (
+    StreamVersionConflictException,
+    checkpoint_stream,
+    get_stream_from_db,
+    get_stream_version,
+)
+from src.utils.prediction_utils import InvalidPredictionException
+from src.utils.prediction_validation import validate_loaded_prediction
+
+
+class PinnedStream:
+    """
+    An evaluator streamer kept in memory for the evaluation sessions of a
+    stream in this process. Sessions hold the lock around every operation on
+    the streamer and wait on changed for the other algorithms of the window
+    """
+
+    def __init__(self, evaluator_streamer: EvaluatorStreamer, version: int):
+        self.evaluator_streamer = evaluator_streamer
+        # version of the stream in the database the streamer was last synced with
+        self.version = version
+        self.checkpointed_window = evaluator_streamer._run_step
+        self.is_dirty = False
+        # set when the stream was updated outside of the sessions
+        self.is_invalidated = False
+        self.sessions = 0
+        self.lock = asyncio.Lock()
+        self.changed = asyncio.Condition(self.lock)
+
+
+_pinned_streams_lock = threading.Lock()
+
+
+async def pin_stream(stream_id: uuid.UUID) -> PinnedStream:
+    with _pinned_streams_lock:
+        pinned = constants.evaluator_stream_object_map.get(stream_id)
+        if pinned is not None:
+            pinned.sessions += 1
+            return pinned
+
+    # read the version first so a concurrent update shows up as a conflict
+    version = await run_in_threadpool(get_stream_version, stream_id)
+    evaluator_streamer = await run_in_threadpool(get_stream_from_db, stream_id)
+    with _pinned_streams_lock:
+        # another session may have pinned the stream while this one was loading
+        pinned = constants.evaluator_stream_object_map.setdefault(
+            stream_id, PinnedStream(evaluator_streamer, version)
+        )
+        pinned.sessions += 1
+        return pinned
+
+
+def invalidate_pinned_stream(stream_id: uuid.UUID, pinned: PinnedStream):
+    pinned.is_invalidated = True
+    with _pinned_streams_lock:
+        if constants.evaluator_stream_object_map.get(stream_id) is pinned:
+            del constants.evaluator_stream_object_map[stream_id]
+
+
+async def checkpoint_pinned_stream(stream_id: uuid.UUID, pinned: PinnedStream):
+    """Persist the pinned streamer, the caller must hold its lock"""
+    try:
+        pinned.version = await run_in_threadpool(
+            checkpoint_stream, stream_id, pinned.evaluator_streamer, pinned.version
+        )
+    except StreamVersionConflictException:
+        invalidate_pinned_stream(stream_id, pinned)
+        pinned.changed.notify_all()
+        raise
+    pinned.checkpointed_window = pinned.evaluator_streamer._run_step
+    pinned.is_dirty = False
+
+
+async def check_pinned_stream_version(stream_id: uuid.UUID, pinned: PinnedStream):
+    """
+    Invalidate the pinned streamer when the stored stream was updated outside of
+    the sessions, which do not hear of predictions made through the REST
+    endpoints. The caller must hold its lock
+    """
+    version = await run_in_threadpool(get_stream_version, stream_id)
+    if version != pinned.version:
+        invalidate_pinned_stream(stream_id, pinned)
+        pinned.changed.notify_all()
+
+
+async def unpin_stream(stream_id: uuid.UUID, pinned: PinnedStream):
+    """Release a session, checkpointing the stream when it was the last one"""
+    async with pinned.lock:
+        with _pinned_streams_lock:
+            pinned.sessions -= 1
+            is_last_session = pinned.sessions == 0
+        try:
+            if is_last_session and pinned.is_dirty and not pinned.is_invalidated:
+                await checkpoint_pinned_stream(stream_id, pinned)
+        finally:
+            with _pinned_streams_lock:
+                if (
+                    pinned.sessions == 0
+                    and constants.evaluator_stream_object_map.get(stream_id) is pinned
+                ):
+                    del constants.evaluator_stream_object_map[stream_id]
+
+
+def is_waiting_for_window(
+    evaluator_streamer: EvaluatorStreamer, algorithm_id: uuid.UUID
+) -> bool:
+    """Whether the algorithm predicted the current window and others have not"""
+    status = evaluator_streamer.status_registry[algorithm_id]
+    return (
+        status.state.name == "PREDICTED"
+        and status.data_segment == evaluator_streamer._current_timestamp
+        and not evaluator_streamer.status_registry.is_all_predicted()
+    )
+
+
+def apply_session_prediction(
+    stream_id: uuid.UUID,
+    evaluator_streamer: EvaluatorStreamer,
+    algorithm_id: uuid.UUID,
+    prediction: Union[InteractionMatrix, csr_matrix],
+) -> str:
+    validate_loaded_prediction(stream_id, evaluator_streamer, prediction)
+    evaluator_streamer.submit_prediction(algorithm_id, prediction)
+    state = evaluator_streamer.get_algorithm_state(algorithm_id).name
+    if state not in {"PREDICTED", "COMPLETED"}:
+        raise InvalidPredictionException(
+            message=f"Prediction was not accepted, algorithm is {state}"
+        )
+    return state
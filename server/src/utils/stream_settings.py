@@ -0,0 +1,24 @@
+from typing import Any, Dict, Optional, cast
+
+from streamsightv2.evaluators.evaluator_stream import EvaluatorStreamer
+from streamsightv2.settings import SlidingWindowSetting
+
+
+def get_streamer_settings(
+    evaluator_streamer: EvaluatorStreamer,
+) -> Optional[Dict[str, Any]]:
+    """
+    Settings of a stream that do not change after it was created, None for
+    settings other than a sliding window
+    """
+    if not evaluator_streamer.setting._sliding_window_setting:
+        return None
+    sliding_window_setting = cast(SlidingWindowSetting, evaluator_streamer.setting)
+    return {
+        "n_seq_data": int(sliding_window_setting.n_seq_data),
+        "window_size": int(sliding_window_setting.window_size),
+        "background_t": int(sliding_window_setting.t),
+        "top_k": int(sliding_window_setting.top_K),
+        "metrics": [entry.name for entry in evaluator_streamer.metric_entries],
+        "number_of_windows": int(sliding_window_setting.num_split),
+    }
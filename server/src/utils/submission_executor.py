@@ -0,0 +1,80 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from src.settings import (
+    SUBMISSION_MAX_QUEUE,
+    SUBMISSION_MAX_WORKERS,
+    SUBMISSION_RETRY_AFTER_SECONDS,
+)
+
+
+class SubmissionQueueFullException(Exception):
+    def __init__(
+        self,
+        message="Too many prediction submissions in progress, retry later",
+        status_code=429,
+        retry_after=SUBMISSION_RETRY_AFTER_SECONDS,
+    ):
+        self.message = message
+        self.status_code = status_code
+        self.retry_after = retry_after
+        super().__init__(self.message)
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+# submissions running or waiting for a worker thread
+_pending_submissions = 0
+
+
+def get_submission_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=SUBMISSION_MAX_WORKERS,
+                thread_name_prefix="prediction-submission",
+            )
+        return _executor
+
+
+def get_pending_submissions() -> int:
+    return _pending_submissions
+
+
+def _release_submission(_: Future):
+    global _pending_submissions
+    with _executor_lock:
+        _pending_submissions -= 1
+
+
+async def run_submission(fn: Callable[..., Any], *args) -> Any:
+    """
+    Run blocking submission work (database access, unpickling, evaluation) in
+    the bounded submission pool so the event loop stays free. Raises
+    SubmissionQueueFullException instead of queueing without limit
+    """
+    global _pending_submissions
+    executor = get_submission_executor()
+    with _executor_lock:
+        if _pending_submissions >= SUBMISSION_MAX_WORKERS + SUBMISSION_MAX_QUEUE:
+            raise SubmissionQueueFullException()
+        _pending_submissions += 1
+    try:
+        future = executor.submit(fn, *args)
+    except BaseException:
+        _release_submission(None)
+        raise
+    # the slot is freed when the work finishes, even if the client disconnects
+    future.add_done_callback(_release_submission)
+    return await asyncio.wrap_future(future)
+
+
+def shutdown_submission_executor():
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
@@ -0,0 +1,176 @@
+import pickle
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Dict, List, Optional
+
+from streamsightv2.evaluators.evaluator_stream import EvaluatorStreamer
+
+from src.settings import SUBMISSION_DRAIN_MAX_WORKERS
+from src.utils.db_utils import (
+    claim_pending_prediction_submissions,
+    complete_prediction_submissions,
+    get_stream_from_db,
+    get_streams_with_pending_submissions,
+    mark_prediction_submissions,
+    release_prediction_submissions,
+    release_stale_submission_claims,
+)
+from src.utils.prediction_utils import InvalidPredictionException
+from src.utils.prediction_validation import (
+    submit_loaded_prediction,
+    validate_loaded_prediction,
+)
+from src.utils.stream_actor import run_stream_operation
+
+# streams with a drain running, mapped to whether more submissions arrived
+# while it was running and another pass is needed
+_draining_streams: Dict[uuid.UUID, bool] = {}
+_draining_lock = threading.Lock()
+_drain_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_drain_executor() -> ThreadPoolExecutor:
+    global _drain_executor
+    with _draining_lock:
+        if _drain_executor is None:
+            _drain_executor = ThreadPoolExecutor(
+                max_workers=SUBMISSION_DRAIN_MAX_WORKERS,
+                thread_name_prefix="prediction-drain",
+            )
+        return _drain_executor
+
+
+def shutdown_drain_executor():
+    global _drain_executor
+    with _draining_lock:
+        executor, _drain_executor = _drain_executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+class SubmissionFailedException(Exception):
+    def __init__(self, submission_id: uuid.UUID, message: str):
+        self.submission_id = submission_id
+        self.message = message
+        super().__init__(self.message)
+
+
+def apply_submissions(
+    stream_id: uuid.UUID,
+    submissions: List[Any],
+    errors: Dict[uuid.UUID, Optional[str]],
+    evaluator_streamer: EvaluatorStreamer,
+):
+    for submission in submissions:
+        prediction = pickle.loads(submission.prediction)
+        try:
+            validate_loaded_prediction(stream_id, evaluator_streamer, prediction)
+        except InvalidPredictionException as e:
+            # rejected before the streamer was touched
+            errors[submission.submission_id] = e.message
+            continue
+        try:
+            submit_loaded_prediction(
+                evaluator_streamer, submission.algorithm_id, prediction
+            )
+        except Exception as e:
+            # the streamer may be partly changed, fail the operation so the
+            # stream actor drops it
+            raise SubmissionFailedException(submission.submission_id, str(e))
+        errors[submission.submission_id] = None
+
+
+def evaluate_pending_submissions(stream_id: uuid.UUID) -> int:
+    """
+    Claim every pending submission of a stream, apply them as one operation of
+    the stream actor and persist it once, returns the number of submissions
+    evaluated.
+    When the streamer fails on a submission, it is marked FAILED and the others
+    are applied again to the stream as it was before
+    """
+    submissions = claim_pending_prediction_submissions(stream_id)
+    if not submissions:
+        return 0
+    try:
+        return evaluate_claimed_submissions(stream_id, submissions)
+    except Exception:
+        # submissions that were not evaluated are picked up by the next drain
+        release_prediction_submissions(
+            [submission.submission_id for submission in submissions]
+        )
+        raise
+
+
+def evaluate_claimed_submissions(stream_id: uuid.UUID, submissions: List[Any]) -> int:
+    errors: Dict[uuid.UUID, Optional[str]] = {}
+    failed: Dict[uuid.UUID, str] = {}
+    is_persisted = False
+
+    def persist_stream(stream_id: uuid.UUID, evaluator_streamer: EvaluatorStreamer):
+        nonlocal is_persisted
+        version = complete_prediction_submissions(
+            stream_id, evaluator_streamer, {**errors, **failed}
+        )
+        is_persisted = True
+        return version
+
+    while True:
+        pending = [
+            submission
+            for submission in submissions
+            if submission.submission_id not in failed
+        ]
+        errors.clear()
+        try:
+            run_stream_operation(
+                stream_id,
+                partial(apply_submissions, stream_id, pending, errors),
+                get_stream_from_db,
+                persist_stream,
+            )
+            break
+        except SubmissionFailedException as e:
+            failed[e.submission_id] = e.message
+            if len(failed) == len(submissions):
+                break
+    if not is_persisted:
+        # the stream was persisted with the batch of another request, or not
+        # at all because every submission failed
+        mark_prediction_submissions({**errors, **failed})
+    return len(submissions)
+
+
+def _drain_stream(stream_id: uuid.UUID):
+    while True:
+        try:
+            evaluate_pending_submissions(stream_id)
+        except Exception as e:
+            # submissions stay pending and are retried on the next schedule
+            print(f"Error evaluating submissions of stream {stream_id}: {str(e)}")
+        with _draining_lock:
+            if not _draining_streams[stream_id]:
+                del _draining_streams[stream_id]
+                return
+            _draining_streams[stream_id] = False
+
+
+def schedule_stream_evaluation(stream_id: uuid.UUID):
+    """
+    Evaluate pending submissions of a stream in the background. Only one drain
+    runs per stream at a time, so submissions that arrive during a drain are
+    batched into its next pass
+    """
+    with _draining_lock:
+        if stream_id in _draining_streams:
+            _draining_streams[stream_id] = True
+            return
+        _draining_streams[stream_id] = False
+    get_drain_executor().submit(_drain_stream, stream_id)
+
+
+def resume_pending_submissions():
+    release_stale_submission_claims()
+    for stream_id in get_streams_with_pending_submissions():
+        schedule_stream_evaluation(stream_id)
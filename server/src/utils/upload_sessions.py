@@ -0,0 +1,202 @@
+import threading
+import time
+import uuid
+from typing import Dict, List, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from src.settings import UPLOAD_SESSION_MAX_BYTES, UPLOAD_SESSION_TTL_SECONDS
+from src.utils.prediction_utils import (
+    DATA_DTYPES,
+    INDEX_DTYPES,
+    InvalidPredictionException,
+    array_from_buffer,
+    build_prediction_matrix,
+    parse_dtype,
+)
+
+
+class UploadSessionNotFoundException(Exception):
+    def __init__(self, message="Upload session not found", status_code=404):
+        self.message = message
+        self.status_code = status_code
+        super().__init__(self.message)
+
+
+class PredictionUploadSession:
+    """
+    A CSR prediction matrix assembled from row ranges that may arrive in any
+    order and in parallel. Buffers for every stored value are allocated up
+    front and each chunk is copied straight into its slice of them
+    """
+
+    def __init__(
+        self,
+        stream_id: uuid.UUID,
+        algorithm_id: uuid.UUID,
+        shape: Tuple[int, int],
+        nnz: int,
+        data_dtype: str,
+        index_dtype: str,
+    ):
+        self.upload_id = uuid.uuid4()
+        self.stream_id = stream_id
+        self.algorithm_id = algorithm_id
+        self.shape = shape
+        self.nnz = nnz
+        self.data_dtype = parse_dtype(data_dtype, DATA_DTYPES)
+        self.index_dtype = parse_dtype(index_dtype, INDEX_DTYPES)
+        self.data = np.empty(nnz, dtype=self.data_dtype.newbyteorder("="))
+        self.indices = np.empty(nnz, dtype=self.index_dtype.newbyteorder("="))
+        self.indptr = np.zeros(shape[0] + 1, dtype=self.index_dtype.newbyteorder("="))
+        self.indptr_received = np.zeros(shape[0] + 1, dtype=bool)
+        self.rows_received = np.zeros(shape[0], dtype=bool)
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return self.data.nbytes + self.indices.nbytes + self.indptr.nbytes
+
+    def write_rows(self, start: int, end: int, buffer: bytes):
+        """
+        Store rows [start, end) from a body laid out as data, indices then the
+        absolute indptr[start:end + 1] of the full matrix
+        """
+        num_rows = self.shape[0]
+        if not 0 <= start < end <= num_rows:
+            raise InvalidPredictionException(
+                message=f"Row range must satisfy 0 <= start < end <= {num_rows}"
+            )
+        indptr_size = (end - start + 1) * self.index_dtype.itemsize
+        if len(buffer) < indptr_size:
+            raise InvalidPredictionException(message="Chunk is too small for indptr")
+        view = memoryview(buffer)
+        indptr = array_from_buffer(view[-indptr_size:], self.index_dtype, "indptr")
+        if indptr[0] < 0 or indptr[-1] > self.nnz or np.any(np.diff(indptr) < 0):
+            raise InvalidPredictionException(
+                message="indptr must be non-decreasing and within the declared nnz"
+            )
+        count = int(indptr[-1] - indptr[0])
+        data_size = count * self.data_dtype.itemsize
+        if len(buffer) != data_size + count * self.index_dtype.itemsize + indptr_size:
+            raise InvalidPredictionException(
+                message="Chunk size does not match the values described by indptr"
+            )
+        data = array_from_buffer(view[:data_size], self.data_dtype, "data")
+        indices = array_from_buffer(
+            view[data_size:-indptr_size], self.index_dtype, "indices"
+        )
+        if count and (indices.min() < 0 or indices.max() >= self.shape[1]):
+            raise InvalidPredictionException(message="indices out of bounds for shape")
+
+        with self.lock:
+            # neighbouring chunks share their boundary entry of indptr
+            received = self.indptr_received[start : end + 1]
+            if np.any(self.indptr[start : end + 1][received] != indptr[received]):
+                raise InvalidPredictionException(
+                    message="indptr conflicts with previously uploaded rows",
+                    status_code=409,
+                )
+            self.data[indptr[0] : indptr[-1]] = data
+            self.indices[indptr[0] : indptr[-1]] = indices
+            self.indptr[start : end + 1] = indptr
+            self.indptr_received[start : end + 1] = True
+            self.rows_received[start:end] = True
+            self.last_used = time.monotonic()
+
+    def get_missing_ranges(self) -> List[Tuple[int, int]]:
+        with self.lock:
+            missing = np.concatenate(([False], ~self.rows_received, [False]))
+        edges = np.flatnonzero(np.diff(missing.astype(np.int8)))
+        return [(int(start), int(end)) for start, end in zip(edges[::2], edges[1::2])]
+
+    def build_matrix(self) -> csr_matrix:
+        with self.lock:
+            if not self.rows_received.all():
+                raise InvalidPredictionException(
+                    message="Upload is incomplete, some rows are missing",
+                    status_code=409,
+                )
+            return build_prediction_matrix(
+                self.data, self.indices, self.indptr, self.shape
+            )
+
+
+_upload_sessions: Dict[uuid.UUID, PredictionUploadSession] = {}
+_upload_sessions_lock = threading.Lock()
+
+
+def _expire_upload_sessions():
+    expired_before = time.monotonic() - UPLOAD_SESSION_TTL_SECONDS
+    for upload_id in [
+        upload_id
+        for upload_id, session in _upload_sessions.items()
+        if session.last_used < expired_before
+    ]:
+        del _upload_sessions[upload_id]
+
+
+def create_upload_session(
+    stream_id: uuid.UUID,
+    algorithm_id: uuid.UUID,
+    shape: Tuple[int, int],
+    nnz: int,
+    data_dtype: str = "float64",
+    index_dtype: str = "int32",
+) -> PredictionUploadSession:
+    data_type = parse_dtype(data_dtype, DATA_DTYPES)
+    index_type = parse_dtype(index_dtype, INDEX_DTYPES)
+    if nnz < 0 or min(shape) < 0:
+        raise InvalidPredictionException(message="shape and nnz must be non-negative")
+    if nnz > shape[0] * shape[1]:
+        raise InvalidPredictionException(message="nnz cannot exceed rows * columns")
+    if max(nnz, shape[1]) > np.iinfo(index_type).max:
+        raise InvalidPredictionException(
+            message=f"{index_dtype} cannot index a matrix of this size"
+        )
+    size = (
+        nnz * (data_type.itemsize + index_type.itemsize)
+        + (shape[0] + 1) * index_type.itemsize
+    )
+    with _upload_sessions_lock:
+        _expire_upload_sessions()
+        used_bytes = sum(existing.size for existing in _upload_sessions.values())
+        if used_bytes + size > UPLOAD_SESSION_MAX_BYTES:
+            raise InvalidPredictionException(
+                message="Not enough upload capacity, retry later", status_code=503
+            )
+        # allocated under the lock so concurrent sessions cannot overshoot
+        session = PredictionUploadSession(
+            stream_id, algorithm_id, shape, nnz, data_dtype, index_dtype
+        )
+        _upload_sessions[session.upload_id] = session
+    return session
+
+
+def get_upload_session(
+    upload_id: uuid.UUID, stream_id: uuid.UUID, algorithm_id: uuid.UUID
+) -> PredictionUploadSession:
+    with _upload_sessions_lock:
+        _expire_upload_sessions()
+        session = _upload_sessions.get(upload_id)
+    if (
+        session is None
+        or session.stream_id != stream_id
+        or session.algorithm_id != algorithm_id
+    ):
+        raise UploadSessionNotFoundException(
+            message=f"Upload session with ID {upload_id} not found"
+        )
+    return session
+
+
+def delete_upload_session(upload_id: uuid.UUID):
+    with _upload_sessions_lock:
+        _upload_sessions.pop(upload_id, None)
+
+
+def clear_upload_sessions():
+    with _upload_sessions_lock:
+        _upload_sessions.clear()
@@ -22,3 +22,15 @@ def get_algo_uuid_object(algo_id: str):
 
 def get_stream_uuid_object(stream_id: str):
     return get_uuid_object(stream_id, "Invalid Stream UUID format")
+
+
+def get_submission_uuid_object(submission_id: str):
+    return get_uuid_object(submission_id, "Invalid Submission UUID format")
+
+
+def get_upload_uuid_object(upload_id: str):
+    return get_uuid_object(upload_id, "Invalid Upload UUID format")
+
+
+def get_lease_uuid_object(lease_id: str):
+    return get_uuid_object(lease_id, "Invalid Lease UUID format")
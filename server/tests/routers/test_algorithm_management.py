@@ -1,3 +1,6 @@
+import json
+import threading
+import time
 import unittest
 from unittest.mock import MagicMock, patch
 from uuid import UUID
@@ -6,6 +9,11 @@ from fastapi.testclient import TestClient
 
 from src.main import app
 from src.utils.db_utils import DatabaseErrorException, GetEvaluatorStreamErrorException
+from src.utils.state_events import (
+    AlgorithmStatesEvent,
+    get_subscriber_count,
+    publish_local,
+)
 from src.utils.uuid_utils import InvalidUUIDException
 
 client = TestClient(app)
@@ -213,8 +221,93 @@ class TestRegisterAlgorithm(unittest.TestCase):
             assert response.json() == {"detail": "error updating db"}
 
 
+class TestRegisterAlgorithms(unittest.TestCase):
+    def setUp(self):
+        self.mock_evaluator_streamer = MagicMock()
+        self.mock_evaluator_streamer.register_algorithm.side_effect = [
+            UUID("12345678-1234-5678-1234-567812345678"),
+            UUID("87654321-4321-8765-4321-876543218765"),
+        ]
+
+    def test_register_algorithms_valid(self):
+        with patch(
+            "src.routers.algorithm_management.get_stream_from_db",
+            return_value=self.mock_evaluator_streamer,
+        ) as mock_get_from_db, patch(
+            "src.routers.algorithm_management.update_stream",
+            return_value=None,
+        ) as mock_update_evaluator_streamer:
+            response = client.post(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/algorithms/bulk",
+                json={"algorithm_names": ["ItemKNN", "Popularity"]},
+            )
+
+            assert response.status_code == 200
+            assert response.json() == {
+                "algorithm_uuids": [
+                    "12345678-1234-5678-1234-567812345678",
+                    "87654321-4321-8765-4321-876543218765",
+                ]
+            }
+            mock_get_from_db.assert_called_once_with(
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+            )
+            assert [
+                call.kwargs
+                for call in self.mock_evaluator_streamer.register_algorithm.call_args_list
+            ] == [{"algorithm_name": "ItemKNN"}, {"algorithm_name": "Popularity"}]
+            mock_update_evaluator_streamer.assert_called_once_with(
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"),
+                self.mock_evaluator_streamer,
+            )
+
+    def test_register_algorithms_empty(self):
+        response = client.post(
+            "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/algorithms/bulk",
+            json={"algorithm_names": []},
+        )
+
+        assert response.status_code == 422
+
+    def test_register_algorithms_invalid_uuid(self):
+        response = client.post(
+            "/streams/invalid/algorithms/bulk",
+            json={"algorithm_names": ["ItemKNN"]},
+        )
+
+        assert response.status_code == 400
+        assert response.json() == {"detail": "Invalid Stream UUID format"}
+
+    def test_register_algorithms_error_not_persisted(self):
+        self.mock_evaluator_streamer.register_algorithm.side_effect = [
+            UUID("12345678-1234-5678-1234-567812345678"),
+            ValueError("Cannot register algorithms after the stream has started"),
+        ]
+        with patch(
+            "src.routers.algorithm_management.get_stream_from_db",
+            return_value=self.mock_evaluator_streamer,
+        ), patch(
+            "src.routers.algorithm_management.update_stream"
+        ) as mock_update_evaluator_streamer:
+            response = client.post(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/algorithms/bulk",
+                json={"algorithm_names": ["ItemKNN", "Popularity"]},
+            )
+
+            assert response.status_code == 500
+            assert response.json() == {
+                "detail": "Error registering algorithms: Cannot register algorithms after the stream has started"
+            }
+            mock_update_evaluator_streamer.assert_not_called()
+
+
 class TestGetAlgorithmState(unittest.TestCase):
     def setUp(self):
+        version_patcher = patch(
+            "src.routers.algorithm_management.get_stream_version", return_value=1
+        )
+        self.mock_get_stream_version = version_patcher.start()
+        self.addCleanup(version_patcher.stop)
         self.mock_evaluator_streamer = self.create_mock_evaluator_streamer()
         self.mock_error_evaluator_streamer = self.create_mock_error_evaluator_streamer()
 
@@ -250,7 +343,7 @@ class TestGetAlgorithmState(unittest.TestCase):
                 "12345678-1234-5678-1234-567812345678"
             )
             mock_get_from_db.assert_called_once_with(
-                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"), 1
             )
             self.mock_evaluator_streamer.get_algorithm_state.assert_called_once_with(
                 UUID("12345678-1234-5678-1234-567812345678")
@@ -331,7 +424,7 @@ class TestGetAlgorithmState(unittest.TestCase):
                 "12345678-1234-5678-1234-567812345678"
             )
             mock_get_from_db.assert_called_once_with(
-                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"), 1
             )
             self.mock_evaluator_streamer.get_algorithm_state.assert_not_called()
 
@@ -360,7 +453,7 @@ class TestGetAlgorithmState(unittest.TestCase):
                 "12345678-1234-5678-1234-567812345678"
             )
             mock_get_from_db.assert_called_once_with(
-                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"), 1
             )
             self.mock_evaluator_streamer.get_algorithm_state.assert_not_called()
 
@@ -389,7 +482,7 @@ class TestGetAlgorithmState(unittest.TestCase):
                 "12345678-1234-5678-1234-567812345678"
             )
             mock_get_from_db.assert_called_once_with(
-                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"), 1
             )
             self.mock_error_evaluator_streamer.get_algorithm_state.assert_called_once_with(
                 UUID("12345678-1234-5678-1234-567812345678")
@@ -403,6 +496,11 @@ class TestGetAlgorithmState(unittest.TestCase):
 
 class TestGetAllAlgorithmState(unittest.TestCase):
     def setUp(self):
+        version_patcher = patch(
+            "src.routers.algorithm_management.get_stream_version", return_value=1
+        )
+        self.mock_get_stream_version = version_patcher.start()
+        self.addCleanup(version_patcher.stop)
         self.mock_evaluator_streamer = self.create_mock_evaluator_streamer()
         self.mock_error_evaluator_streamer = self.create_mock_error_evaluator_streamer()
 
@@ -439,7 +537,7 @@ class TestGetAllAlgorithmState(unittest.TestCase):
                 "336e4cb7-861b-4870-8c29-3ffc530711ef"
             )
             mock_get_from_db.assert_called_once_with(
-                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"), 1
             )
             self.mock_evaluator_streamer.get_all_algorithm_status.assert_called_once()
 
@@ -494,7 +592,7 @@ class TestGetAllAlgorithmState(unittest.TestCase):
                 "336e4cb7-861b-4870-8c29-3ffc530711ef"
             )
             mock_get_from_db.assert_called_once_with(
-                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"), 1
             )
             self.mock_evaluator_streamer.get_all_algorithm_status.assert_not_called()
 
@@ -517,7 +615,7 @@ class TestGetAllAlgorithmState(unittest.TestCase):
                 "336e4cb7-861b-4870-8c29-3ffc530711ef"
             )
             mock_get_from_db.assert_called_once_with(
-                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"), 1
             )
             self.mock_evaluator_streamer.get_all_algorithm_status.assert_not_called()
 
@@ -540,7 +638,7 @@ class TestGetAllAlgorithmState(unittest.TestCase):
                 "336e4cb7-861b-4870-8c29-3ffc530711ef"
             )
             mock_get_from_db.assert_called_once_with(
-                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"), 1
             )
             self.mock_error_evaluator_streamer.get_all_algorithm_status.assert_called_once()
 
@@ -549,9 +647,26 @@ class TestGetAllAlgorithmState(unittest.TestCase):
                 "detail": "Error getting all algorithm states: Internal error"
             }
 
+    def test_get_all_algorithm_state_not_modified(self):
+        with patch(
+            "src.routers.algorithm_management.get_stream_from_db",
+        ) as mock_get_from_db:
+            response = client.get(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/algorithms/state",
+                headers={"If-None-Match": '"336e4cb7-861b-4870-8c29-3ffc530711ef-1"'},
+            )
+
+            mock_get_from_db.assert_not_called()
+            assert response.status_code == 304
+
 
 class TestIsAlgoStreamingCompleted(unittest.TestCase):
     def setUp(self):
+        version_patcher = patch(
+            "src.routers.algorithm_management.get_stream_version", return_value=1
+        )
+        self.mock_get_stream_version = version_patcher.start()
+        self.addCleanup(version_patcher.stop)
         self.mock_evaluator_streamer = self.create_mock_evaluator_streamer()
         self.mock_completed_evaluator_streamer = (
             self.create_mock_completed_evaluator_streamer()
@@ -598,7 +713,7 @@ class TestIsAlgoStreamingCompleted(unittest.TestCase):
                 "12345678-1234-5678-1234-567812345678"
             )
             mock_get_from_db.assert_called_once_with(
-                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"), 1
             )
             self.mock_completed_evaluator_streamer.get_algorithm_state.assert_called_once_with(
                 UUID("12345678-1234-5678-1234-567812345678")
@@ -629,7 +744,7 @@ class TestIsAlgoStreamingCompleted(unittest.TestCase):
                 "12345678-1234-5678-1234-567812345678"
             )
             mock_get_from_db.assert_called_once_with(
-                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"), 1
             )
             self.mock_evaluator_streamer.get_algorithm_state.assert_called_once_with(
                 UUID("12345678-1234-5678-1234-567812345678")
@@ -710,7 +825,7 @@ class TestIsAlgoStreamingCompleted(unittest.TestCase):
                 "12345678-1234-5678-1234-567812345678"
             )
             mock_get_from_db.assert_called_once_with(
-                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"), 1
             )
             self.mock_evaluator_streamer.get_algorithm_state.assert_not_called()
 
@@ -739,7 +854,7 @@ class TestIsAlgoStreamingCompleted(unittest.TestCase):
                 "12345678-1234-5678-1234-567812345678"
             )
             mock_get_from_db.assert_called_once_with(
-                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"), 1
             )
             self.mock_evaluator_streamer.get_algorithm_state.assert_not_called()
 
@@ -768,7 +883,7 @@ class TestIsAlgoStreamingCompleted(unittest.TestCase):
                 "12345678-1234-5678-1234-567812345678"
             )
             mock_get_from_db.assert_called_once_with(
-                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"), 1
             )
             self.mock_error_evaluator_streamer.get_algorithm_state.assert_called_once_with(
                 UUID("12345678-1234-5678-1234-567812345678")
@@ -778,3 +893,95 @@ class TestIsAlgoStreamingCompleted(unittest.TestCase):
             assert response.json() == {
                 "detail": "Error checking if algorithm streaming is completed: Internal error"
             }
+
+
+class TestGetAlgorithmStateEvents(unittest.TestCase):
+    def setUp(self):
+        self.url = (
+            "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/algorithms/state/events"
+        )
+        self.stream_uuid = UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+
+    def create_mock_evaluator_streamer(self, state):
+        mock = MagicMock()
+        mock.get_all_algorithm_status.return_value = {
+            "ItemKNN_12345678-1234-5678-1234-567812345678": MagicMock()
+        }
+        mock.get_all_algorithm_status.return_value[
+            "ItemKNN_12345678-1234-5678-1234-567812345678"
+        ].name = state
+        return mock
+
+    def publish_when_subscribed(self, events):
+        def publish():
+            while get_subscriber_count(self.stream_uuid) == 0:
+                time.sleep(0.01)
+            for event in events:
+                publish_local(event)
+
+        thread = threading.Thread(target=publish)
+        thread.start()
+        return thread
+
+    def test_get_algorithm_state_events_completed(self):
+        with patch(
+            "src.routers.algorithm_management.get_stream_version", return_value=3
+        ), patch(
+            "src.routers.algorithm_management.get_stream_from_db",
+            return_value=self.create_mock_evaluator_streamer("COMPLETED"),
+        ):
+            response = client.get(self.url)
+
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("text/event-stream")
+            assert response.text == (
+                "event: state\n"
+                'data: {"algorithm_uuid": "12345678-1234-5678-1234-567812345678", '
+                '"algorithm_name": "ItemKNN", "state": "COMPLETED"}\n\n'
+            )
+            assert get_subscriber_count(self.stream_uuid) == 0
+
+    def test_get_algorithm_state_events_transition(self):
+        algorithm_key = "ItemKNN_12345678-1234-5678-1234-567812345678"
+        # an older version and an unchanged state are not sent again
+        publisher = self.publish_when_subscribed(
+            [
+                AlgorithmStatesEvent(self.stream_uuid, 2, {algorithm_key: "NEW"}),
+                AlgorithmStatesEvent(self.stream_uuid, 4, {algorithm_key: "READY"}),
+                AlgorithmStatesEvent(self.stream_uuid, 5, {algorithm_key: "COMPLETED"}),
+            ]
+        )
+        with patch(
+            "src.routers.algorithm_management.get_stream_version", return_value=3
+        ), patch(
+            "src.routers.algorithm_management.get_stream_from_db",
+            return_value=self.create_mock_evaluator_streamer("READY"),
+        ):
+            response = client.get(self.url)
+        publisher.join()
+
+        assert response.status_code == 200
+        assert [
+            json.loads(line[len("data: ") :])["state"]
+            for line in response.text.splitlines()
+            if line.startswith("data: ")
+        ] == ["READY", "COMPLETED"]
+        assert get_subscriber_count(self.stream_uuid) == 0
+
+    def test_get_algorithm_state_events_invalid_stream_id(self):
+        response = client.get("/streams/invalid/algorithms/state/events")
+
+        assert response.status_code == 400
+
+    def test_get_algorithm_state_events_stream_not_found(self):
+        with patch(
+            "src.routers.algorithm_management.get_stream_version",
+            side_effect=GetEvaluatorStreamErrorException(
+                message="Evaluator stream with ID 336e4cb7-861b-4870-8c29-3ffc530711ef not found",
+                status_code=404,
+            ),
+        ):
+            response = client.get(self.url)
+
+            assert response.status_code == 404
+            assert get_subscriber_count(self.stream_uuid) == 0
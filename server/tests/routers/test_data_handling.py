@@ -6,7 +6,9 @@ import pandas as pd
 from fastapi.testclient import TestClient
 
 from src.main import app
+from src.utils.dataframe_utils import project_interaction_columns
 from src.utils.db_utils import DatabaseErrorException, GetEvaluatorStreamErrorException
+from src.utils.payload_cache import clear_payload_cache
 from src.utils.uuid_utils import InvalidUUIDException
 
 client = TestClient(app)
@@ -14,6 +16,12 @@ client = TestClient(app)
 
 class TestGetTrainingData(unittest.TestCase):
     def setUp(self):
+        version_patcher = patch(
+            "src.routers.data_handling.get_stream_version", return_value=1
+        )
+        self.mock_get_stream_version = version_patcher.start()
+        self.addCleanup(version_patcher.stop)
+        clear_payload_cache()
         self.mock_interaction_matrix = self.create_mock_interaction_matrix()
         self.mock_evaluator_streamer = self.create_mock_evaluator_streamer()
         self.mock_evaluator_streamer_error = self.create_mock_evaluator_streamer_error()
@@ -31,7 +39,7 @@ class TestGetTrainingData(unittest.TestCase):
 
         # Create the DataFrame
         df = pd.DataFrame(data)
-        mock.copy_df.return_value = df
+        mock._df = df
         return mock
 
     def create_mock_evaluator_streamer(self):
@@ -73,7 +81,7 @@ class TestGetTrainingData(unittest.TestCase):
             self.mock_evaluator_streamer.get_data.assert_called_once_with(
                 UUID("12345678-1234-5678-1234-567812345678")
             )
-            self.mock_interaction_matrix.copy_df.assert_called_once()
+            self.mock_interaction_matrix.copy_df.assert_not_called()
             mock_update_evaluator_stream.assert_called_once_with(
                 UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"),
                 self.mock_evaluator_streamer,
@@ -119,7 +127,7 @@ class TestGetTrainingData(unittest.TestCase):
             self.mock_evaluator_streamer.get_data.assert_called_once_with(
                 UUID("12345678-1234-5678-1234-567812345678")
             )
-            self.mock_interaction_matrix.copy_df.assert_called_once()
+            self.mock_interaction_matrix.copy_df.assert_not_called()
             mock_update_evaluator_stream.assert_called_once_with(
                 UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"),
                 self.mock_evaluator_streamer,
@@ -354,9 +362,46 @@ class TestGetTrainingData(unittest.TestCase):
             assert response.status_code == 500
             assert response.json() == {"detail": "error updating db"}
 
+    def test_get_training_data_etag_from_updated_version(self):
+        with patch(
+            "src.routers.data_handling.get_stream_from_db",
+            return_value=self.mock_evaluator_streamer,
+        ), patch("src.routers.data_handling.update_stream", return_value=2):
+            response = client.get(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/algorithms/12345678-1234-5678-1234-567812345678/training-data"
+            )
+
+            assert response.status_code == 200
+            assert (
+                response.headers["ETag"] == '"336e4cb7-861b-4870-8c29-3ffc530711ef-2"'
+            )
+
+    def test_get_training_data_not_modified(self):
+        with patch(
+            "src.routers.data_handling.get_stream_from_db",
+            return_value=self.mock_evaluator_streamer,
+        ) as mock_get_evaluator_stream_from_db, patch(
+            "src.routers.data_handling.update_stream", return_value=2
+        ) as mock_update_evaluator_stream:
+            response = client.get(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/algorithms/12345678-1234-5678-1234-567812345678/training-data",
+                headers={"If-None-Match": 'W/"336e4cb7-861b-4870-8c29-3ffc530711ef-1"'},
+            )
+
+            mock_get_evaluator_stream_from_db.assert_not_called()
+            self.mock_evaluator_streamer.get_data.assert_not_called()
+            mock_update_evaluator_stream.assert_not_called()
+            assert response.status_code == 304
+
 
 class TestGetUnlabeledData(unittest.TestCase):
     def setUp(self):
+        version_patcher = patch(
+            "src.routers.data_handling.get_stream_version", return_value=1
+        )
+        self.mock_get_stream_version = version_patcher.start()
+        self.addCleanup(version_patcher.stop)
+        clear_payload_cache()
         self.mock_interaction_matrix = self.create_mock_interaction_matrix()
         self.mock_evaluator_streamer = self.create_mock_evaluator_streamer()
         self.mock_evaluator_streamer_error = self.create_mock_evaluator_streamer_error()
@@ -374,7 +419,7 @@ class TestGetUnlabeledData(unittest.TestCase):
 
         # Create the DataFrame
         df = pd.DataFrame(data)
-        mock.copy_df.return_value = df
+        mock._df = df
         return mock
 
     def create_mock_evaluator_streamer(self):
@@ -416,7 +461,7 @@ class TestGetUnlabeledData(unittest.TestCase):
             self.mock_evaluator_streamer.get_unlabeled_data.assert_called_once_with(
                 UUID("12345678-1234-5678-1234-567812345678")
             )
-            self.mock_interaction_matrix.copy_df.assert_called_once()
+            self.mock_interaction_matrix.copy_df.assert_not_called()
             mock_update_evaluator_stream.assert_called_once_with(
                 UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"),
                 self.mock_evaluator_streamer,
@@ -466,7 +511,7 @@ class TestGetUnlabeledData(unittest.TestCase):
             self.mock_evaluator_streamer.get_unlabeled_data.assert_called_once_with(
                 UUID("12345678-1234-5678-1234-567812345678")
             )
-            self.mock_interaction_matrix.copy_df.assert_called_once()
+            self.mock_interaction_matrix.copy_df.assert_not_called()
             mock_update_evaluator_stream.assert_called_once_with(
                 UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"),
                 self.mock_evaluator_streamer,
@@ -704,3 +749,79 @@ class TestGetUnlabeledData(unittest.TestCase):
 
             assert response.status_code == 500
             assert response.json() == {"detail": "error updating db"}
+
+    def test_get_unlabeled_data_shared_across_algorithms(self):
+        self.mock_evaluator_streamer._run_step = 1
+        with patch(
+            "src.routers.data_handling.get_stream_from_db",
+            return_value=self.mock_evaluator_streamer,
+        ), patch("src.routers.data_handling.update_stream", return_value=None), patch(
+            "src.routers.data_handling.project_interaction_columns",
+            wraps=project_interaction_columns,
+        ) as mock_project:
+            first_response = client.get(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/algorithms/12345678-1234-5678-1234-567812345678/unlabeled-data"
+            )
+            second_response = client.get(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/algorithms/87654321-4321-8765-4321-876543218765/unlabeled-data"
+            )
+
+            mock_project.assert_called_once()
+            assert self.mock_evaluator_streamer.get_unlabeled_data.call_count == 2
+            assert second_response.status_code == 200
+            assert second_response.content == first_response.content
+
+    def test_get_unlabeled_data_reencoded_for_new_window(self):
+        self.mock_evaluator_streamer._run_step = 1
+        with patch(
+            "src.routers.data_handling.get_stream_from_db",
+            return_value=self.mock_evaluator_streamer,
+        ), patch("src.routers.data_handling.update_stream", return_value=None), patch(
+            "src.routers.data_handling.project_interaction_columns",
+            wraps=project_interaction_columns,
+        ) as mock_project:
+            client.get(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/algorithms/12345678-1234-5678-1234-567812345678/unlabeled-data"
+            )
+            self.mock_evaluator_streamer._run_step = 2
+            response = client.get(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/algorithms/12345678-1234-5678-1234-567812345678/unlabeled-data"
+            )
+
+            assert mock_project.call_count == 2
+            assert response.status_code == 200
+
+    def test_get_unlabeled_data_selected_columns(self):
+        with patch(
+            "src.routers.data_handling.get_stream_from_db",
+            return_value=self.mock_evaluator_streamer,
+        ), patch("src.routers.data_handling.update_stream", return_value=None):
+            response = client.get(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/algorithms/12345678-1234-5678-1234-567812345678/unlabeled-data?columns=uid,additional_feature_1"
+            )
+
+            assert response.status_code == 200
+            assert response.json() == {
+                "shape": [3, 3],
+                "unlabeled_data": [
+                    {"uid": 0, "additional_feature_1": 10},
+                    {"uid": 1, "additional_feature_1": 8},
+                    {"uid": 2, "additional_feature_1": 2},
+                    {"uid": 0, "additional_feature_1": 6},
+                ],
+            }
+
+    def test_get_unlabeled_data_unknown_columns(self):
+        with patch(
+            "src.routers.data_handling.get_stream_from_db",
+            return_value=self.mock_evaluator_streamer,
+        ), patch(
+            "src.routers.data_handling.update_stream", return_value=None
+        ) as mock_update_evaluator_stream:
+            response = client.get(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/algorithms/12345678-1234-5678-1234-567812345678/unlabeled-data?columns=uid,rating"
+            )
+
+            mock_update_evaluator_stream.assert_not_called()
+            assert response.status_code == 400
+            assert response.json() == {"detail": "Unknown columns requested: rating"}
@@ -0,0 +1,243 @@
+import io
+import json
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+from uuid import UUID
+
+import pandas as pd
+from fastapi.testclient import TestClient
+from scipy.sparse import csr_matrix, save_npz
+from starlette.websockets import WebSocketDisconnect
+
+from src import constants
+from src.main import app
+from src.utils.db_utils import (
+    GetEvaluatorStreamErrorException,
+    StreamVersionConflictException,
+)
+from src.utils.payload_cache import clear_payload_cache
+
+client = TestClient(app)
+
+ALGORITHM_UUID = UUID("12345678-1234-5678-1234-567812345678")
+OTHER_ALGORITHM_UUID = UUID("87654321-4321-8765-4321-876543218765")
+STREAM_UUID = UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+
+
+class FakeStatusRegistry(dict):
+    def is_all_predicted(self):
+        return all(status.state.name == "PREDICTED" for status in self.values())
+
+
+class FakeEvaluatorStreamer:
+    """Follows the state machine of EvaluatorStreamer for a single algorithm"""
+
+    def __init__(self, num_split=2):
+        self.num_split = num_split
+        self._run_step = 1
+        self._current_timestamp = 10
+        self.status_registry = FakeStatusRegistry(
+            {
+                ALGORITHM_UUID: SimpleNamespace(
+                    state=SimpleNamespace(name="NEW"), data_segment=None
+                )
+            }
+        )
+        self.predictions = []
+
+    def set_state(self, algorithm_id, state):
+        status = self.status_registry[algorithm_id]
+        status.state = SimpleNamespace(name=state)
+        if state == "READY":
+            status.data_segment = self._current_timestamp
+
+    def get_algorithm_state(self, algorithm_id):
+        return self.status_registry[algorithm_id].state
+
+    def get_data(self, algorithm_id):
+        if self.status_registry.is_all_predicted():
+            self._run_step += 1
+            self._current_timestamp += 10
+        self.set_state(algorithm_id, "READY")
+        return SimpleNamespace(
+            shape=(2, 3),
+            _df=pd.DataFrame(
+                {
+                    "interactionid": [0],
+                    "uid": [0],
+                    "iid": [self._run_step],
+                    "ts": [self._current_timestamp],
+                }
+            ),
+        )
+
+    def get_unlabeled_data(self, algorithm_id):
+        return SimpleNamespace(
+            shape=(2, 3),
+            _df=pd.DataFrame(
+                {"interactionid": [1], "uid": [1], "iid": [-1], "ts": [0]}
+            ),
+        )
+
+    def submit_prediction(self, algorithm_id, prediction):
+        if self.get_algorithm_state(algorithm_id).name != "READY":
+            return
+        self.predictions.append(prediction)
+        self.set_state(algorithm_id, "PREDICTED")
+        if self._run_step == self.num_split:
+            self.set_state(algorithm_id, "COMPLETED")
+
+
+def encode_prediction():
+    buffer = io.BytesIO()
+    save_npz(buffer, csr_matrix([[1.0, 0, 0], [0, 2.0, 0]]))
+    return buffer.getvalue()
+
+
+class TestEvaluationSession(unittest.TestCase):
+    def setUp(self):
+        clear_payload_cache()
+        self.addCleanup(clear_payload_cache)
+        self.evaluator_streamer = FakeEvaluatorStreamer()
+        self.url = "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/algorithms/12345678-1234-5678-1234-567812345678/session"
+        for target, kwargs in [
+            ("get_stream_version", {"return_value": 1}),
+            ("get_stream_from_db", {"return_value": self.evaluator_streamer}),
+            ("checkpoint_stream", {"side_effect": [2, 3]}),
+            ("validate_loaded_prediction", {}),
+        ]:
+            patcher = patch(f"src.utils.stream_sessions.{target}", **kwargs)
+            setattr(self, f"mock_{target}", patcher.start())
+            self.addCleanup(patcher.stop)
+
+    def test_evaluation_session(self):
+        with client.websocket_connect(self.url) as websocket:
+            window = websocket.receive_json()
+            assert window == {
+                "type": "window",
+                "state": "READY",
+                "window": 1,
+                "training": {
+                    "shape": [2, 3],
+                    "training_data": [
+                        {"interactionid": 0, "uid": 0, "iid": 1, "ts": 10}
+                    ],
+                },
+                "unlabeled": {
+                    "shape": [2, 3],
+                    "unlabeled_data": [
+                        {"interactionid": 1, "uid": 1, "iid": -1, "ts": 0}
+                    ],
+                },
+            }
+            # nothing is persisted within a window
+            self.mock_checkpoint_stream.assert_not_called()
+
+            websocket.send_bytes(encode_prediction())
+            window = websocket.receive_json()
+            assert window["window"] == 2
+            assert window["training"]["training_data"][0]["iid"] == 2
+            self.mock_checkpoint_stream.assert_called_once_with(
+                STREAM_UUID, self.evaluator_streamer, 1
+            )
+
+            websocket.send_bytes(encode_prediction())
+            assert websocket.receive_json() == {
+                "type": "completed",
+                "state": "COMPLETED",
+            }
+
+        assert len(self.evaluator_streamer.predictions) == 2
+        assert self.evaluator_streamer.predictions[0].shape == (2, 3)
+        # the completed stream is persisted when the session ends
+        assert self.mock_checkpoint_stream.call_count == 2
+        assert self.mock_checkpoint_stream.call_args[0][2] == 2
+        self.mock_get_stream_from_db.assert_called_once_with(STREAM_UUID)
+        assert STREAM_UUID not in constants.evaluator_stream_object_map
+
+    def test_evaluation_session_rejects_text_frames(self):
+        with client.websocket_connect(self.url) as websocket:
+            websocket.receive_json()
+            websocket.send_text(json.dumps({"data": [1]}))
+            assert websocket.receive_json() == {
+                "type": "error",
+                "detail": "Predictions must be sent as binary NPZ frames",
+            }
+            websocket.send_bytes(b"not an npz file")
+            assert websocket.receive_json()["type"] == "error"
+
+            websocket.send_bytes(encode_prediction())
+            assert websocket.receive_json()["window"] == 2
+
+        assert len(self.evaluator_streamer.predictions) == 1
+
+    def test_evaluation_session_disconnect_checkpoints(self):
+        with client.websocket_connect(self.url) as websocket:
+            websocket.receive_json()
+
+        # releasing the first window moved the algorithm to READY
+        self.mock_checkpoint_stream.assert_called_once_with(
+            STREAM_UUID, self.evaluator_streamer, 1
+        )
+        assert STREAM_UUID not in constants.evaluator_stream_object_map
+
+    def test_evaluation_session_version_conflict(self):
+        self.mock_checkpoint_stream.side_effect = StreamVersionConflictException()
+        with client.websocket_connect(self.url) as websocket:
+            websocket.receive_json()
+            websocket.send_bytes(encode_prediction())
+
+            assert websocket.receive_json() == {
+                "type": "error",
+                "detail": "Evaluator stream was modified by another request",
+            }
+            with self.assertRaises(WebSocketDisconnect) as context:
+                websocket.receive_json()
+            assert context.exception.code == 4409
+
+        # the stale streamer is dropped instead of being persisted again
+        self.mock_checkpoint_stream.assert_called_once()
+        assert STREAM_UUID not in constants.evaluator_stream_object_map
+
+    def test_evaluation_session_updated_outside_sessions(self):
+        # another algorithm predicts through the REST endpoints
+        self.evaluator_streamer.status_registry[OTHER_ALGORITHM_UUID] = SimpleNamespace(
+            state=SimpleNamespace(name="READY"), data_segment=10
+        )
+        self.mock_get_stream_version.side_effect = [1, 1, 2]
+        with patch(
+            "src.routers.evaluation_sessions.EVALUATION_SESSION_POLL_SECONDS", 0.01
+        ), client.websocket_connect(self.url) as websocket:
+            websocket.receive_json()
+            websocket.send_bytes(encode_prediction())
+
+            assert websocket.receive_json() == {
+                "type": "error",
+                "detail": "Evaluator stream was modified by another request",
+            }
+            with self.assertRaises(WebSocketDisconnect) as context:
+                websocket.receive_json()
+            assert context.exception.code == 4409
+
+        self.mock_checkpoint_stream.assert_not_called()
+        assert STREAM_UUID not in constants.evaluator_stream_object_map
+
+    def test_evaluation_session_stream_not_found(self):
+        self.mock_get_stream_version.side_effect = GetEvaluatorStreamErrorException(
+            message="Evaluator stream with ID 336e4cb7-861b-4870-8c29-3ffc530711ef not found",
+            status_code=404,
+        )
+        with client.websocket_connect(self.url) as websocket:
+            assert websocket.receive_json()["type"] == "error"
+            with self.assertRaises(WebSocketDisconnect) as context:
+                websocket.receive_json()
+            assert context.exception.code == 4404
+
+    def test_evaluation_session_invalid_stream_id(self):
+        with self.assertRaises(WebSocketDisconnect) as context:
+            with client.websocket_connect(
+                "/streams/invalid/algorithms/12345678-1234-5678-1234-567812345678/session"
+            ):
+                pass
+        assert context.exception.code == 1008
@@ -14,6 +14,11 @@ client = TestClient(app)
 
 class TestGetMetrics(unittest.TestCase):
     def setUp(self):
+        version_patcher = patch(
+            "src.routers.metrics.get_stream_version", return_value=1
+        )
+        self.mock_get_stream_version = version_patcher.start()
+        self.addCleanup(version_patcher.stop)
         self.mock_evaluator_streamer = self.get_mock_evaluator_streamer()
         self.mock_metric_error_evaluator_streamer = (
             self.get_mock_metric_error_evaluator_streamer()
@@ -316,6 +321,40 @@ class TestGetMetrics(unittest.TestCase):
                 "macro_metrics": [],
             }
 
+    def test_get_metrics_not_modified(self):
+        with patch(
+            "src.routers.metrics.get_stream_from_db",
+        ) as mock_get_from_db, patch(
+            "src.routers.metrics.update_stream",
+        ) as mock_update_stream:
+            response = client.get(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/metrics",
+                headers={"If-None-Match": '"336e4cb7-861b-4870-8c29-3ffc530711ef-1"'},
+            )
+
+            mock_get_from_db.assert_not_called()
+            mock_update_stream.assert_not_called()
+            assert response.status_code == 304
+
+    def test_get_metrics_empty_results(self):
+        mock_evaluator_streamer = MagicMock()
+        mock_evaluator_streamer.metric_results.return_value = pd.DataFrame(
+            columns=["Algorithm", "Metric", "micro_score", "num_user"]
+        ).set_index(["Algorithm", "Metric"])
+        with patch(
+            "src.routers.metrics.get_stream_from_db",
+            return_value=mock_evaluator_streamer,
+        ), patch("src.routers.metrics.update_stream", return_value=2):
+            response = client.get(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/metrics"
+            )
+
+            assert response.status_code == 200
+            assert response.json() == {"micro_metrics": [], "macro_metrics": []}
+            assert (
+                response.headers["ETag"] == '"336e4cb7-861b-4870-8c29-3ffc530711ef-2"'
+            )
+
 
 class TestGetMetricsList(unittest.TestCase):
     def test_get_metrics_list(self):
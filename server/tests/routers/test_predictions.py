@@ -1,12 +1,27 @@
+import io
 import logging
 import unittest
+from datetime import datetime, timezone
+from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
 from uuid import UUID
 
+import numpy as np
+import pandas as pd
 from fastapi.testclient import TestClient
+from scipy.sparse import csr_matrix, save_npz
 
 from src.main import app
 from src.utils.db_utils import DatabaseErrorException, GetEvaluatorStreamErrorException
+from src.utils.payload_cache import clear_payload_cache
+from src.utils.prediction_utils import InvalidPredictionException
+from src.utils.prediction_validation import (
+    PredictionValidationIndex,
+    clear_validation_indexes,
+    set_validation_index,
+)
+from src.utils.submission_executor import SubmissionQueueFullException
+from src.utils.upload_sessions import clear_upload_sessions
 from src.utils.uuid_utils import InvalidUUIDException
 
 client = TestClient(app)
@@ -17,6 +32,16 @@ logging.getLogger("multipart.multipart").setLevel(logging.WARNING)
 
 class TestSubmitPrediction(unittest.TestCase):
     def setUp(self):
+        clear_validation_indexes()
+        self.addCleanup(clear_validation_indexes)
+        window_patcher = patch(
+            "src.routers.predictions.get_stream_window", return_value=1
+        )
+        self.mock_get_stream_window = window_patcher.start()
+        self.addCleanup(window_patcher.stop)
+        validation_patcher = patch("src.routers.predictions.validate_loaded_prediction")
+        self.mock_validate_loaded_prediction = validation_patcher.start()
+        self.addCleanup(validation_patcher.stop)
         self.mock_evaluator_streamer_predicted = (
             self.create_mock_evaluator_streamer_predicted()
         )
@@ -425,3 +450,914 @@ class TestSubmitPrediction(unittest.TestCase):
             mock_update_evaluator_streamer.assert_not_called()
 
             assert response.status_code == 422
+
+    def test_submit_binary_prediction_multipart(self):
+        data = np.array([1, 2, 3, 4, 5, 6], dtype="<f8")
+        indices = np.array([0, 2, 2, 0, 1, 2], dtype="<i4")
+        indptr = np.array([0, 2, 3, 6], dtype="<i4")
+        with patch(
+            "src.routers.predictions.get_stream_from_db",
+            return_value=self.mock_evaluator_streamer_predicted,
+        ) as mock_get_from_db, patch(
+            "src.routers.predictions.update_stream", return_value=None
+        ) as mock_update_evaluator_streamer:
+            response = client.post(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/algorithms/12345678-1234-5678-1234-567812345678/predictions/binary?shape=3,3",
+                files={
+                    "data": ("data", data.tobytes()),
+                    "indices": ("indices", indices.tobytes()),
+                    "indptr": ("indptr", indptr.tobytes()),
+                },
+            )
+
+            assert response.status_code == 200
+            assert response.json() == {"status": True}
+            mock_get_from_db.assert_called_once_with(
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+            )
+            algorithm_uuid, prediction = (
+                self.mock_evaluator_streamer_predicted.submit_prediction.call_args[0]
+            )
+            assert algorithm_uuid == UUID("12345678-1234-5678-1234-567812345678")
+            np.testing.assert_array_equal(
+                prediction.toarray(), [[1, 0, 2], [0, 0, 3], [4, 5, 6]]
+            )
+            mock_update_evaluator_streamer.assert_called_once_with(
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"),
+                self.mock_evaluator_streamer_predicted,
+            )
+
+    def test_submit_binary_prediction_octet_stream(self):
+        body = (
+            np.array([1.0, 2.0], dtype="<f8").tobytes()
+            + np.array([1, 0], dtype="<i4").tobytes()
+            + np.array([0, 1, 2], dtype="<i4").tobytes()
+        )
+        with patch(
+            "src.routers.predictions.get_stream_from_db",
+            return_value=self.mock_evaluator_streamer_completed,
+        ), patch("src.routers.predictions.update_stream", return_value=None):
+            response = client.post(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/algorithms/12345678-1234-5678-1234-567812345678/predictions/binary?shape=2,2&nnz=2",
+                content=body,
+                headers={"Content-Type": "application/octet-stream"},
+            )
+
+            assert response.status_code == 200
+            prediction = (
+                self.mock_evaluator_streamer_completed.submit_prediction.call_args[0][1]
+            )
+            np.testing.assert_array_equal(prediction.toarray(), [[0, 1], [2, 0]])
+
+    def test_submit_binary_prediction_npz(self):
+        buffer = io.BytesIO()
+        save_npz(buffer, csr_matrix(np.array([[1.0, 0], [0, 2.0]])))
+        with patch(
+            "src.routers.predictions.get_stream_from_db",
+            return_value=self.mock_evaluator_streamer_predicted,
+        ), patch("src.routers.predictions.update_stream", return_value=None):
+            response = client.post(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/algorithms/12345678-1234-5678-1234-567812345678/predictions/binary",
+                content=buffer.getvalue(),
+                headers={"Content-Type": "application/x-npz"},
+            )
+
+            assert response.status_code == 200
+            prediction = (
+                self.mock_evaluator_streamer_predicted.submit_prediction.call_args[0][1]
+            )
+            np.testing.assert_array_equal(prediction.toarray(), [[1, 0], [0, 2]])
+
+    def test_submit_binary_prediction_invalid_buffers(self):
+        with patch(
+            "src.routers.predictions.get_stream_from_db",
+            return_value=self.mock_evaluator_streamer_predicted,
+        ) as mock_get_from_db, patch(
+            "src.routers.predictions.update_stream", return_value=None
+        ) as mock_update_evaluator_streamer:
+            response = client.post(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/algorithms/12345678-1234-5678-1234-567812345678/predictions/binary?shape=2,2&nnz=2",
+                content=b"\x00" * 7,
+                headers={"Content-Type": "application/octet-stream"},
+            )
+
+            assert response.status_code == 400
+            assert response.json() == {"detail": "Expected a body of 36 bytes, got 7"}
+            mock_get_from_db.assert_not_called()
+            mock_update_evaluator_streamer.assert_not_called()
+
+    def test_submit_binary_prediction_unsupported_content_type(self):
+        with patch(
+            "src.routers.predictions.get_stream_from_db",
+            return_value=self.mock_evaluator_streamer_predicted,
+        ) as mock_get_from_db:
+            response = client.post(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/algorithms/12345678-1234-5678-1234-567812345678/predictions/binary",
+                content=b"{}",
+                headers={"Content-Type": "text/plain"},
+            )
+
+            assert response.status_code == 415
+            assert response.json() == {"detail": "Unsupported content type: text/plain"}
+            mock_get_from_db.assert_not_called()
+
+    def test_submit_columnar_prediction(self):
+        with patch(
+            "src.routers.predictions.get_stream_from_db",
+            return_value=self.mock_evaluator_streamer_predicted,
+        ) as mock_get_from_db, patch(
+            "src.routers.predictions.InteractionMatrix",
+            return_value=self.mock_prediction_im,
+        ) as mock_interaction_matrix, patch(
+            "src.routers.predictions.update_stream", return_value=None
+        ) as mock_update_evaluator_streamer:
+            response = client.post(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/algorithms/12345678-1234-5678-1234-567812345678/predictions/columnar",
+                json={"uid": [1, 2], "iid": [3, 4], "ts": [5, 6]},
+            )
+
+            assert response.status_code == 200
+            assert response.json() == {"status": True}
+            mock_get_from_db.assert_called_once_with(
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+            )
+            prediction_df = mock_interaction_matrix.call_args[0][0]
+            assert prediction_df["iid"].tolist() == [3, 4]
+            assert prediction_df["interactionid"].tolist() == [0, 1]
+            self.mock_evaluator_streamer_predicted.submit_prediction.assert_called_once_with(
+                UUID("12345678-1234-5678-1234-567812345678"), self.mock_prediction_im
+            )
+            mock_update_evaluator_streamer.assert_called_once_with(
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"),
+                self.mock_evaluator_streamer_predicted,
+            )
+
+    def test_submit_columnar_prediction_invalid_column(self):
+        with patch(
+            "src.routers.predictions.get_stream_from_db",
+            return_value=self.mock_evaluator_streamer_predicted,
+        ) as mock_get_from_db, patch(
+            "src.routers.predictions.update_stream", return_value=None
+        ) as mock_update_evaluator_streamer:
+            response = client.post(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/algorithms/12345678-1234-5678-1234-567812345678/predictions/columnar",
+                json={"uid": [1, 2], "iid": [3, "4"], "ts": [5, 6]},
+            )
+
+            assert response.status_code == 400
+            assert response.json() == {"detail": "iid must only contain integers"}
+            mock_get_from_db.assert_not_called()
+            mock_update_evaluator_streamer.assert_not_called()
+
+    def test_submit_columnar_prediction_invalid_json(self):
+        response = client.post(
+            "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/algorithms/12345678-1234-5678-1234-567812345678/predictions/columnar",
+            content=b"{not json",
+            headers={"Content-Type": "application/json"},
+        )
+
+        assert response.status_code == 400
+        assert response.json() == {"detail": "Body must be valid JSON"}
+
+    def test_submit_top_k_prediction(self):
+        with patch(
+            "src.routers.predictions.get_stream_from_db",
+            return_value=self.mock_evaluator_streamer_predicted,
+        ) as mock_get_from_db, patch(
+            "src.routers.predictions.update_stream", return_value=None
+        ) as mock_update_evaluator_streamer:
+            response = client.post(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/algorithms/12345678-1234-5678-1234-567812345678/predictions/top-k",
+                json={
+                    "user_ids": [0, 1],
+                    "item_indices": [[2, 0], [1, -1]],
+                    "shape": [2, 3],
+                },
+            )
+
+            assert response.status_code == 200
+            assert response.json() == {"status": True}
+            mock_get_from_db.assert_called_once_with(
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+            )
+            prediction = (
+                self.mock_evaluator_streamer_predicted.submit_prediction.call_args[0][1]
+            )
+            np.testing.assert_array_equal(prediction.toarray(), [[1, 0, 2], [0, 2, 0]])
+            mock_update_evaluator_streamer.assert_called_once_with(
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"),
+                self.mock_evaluator_streamer_predicted,
+            )
+
+    def test_submit_top_k_prediction_invalid(self):
+        with patch(
+            "src.routers.predictions.get_stream_from_db",
+            return_value=self.mock_evaluator_streamer_predicted,
+        ) as mock_get_from_db:
+            response = client.post(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/algorithms/12345678-1234-5678-1234-567812345678/predictions/top-k",
+                json={"user_ids": [0, 1], "item_indices": [[2, 0]]},
+            )
+
+            assert response.status_code == 400
+            assert response.json() == {
+                "detail": "item_indices must have one row per user id"
+            }
+            mock_get_from_db.assert_not_called()
+
+    def test_submit_prediction_prevalidation_rejected(self):
+        set_validation_index(
+            UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"),
+            PredictionValidationIndex(
+                window=1,
+                ground_truth_shape=(5, 3),
+                ignore_unknown_user=False,
+                ignore_unknown_item=False,
+                user_ids=np.arange(5),
+                item_ids=np.arange(3),
+            ),
+        )
+        with patch(
+            "src.routers.predictions.get_stream_from_db"
+        ) as mock_get_from_db, patch(
+            "src.routers.predictions.update_stream"
+        ) as mock_update_evaluator_streamer:
+            response = client.post(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/algorithms/12345678-1234-5678-1234-567812345678/predictions",
+                json=self.mock_prediction_csr_matrix,
+            )
+
+            assert response.status_code == 400
+            assert response.json() == {
+                "detail": "Prediction must have at least 5 rows, got 3"
+            }
+            mock_get_from_db.assert_not_called()
+            mock_update_evaluator_streamer.assert_not_called()
+
+    def test_submit_prediction_validated_after_load(self):
+        self.mock_validate_loaded_prediction.side_effect = InvalidPredictionException(
+            message="Prediction contains item ids unknown to the stream"
+        )
+        with patch(
+            "src.routers.predictions.get_stream_from_db",
+            return_value=self.mock_evaluator_streamer_predicted,
+        ), patch(
+            "src.routers.predictions.update_stream"
+        ) as mock_update_evaluator_streamer:
+            response = client.post(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/algorithms/12345678-1234-5678-1234-567812345678/predictions",
+                json=self.mock_prediction_csr_matrix,
+            )
+
+            assert response.status_code == 400
+            assert response.json() == {
+                "detail": "Prediction contains item ids unknown to the stream"
+            }
+            self.mock_evaluator_streamer_predicted.submit_prediction.assert_not_called()
+            mock_update_evaluator_streamer.assert_not_called()
+
+    def test_submit_prediction_queue_full(self):
+        with patch(
+            "src.routers.predictions.run_submission",
+            side_effect=SubmissionQueueFullException(retry_after=3),
+        ), patch(
+            "src.routers.predictions.get_stream_from_db",
+            return_value=self.mock_evaluator_streamer_predicted,
+        ) as mock_get_from_db:
+            response = client.post(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/algorithms/12345678-1234-5678-1234-567812345678/predictions",
+                json=self.mock_prediction_csr_matrix,
+            )
+
+            assert response.status_code == 429
+            assert response.headers["Retry-After"] == "3"
+            assert response.json() == {
+                "detail": "Too many prediction submissions in progress, retry later"
+            }
+            mock_get_from_db.assert_not_called()
+
+    def test_submit_prediction_async(self):
+        with patch(
+            "src.routers.predictions.get_stream_window", return_value=1
+        ) as mock_get_stream_window, patch(
+            "src.routers.predictions.write_prediction_submission",
+            return_value=UUID("00000000-0000-0000-0000-000000000001"),
+        ) as mock_write_submission, patch(
+            "src.routers.predictions.schedule_stream_evaluation"
+        ) as mock_schedule, patch(
+            "src.routers.predictions.get_stream_from_db"
+        ) as mock_get_from_db, patch(
+            "src.routers.predictions.update_stream"
+        ) as mock_update_evaluator_streamer:
+            response = client.post(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/algorithms/12345678-1234-5678-1234-567812345678/predictions/top-k?async=true",
+                json={"user_ids": [0], "item_indices": [[1, 0]]},
+            )
+
+            assert response.status_code == 202
+            assert response.json() == {
+                "status": True,
+                "submission_id": "00000000-0000-0000-0000-000000000001",
+            }
+            assert (
+                response.headers["Location"]
+                == "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/predictions/submissions/00000000-0000-0000-0000-000000000001"
+            )
+            mock_get_stream_window.assert_called_once_with(
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+            )
+            stream_uuid, algorithm_uuid, prediction = mock_write_submission.call_args[0]
+            assert stream_uuid == UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+            assert algorithm_uuid == UUID("12345678-1234-5678-1234-567812345678")
+            assert prediction.shape == (1, 2)
+            mock_schedule.assert_called_once_with(
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+            )
+            mock_get_from_db.assert_not_called()
+            mock_update_evaluator_streamer.assert_not_called()
+
+    def test_submit_prediction_async_stream_not_found(self):
+        with patch(
+            "src.routers.predictions.get_stream_window",
+            side_effect=GetEvaluatorStreamErrorException(
+                message="Evaluator stream with ID 336e4cb7-861b-4870-8c29-3ffc530711ef not found",
+                status_code=404,
+            ),
+        ), patch(
+            "src.routers.predictions.write_prediction_submission"
+        ) as mock_write_submission, patch(
+            "src.routers.predictions.schedule_stream_evaluation"
+        ) as mock_schedule:
+            response = client.post(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/algorithms/12345678-1234-5678-1234-567812345678/predictions?async=true",
+                json=self.mock_prediction_csr_matrix,
+            )
+
+            assert response.status_code == 404
+            mock_write_submission.assert_not_called()
+            mock_schedule.assert_not_called()
+
+    def test_submit_prediction_idempotent_replay(self):
+        records = {}
+
+        def claim(idempotency_key, method, path, request_hash):
+            if idempotency_key in records:
+                return records[idempotency_key]
+            records[idempotency_key] = SimpleNamespace(
+                request_hash=request_hash, status_code=None
+            )
+
+        def save(idempotency_key, status_code, response_headers, response_body):
+            records[idempotency_key].status_code = status_code
+            records[idempotency_key].response_headers = response_headers
+            records[idempotency_key].response_body = response_body
+
+        with patch("src.idempotency.claim_idempotency_key", side_effect=claim), patch(
+            "src.idempotency.save_idempotency_response", side_effect=save
+        ), patch("src.idempotency.release_idempotency_key"), patch(
+            "src.routers.predictions.get_stream_from_db",
+            return_value=self.mock_evaluator_streamer_predicted,
+        ) as mock_get_from_db, patch(
+            "src.routers.predictions.update_stream", return_value=None
+        ) as mock_update_evaluator_streamer:
+            for _ in range(2):
+                response = client.post(
+                    "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/algorithms/12345678-1234-5678-1234-567812345678/predictions",
+                    json=self.mock_prediction_csr_matrix,
+                    headers={"Idempotency-Key": "retry-1"},
+                )
+                assert response.status_code == 200
+                assert response.json() == {"status": True}
+
+            assert response.headers["Idempotent-Replayed"] == "true"
+            mock_get_from_db.assert_called_once()
+            mock_update_evaluator_streamer.assert_called_once()
+
+
+class TestGetPredictionSubmissionStatus(unittest.TestCase):
+    def setUp(self):
+        self.mock_submission = SimpleNamespace(
+            submission_id=UUID("00000000-0000-0000-0000-000000000001"),
+            stream_id=UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"),
+            algorithm_id=UUID("12345678-1234-5678-1234-567812345678"),
+            status="COMPLETED",
+            error=None,
+            created_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+            completed_at=datetime(2024, 1, 1, 0, 0, 5, tzinfo=timezone.utc),
+        )
+
+    def test_get_prediction_submission_status(self):
+        with patch(
+            "src.routers.predictions.get_prediction_submission",
+            return_value=self.mock_submission,
+        ) as mock_get_submission:
+            response = client.get(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/predictions/submissions/00000000-0000-0000-0000-000000000001"
+            )
+
+            mock_get_submission.assert_called_once_with(
+                UUID("00000000-0000-0000-0000-000000000001")
+            )
+            assert response.status_code == 200
+            assert response.json() == {
+                "submission_id": "00000000-0000-0000-0000-000000000001",
+                "stream_id": "336e4cb7-861b-4870-8c29-3ffc530711ef",
+                "algorithm_id": "12345678-1234-5678-1234-567812345678",
+                "status": "COMPLETED",
+                "error": None,
+                "created_at": "2024-01-01T00:00:00Z",
+                "completed_at": "2024-01-01T00:00:05Z",
+            }
+
+    def test_get_prediction_submission_status_other_stream(self):
+        with patch(
+            "src.routers.predictions.get_prediction_submission",
+            return_value=self.mock_submission,
+        ):
+            response = client.get(
+                "/streams/11111111-1111-1111-1111-111111111111/predictions/submissions/00000000-0000-0000-0000-000000000001"
+            )
+
+            assert response.status_code == 404
+            assert response.json() == {
+                "detail": "Prediction submission with ID 00000000-0000-0000-0000-000000000001 not found"
+            }
+
+    def test_get_prediction_submission_status_invalid_id(self):
+        response = client.get(
+            "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/predictions/submissions/invalid"
+        )
+
+        assert response.status_code == 400
+        assert response.json() == {"detail": "Invalid Submission UUID format"}
+
+
+class TestPredictionUpload(unittest.TestCase):
+    def setUp(self):
+        clear_validation_indexes()
+        self.addCleanup(clear_validation_indexes)
+        window_patcher = patch(
+            "src.routers.predictions.get_stream_window", return_value=1
+        )
+        self.mock_get_stream_window = window_patcher.start()
+        self.addCleanup(window_patcher.stop)
+        validation_patcher = patch("src.routers.predictions.validate_loaded_prediction")
+        self.mock_validate_loaded_prediction = validation_patcher.start()
+        self.addCleanup(validation_patcher.stop)
+        clear_upload_sessions()
+        self.addCleanup(clear_upload_sessions)
+        version_patcher = patch(
+            "src.routers.predictions.get_stream_version", return_value=1
+        )
+        self.mock_get_stream_version = version_patcher.start()
+        self.addCleanup(version_patcher.stop)
+        self.matrix = csr_matrix(np.array([[1.0, 0, 2.0], [0, 0, 3.0], [4.0, 0, 0]]))
+        self.base_url = "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/algorithms/12345678-1234-5678-1234-567812345678/predictions/uploads"
+
+    def encode_rows(self, start, end):
+        begin, finish = self.matrix.indptr[start], self.matrix.indptr[end]
+        return (
+            self.matrix.data[begin:finish].astype("<f8").tobytes()
+            + self.matrix.indices[begin:finish].astype("<i4").tobytes()
+            + self.matrix.indptr[start : end + 1].astype("<i4").tobytes()
+        )
+
+    def create_upload(self):
+        response = client.post(self.base_url, json={"shape": [3, 3], "nnz": 4})
+        assert response.status_code == 201
+        return response.json()["upload_id"]
+
+    def test_prediction_upload_flow(self):
+        mock_streamer = MagicMock()
+        mock_streamer.get_algorithm_state.return_value.name = "PREDICTED"
+        upload_id = self.create_upload()
+
+        response = client.put(
+            f"{self.base_url}/{upload_id}/rows?start=1&end=3",
+            content=self.encode_rows(1, 3),
+            headers={"Content-Type": "application/octet-stream"},
+        )
+        assert response.status_code == 200
+        assert response.json()["missing_ranges"] == [[0, 1]]
+
+        response = client.get(f"{self.base_url}/{upload_id}")
+        assert response.json() == {
+            "upload_id": upload_id,
+            "shape": [3, 3],
+            "nnz": 4,
+            "missing_rows": 1,
+            "missing_ranges": [[0, 1]],
+        }
+
+        client.put(
+            f"{self.base_url}/{upload_id}/rows?start=0&end=1",
+            content=self.encode_rows(0, 1),
+            headers={"Content-Type": "application/octet-stream"},
+        )
+        with patch(
+            "src.routers.predictions.get_stream_from_db", return_value=mock_streamer
+        ), patch(
+            "src.routers.predictions.update_stream", return_value=None
+        ) as mock_update_evaluator_streamer:
+            response = client.post(f"{self.base_url}/{upload_id}/commit")
+
+            assert response.status_code == 200
+            assert response.json() == {"status": True}
+            algorithm_uuid, prediction = mock_streamer.submit_prediction.call_args[0]
+            assert algorithm_uuid == UUID("12345678-1234-5678-1234-567812345678")
+            np.testing.assert_array_equal(prediction.toarray(), self.matrix.toarray())
+            mock_update_evaluator_streamer.assert_called_once()
+
+        response = client.get(f"{self.base_url}/{upload_id}")
+        assert response.status_code == 404
+
+    def test_prediction_upload_commit_incomplete(self):
+        upload_id = self.create_upload()
+        with patch("src.routers.predictions.get_stream_from_db") as mock_get_from_db:
+            response = client.post(f"{self.base_url}/{upload_id}/commit")
+
+            assert response.status_code == 409
+            assert response.json() == {
+                "detail": "Upload is incomplete, some rows are missing"
+            }
+            mock_get_from_db.assert_not_called()
+
+    def test_prediction_upload_invalid_chunk(self):
+        upload_id = self.create_upload()
+        response = client.put(
+            f"{self.base_url}/{upload_id}/rows?start=0&end=1",
+            content=b"\x00",
+            headers={"Content-Type": "application/octet-stream"},
+        )
+
+        assert response.status_code == 400
+        assert response.json() == {"detail": "Chunk is too small for indptr"}
+
+    def test_prediction_upload_abort(self):
+        upload_id = self.create_upload()
+        response = client.delete(f"{self.base_url}/{upload_id}")
+        assert response.status_code == 200
+
+        response = client.put(
+            f"{self.base_url}/{upload_id}/rows?start=0&end=1",
+            content=self.encode_rows(0, 1),
+            headers={"Content-Type": "application/octet-stream"},
+        )
+        assert response.status_code == 404
+        assert response.json() == {
+            "detail": f"Upload session with ID {upload_id} not found"
+        }
+
+    def test_prediction_upload_stream_not_found(self):
+        self.mock_get_stream_version.side_effect = GetEvaluatorStreamErrorException(
+            message="Evaluator stream with ID 336e4cb7-861b-4870-8c29-3ffc530711ef not found",
+            status_code=404,
+        )
+        response = client.post(self.base_url, json={"shape": [3, 3], "nnz": 4})
+
+        assert response.status_code == 404
+
+
+class TestSubmitBatchPrediction(unittest.TestCase):
+    def setUp(self):
+        clear_validation_indexes()
+        self.addCleanup(clear_validation_indexes)
+        window_patcher = patch(
+            "src.routers.predictions.get_stream_window", return_value=1
+        )
+        self.mock_get_stream_window = window_patcher.start()
+        self.addCleanup(window_patcher.stop)
+        validation_patcher = patch("src.routers.predictions.validate_loaded_prediction")
+        self.mock_validate_loaded_prediction = validation_patcher.start()
+        self.addCleanup(validation_patcher.stop)
+        self.mock_evaluator_streamer = MagicMock()
+        self.mock_evaluator_streamer.get_algorithm_state.return_value.name = "PREDICTED"
+        self.batch = [
+            {
+                "algorithm_id": "12345678-1234-5678-1234-567812345678",
+                "predictions": {
+                    "data": [1, 2],
+                    "indices": [0, 1],
+                    "indptr": [0, 1, 2],
+                    "shape": [2, 2],
+                },
+            },
+            {
+                "algorithm_id": "87654321-4321-8765-4321-876543218765",
+                "predictions": [
+                    {"interactionid": 1, "uid": 0, "iid": 1, "ts": 10},
+                ],
+            },
+        ]
+
+    def test_submit_batch_prediction(self):
+        with patch(
+            "src.routers.predictions.get_stream_from_db",
+            return_value=self.mock_evaluator_streamer,
+        ) as mock_get_from_db, patch(
+            "src.routers.predictions.InteractionMatrix",
+            return_value="prediction_im",
+        ), patch(
+            "src.routers.predictions.update_stream", return_value=None
+        ) as mock_update_evaluator_streamer:
+            response = client.post(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/predictions/batch",
+                json=self.batch,
+            )
+
+            assert response.status_code == 200
+            assert response.json() == {"status": True}
+            mock_get_from_db.assert_called_once_with(
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+            )
+            calls = self.mock_evaluator_streamer.submit_prediction.call_args_list
+            assert [call[0][0] for call in calls] == [
+                UUID("12345678-1234-5678-1234-567812345678"),
+                UUID("87654321-4321-8765-4321-876543218765"),
+            ]
+            assert calls[0][0][1].shape == (2, 2)
+            assert calls[1][0][1] == "prediction_im"
+            mock_update_evaluator_streamer.assert_called_once_with(
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"),
+                self.mock_evaluator_streamer,
+            )
+
+    def test_submit_batch_prediction_failure_persists_nothing(self):
+        self.mock_evaluator_streamer.submit_prediction.side_effect = [
+            None,
+            Exception("Error at submit_prediction()"),
+        ]
+        with patch(
+            "src.routers.predictions.get_stream_from_db",
+            return_value=self.mock_evaluator_streamer,
+        ), patch(
+            "src.routers.predictions.update_stream", return_value=None
+        ) as mock_update_evaluator_streamer:
+            response = client.post(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/predictions/batch",
+                json=self.batch,
+            )
+
+            assert response.status_code == 500
+            assert response.json() == {
+                "detail": "Error Submitting Prediction: Algorithm 87654321-4321-8765-4321-876543218765: Error at submit_prediction()"
+            }
+            mock_update_evaluator_streamer.assert_not_called()
+
+    def test_submit_batch_prediction_invalid_prediction_submits_nothing(self):
+        self.mock_validate_loaded_prediction.side_effect = [
+            None,
+            InvalidPredictionException(message="Unknown user ids"),
+        ]
+        with patch(
+            "src.routers.predictions.get_stream_from_db",
+            return_value=self.mock_evaluator_streamer,
+        ), patch(
+            "src.routers.predictions.update_stream", return_value=None
+        ) as mock_update_evaluator_streamer:
+            response = client.post(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/predictions/batch",
+                json=self.batch,
+            )
+
+            assert response.status_code == 400
+            assert response.json() == {
+                "detail": "Algorithm 87654321-4321-8765-4321-876543218765: Unknown user ids"
+            }
+            # the first algorithm is not left PREDICTED by a failed batch
+            self.mock_evaluator_streamer.submit_prediction.assert_not_called()
+            mock_update_evaluator_streamer.assert_not_called()
+
+    def test_submit_batch_prediction_duplicate_algorithm(self):
+        self.batch[1]["algorithm_id"] = self.batch[0]["algorithm_id"]
+        with patch("src.routers.predictions.get_stream_from_db") as mock_get_from_db:
+            response = client.post(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/predictions/batch",
+                json=self.batch,
+            )
+
+            assert response.status_code == 400
+            assert response.json() == {
+                "detail": "Each algorithm may only appear once per batch"
+            }
+            mock_get_from_db.assert_not_called()
+
+    def test_submit_batch_prediction_queue_full(self):
+        with patch(
+            "src.routers.predictions.run_submission",
+            side_effect=SubmissionQueueFullException(retry_after=5),
+        ):
+            response = client.post(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/predictions/batch",
+                json=self.batch,
+            )
+
+            assert response.status_code == 429
+            assert response.headers["Retry-After"] == "5"
+
+    def test_submit_batch_prediction_invalid_algorithm_id(self):
+        self.batch[0]["algorithm_id"] = "invalid"
+        response = client.post(
+            "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/predictions/batch",
+            json=self.batch,
+        )
+
+        assert response.status_code == 400
+        assert response.json() == {"detail": "Invalid Algorithm UUID format"}
+
+    def test_submit_batch_prediction_async(self):
+        with patch("src.routers.predictions.get_stream_window", return_value=1), patch(
+            "src.routers.predictions.write_prediction_submission",
+            side_effect=[
+                UUID("00000000-0000-0000-0000-000000000001"),
+                UUID("00000000-0000-0000-0000-000000000002"),
+            ],
+        ) as mock_write_submission, patch(
+            "src.routers.predictions.InteractionMatrix",
+            return_value="prediction_im",
+        ), patch("src.routers.predictions.schedule_stream_evaluation") as mock_schedule:
+            response = client.post(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/predictions/batch?async=true",
+                json=self.batch,
+            )
+
+            assert response.status_code == 202
+            assert response.json() == {
+                "status": True,
+                "submission_ids": [
+                    "00000000-0000-0000-0000-000000000001",
+                    "00000000-0000-0000-0000-000000000002",
+                ],
+            }
+            assert mock_write_submission.call_count == 2
+            mock_schedule.assert_called_once_with(
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+            )
+
+
+class TestStep(unittest.TestCase):
+    def setUp(self):
+        clear_payload_cache()
+        self.addCleanup(clear_payload_cache)
+        window_patcher = patch(
+            "src.routers.predictions.get_stream_window", return_value=1
+        )
+        window_patcher.start()
+        self.addCleanup(window_patcher.stop)
+        validation_patcher = patch("src.routers.predictions.validate_loaded_prediction")
+        validation_patcher.start()
+        self.addCleanup(validation_patcher.stop)
+        self.mock_evaluator_streamer = self.create_mock_evaluator_streamer()
+        self.prediction = {
+            "data": [1, 2],
+            "indices": [0, 1],
+            "indptr": [0, 1, 2],
+            "shape": [2, 2],
+        }
+        self.url = "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/algorithms/12345678-1234-5678-1234-567812345678/step"
+
+    def create_mock_evaluator_streamer(self):
+        mock_evaluator_streamer = MagicMock()
+        mock_evaluator_streamer._run_step = 2
+        states = iter(["PREDICTED", "READY"])
+        mock_evaluator_streamer.get_algorithm_state.side_effect = lambda _: (
+            SimpleNamespace(name=next(states))
+        )
+        mock_evaluator_streamer.status_registry.is_all_predicted.return_value = True
+        mock_evaluator_streamer.get_data.return_value = SimpleNamespace(
+            shape=(2, 3),
+            _df=pd.DataFrame(
+                {"interactionid": [0, 1], "uid": [0, 1], "iid": [2, 0], "ts": [5, 6]}
+            ),
+        )
+        mock_evaluator_streamer.get_unlabeled_data.return_value = SimpleNamespace(
+            shape=(2, 3),
+            _df=pd.DataFrame(
+                {"interactionid": [2], "uid": [1], "iid": [-1], "ts": [7]}
+            ),
+        )
+        return mock_evaluator_streamer
+
+    def test_step(self):
+        with patch(
+            "src.routers.predictions.get_stream_from_db",
+            return_value=self.mock_evaluator_streamer,
+        ) as mock_get_from_db, patch(
+            "src.routers.predictions.update_stream", return_value=4
+        ) as mock_update_evaluator_streamer:
+            response = client.post(self.url, json=self.prediction)
+
+            assert response.status_code == 200
+            assert response.json() == {
+                "state": "READY",
+                "window": 2,
+                "training": {
+                    "shape": [2, 3],
+                    "training_data": [
+                        {"interactionid": 0, "uid": 0, "iid": 2, "ts": 5},
+                        {"interactionid": 1, "uid": 1, "iid": 0, "ts": 6},
+                    ],
+                },
+                "unlabeled": {
+                    "shape": [2, 3],
+                    "unlabeled_data": [
+                        {"interactionid": 2, "uid": 1, "iid": -1, "ts": 7},
+                    ],
+                },
+            }
+            assert (
+                response.headers["ETag"] == '"336e4cb7-861b-4870-8c29-3ffc530711ef-4"'
+            )
+            mock_get_from_db.assert_called_once()
+            mock_update_evaluator_streamer.assert_called_once_with(
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"),
+                self.mock_evaluator_streamer,
+            )
+            algorithm_uuid, prediction = (
+                self.mock_evaluator_streamer.submit_prediction.call_args[0]
+            )
+            assert algorithm_uuid == UUID("12345678-1234-5678-1234-567812345678")
+            assert prediction.shape == (2, 2)
+
+    def test_step_selected_columns(self):
+        with patch(
+            "src.routers.predictions.get_stream_from_db",
+            return_value=self.mock_evaluator_streamer,
+        ), patch("src.routers.predictions.update_stream", return_value=4):
+            response = client.post(self.url + "?columns=uid,iid", json=self.prediction)
+
+            assert response.status_code == 200
+            assert response.json()["unlabeled"]["unlabeled_data"] == [
+                {"uid": 1, "iid": -1}
+            ]
+
+    def test_step_waiting_for_other_algorithms(self):
+        self.mock_evaluator_streamer.status_registry.is_all_predicted.return_value = (
+            False
+        )
+        with patch(
+            "src.routers.predictions.get_stream_from_db",
+            return_value=self.mock_evaluator_streamer,
+        ), patch(
+            "src.routers.predictions.update_stream", return_value=4
+        ) as mock_update_evaluator_streamer:
+            response = client.post(self.url, json=self.prediction)
+
+            assert response.status_code == 200
+            assert response.json() == {"state": "PREDICTED", "window": 2}
+            self.mock_evaluator_streamer.get_data.assert_not_called()
+            mock_update_evaluator_streamer.assert_called_once()
+
+    def test_step_completed(self):
+        self.mock_evaluator_streamer.get_algorithm_state.side_effect = None
+        self.mock_evaluator_streamer.get_algorithm_state.return_value.name = "COMPLETED"
+        with patch(
+            "src.routers.predictions.get_stream_from_db",
+            return_value=self.mock_evaluator_streamer,
+        ), patch("src.routers.predictions.update_stream", return_value=4):
+            response = client.post(self.url, json=self.prediction)
+
+            assert response.status_code == 200
+            assert response.json() == {"state": "COMPLETED", "window": 2}
+            self.mock_evaluator_streamer.get_data.assert_not_called()
+
+    def test_step_unknown_columns(self):
+        with patch(
+            "src.routers.predictions.get_stream_from_db",
+            return_value=self.mock_evaluator_streamer,
+        ), patch(
+            "src.routers.predictions.update_stream"
+        ) as mock_update_evaluator_streamer:
+            response = client.post(
+                self.url + "?columns=uid,rating", json=self.prediction
+            )
+
+            assert response.status_code == 400
+            assert response.json() == {"detail": "Unknown columns requested: rating"}
+            mock_update_evaluator_streamer.assert_not_called()
+
+    def test_step_stream_not_found(self):
+        with patch(
+            "src.routers.predictions.get_stream_from_db",
+            side_effect=GetEvaluatorStreamErrorException(
+                message="Evaluator stream with ID 336e4cb7-861b-4870-8c29-3ffc530711ef not found",
+                status_code=404,
+            ),
+        ):
+            response = client.post(self.url, json=self.prediction)
+
+            assert response.status_code == 404
+
+    def test_step_prediction_failed(self):
+        self.mock_evaluator_streamer.get_algorithm_state.side_effect = None
+        self.mock_evaluator_streamer.get_algorithm_state.return_value.name = "READY"
+        with patch(
+            "src.routers.predictions.get_stream_from_db",
+            return_value=self.mock_evaluator_streamer,
+        ), patch(
+            "src.routers.predictions.update_stream"
+        ) as mock_update_evaluator_streamer:
+            response = client.post(self.url, json=self.prediction)
+
+            assert response.status_code == 500
+            mock_update_evaluator_streamer.assert_not_called()
@@ -1,12 +1,24 @@
 import unittest
+from datetime import datetime, timezone
 from unittest.mock import MagicMock, PropertyMock, call, patch
 from uuid import UUID
 
 from fastapi.testclient import TestClient
 
 from src.main import app
+from src.settings import (
+    STREAM_LEASE_DEFAULT_SECONDS,
+    STREAM_LEASE_MAX_SECONDS,
+    STREAM_LIST_MAX_LIMIT,
+    STREAM_STATUSES_MAX_IDS,
+)
 from src.supabase_client.authentication import is_user_authenticated
-from src.utils.db_utils import DatabaseErrorException, GetEvaluatorStreamErrorException
+from src.utils.db_utils import (
+    DatabaseErrorException,
+    GetEvaluatorStreamErrorException,
+    StreamLeaseException,
+)
+from src.utils.pagination import decode_cursor, encode_cursor
 from src.utils.uuid_utils import InvalidUUIDException
 
 client = TestClient(app)
@@ -246,6 +258,11 @@ class TestCreateStream(unittest.TestCase):
 
 class TestGetStreamStatus(unittest.TestCase):
     def setUp(self):
+        version_patcher = patch(
+            "src.routers.stream_management.get_stream_version", return_value=1
+        )
+        self.mock_get_stream_version = version_patcher.start()
+        self.addCleanup(version_patcher.stop)
         self.mock_evaluator_stream_not_started = (
             self.get_mock_evaluator_stream_not_started()
         )
@@ -301,7 +318,7 @@ class TestGetStreamStatus(unittest.TestCase):
                 "336e4cb7-861b-4870-8c29-3ffc530711ef"
             )
             mock_get_from_db.assert_called_once_with(
-                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"), 1
             )
 
             assert response.status_code == 200
@@ -326,7 +343,7 @@ class TestGetStreamStatus(unittest.TestCase):
                 "336e4cb7-861b-4870-8c29-3ffc530711ef"
             )
             mock_get_from_db.assert_called_once_with(
-                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"), 1
             )
 
             assert response.status_code == 200
@@ -351,7 +368,7 @@ class TestGetStreamStatus(unittest.TestCase):
                 "336e4cb7-861b-4870-8c29-3ffc530711ef"
             )
             mock_get_from_db.assert_called_once_with(
-                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"), 1
             )
 
             assert response.status_code == 200
@@ -394,7 +411,7 @@ class TestGetStreamStatus(unittest.TestCase):
                 "336e4cb7-861b-4870-8c29-3ffc530711ef"
             )
             mock_get_from_db.assert_called_once_with(
-                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"), 1
             )
 
             assert response.status_code == 404
@@ -416,7 +433,7 @@ class TestGetStreamStatus(unittest.TestCase):
                 "336e4cb7-861b-4870-8c29-3ffc530711ef"
             )
             mock_get_from_db.assert_called_once_with(
-                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"), 1
             )
 
             assert response.status_code == 500
@@ -424,6 +441,56 @@ class TestGetStreamStatus(unittest.TestCase):
                 "detail": "Error getting evaluator stream from database"
             }
 
+    def test_get_stream_status_sets_etag(self):
+        with patch(
+            "src.routers.stream_management.get_stream_from_db",
+            return_value=self.mock_evaluator_stream_completed,
+        ):
+            response = client.get(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/status"
+            )
+
+            assert response.status_code == 200
+            assert (
+                response.headers["ETag"] == '"336e4cb7-861b-4870-8c29-3ffc530711ef-1"'
+            )
+
+    def test_get_stream_status_not_modified(self):
+        with patch(
+            "src.routers.stream_management.get_stream_from_db",
+            return_value=self.mock_evaluator_stream_completed,
+        ) as mock_get_from_db:
+            response = client.get(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/status",
+                headers={"If-None-Match": '"336e4cb7-861b-4870-8c29-3ffc530711ef-1"'},
+            )
+
+            self.mock_get_stream_version.assert_called_once_with(
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+            )
+            mock_get_from_db.assert_not_called()
+            assert response.status_code == 304
+            assert (
+                response.headers["ETag"] == '"336e4cb7-861b-4870-8c29-3ffc530711ef-1"'
+            )
+
+    def test_get_stream_status_stale_etag(self):
+        with patch(
+            "src.routers.stream_management.get_stream_from_db",
+            return_value=self.mock_evaluator_stream_completed,
+        ) as mock_get_from_db:
+            response = client.get(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/status",
+                headers={"If-None-Match": '"336e4cb7-861b-4870-8c29-3ffc530711ef-0"'},
+            )
+
+            mock_get_from_db.assert_called_once()
+            assert response.status_code == 200
+            assert response.json() == {
+                "stream_id": "336e4cb7-861b-4870-8c29-3ffc530711ef",
+                "status": "COMPLETED",
+            }
+
 
 class TestGetUserStreamStatuses(unittest.TestCase):
     def setUp(self):
@@ -431,154 +498,293 @@ class TestGetUserStreamStatuses(unittest.TestCase):
             self.mock_is_user_authenticated
         )
         self.mock_user_id = "mock_user_id"
-        self.mock_stream_uuids = [
-            UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"),
-            UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"),
-            UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"),
+        self.created_at = datetime(2024, 1, 1, 12, 0)
+        self.mock_rows = [
+            (
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"),
+                "NOT_STARTED",
+                self.created_at,
+            ),
+            (
+                UUID("12345678-1234-5678-1234-567812345678"),
+                "IN_PROGRESS",
+                self.created_at,
+            ),
+            (
+                UUID("87654321-4321-8765-4321-876543218765"),
+                "COMPLETED",
+                self.created_at,
+            ),
+        ]
+        self.expected_statuses = [
+            {
+                "stream_id": "336e4cb7-861b-4870-8c29-3ffc530711ef",
+                "status": "NOT_STARTED",
+            },
+            {
+                "stream_id": "12345678-1234-5678-1234-567812345678",
+                "status": "IN_PROGRESS",
+            },
+            {
+                "stream_id": "87654321-4321-8765-4321-876543218765",
+                "status": "COMPLETED",
+            },
         ]
-        self.mock_evaluator_stream_not_started = (
-            self.get_mock_evaluator_stream_not_started()
-        )
-        self.mock_evaluator_stream_in_progress = (
-            self.get_mock_evaluator_stream_in_progress()
-        )
-        self.mock_evaluator_stream_completed = (
-            self.get_mock_evaluator_stream_completed()
-        )
-
-    def get_mock_evaluator_stream_not_started(self):
-        mock = MagicMock()
-        mock.has_started = False
-        return mock
-
-    def get_mock_evaluator_stream_in_progress(self):
-        mock = MagicMock()
-        mock.has_started = True
-        mock_completed = MagicMock()
-        mock_completed.name = "COMPLETED"
-        mock_ready = MagicMock()
-        mock_ready.name = "READY"
-        mock.get_all_algorithm_status.return_value = {
-            "algorithm1": mock_completed,
-            "algorithm2": mock_ready,
-        }
-        return mock
-
-    def get_mock_evaluator_stream_completed(self):
-        mock = MagicMock()
-        mock.has_started = True
-        mock_completed = MagicMock()
-        mock_completed.name = "COMPLETED"
-        mock.get_all_algorithm_status.return_value = {
-            "algorithm1": mock_completed,
-            "algorithm2": mock_completed,
-        }
-        return mock
 
     def mock_is_user_authenticated(self):
         return self.mock_user_id
 
     def test_get_user_stream_statuses_valid(self):
         with patch(
-            "src.routers.stream_management.get_user_stream_ids_from_db",
-            return_value=self.mock_stream_uuids,
-        ) as mock_get_user_stream_ids, patch(
-            "src.routers.stream_management.get_stream_from_db",
-            side_effect=[
-                self.mock_evaluator_stream_not_started,
-                self.mock_evaluator_stream_in_progress,
-                self.mock_evaluator_stream_completed,
-            ],
-        ) as mock_get_from_db:
+            "src.routers.stream_management.get_user_streams_page",
+            return_value=self.mock_rows,
+        ) as mock_get_page, patch(
+            "src.routers.stream_management.get_streams_from_db"
+        ) as mock_get_streams_from_db:
             response = client.get("/streams/user")
 
-            mock_get_user_stream_ids.assert_called_once_with(self.mock_user_id)
+            mock_get_page.assert_called_once_with(
+                self.mock_user_id,
+                limit=None,
+                after=None,
+                descending=False,
+                dataset_id=None,
+                status=None,
+                created_after=None,
+                created_before=None,
+            )
+            # statuses come from the stored column, no stream is loaded
+            mock_get_streams_from_db.assert_not_called()
 
-            assert mock_get_from_db.call_count == 3
-            expected_calls = [
-                call(UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")),
-                call(UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")),
-                call(UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")),
-            ]
-            mock_get_from_db.assert_has_calls(expected_calls)
+            assert response.status_code == 200
+            assert response.json() == self.expected_statuses
+            assert "X-Next-Cursor" not in response.headers
 
+    def test_get_user_stream_statuses_page(self):
+        with patch(
+            "src.routers.stream_management.get_user_streams_page",
+            return_value=self.mock_rows,
+        ) as mock_get_page:
+            response = client.get("/streams/user?limit=2&order=desc")
+
+            _, kwargs = mock_get_page.call_args
+            assert kwargs["limit"] == 3
+            assert kwargs["descending"] is True
             assert response.status_code == 200
-            assert response.json() == [
-                {
-                    "stream_id": "336e4cb7-861b-4870-8c29-3ffc530711ef",
-                    "status": "NOT_STARTED",
-                },
-                {
-                    "stream_id": "336e4cb7-861b-4870-8c29-3ffc530711ef",
-                    "status": "IN_PROGRESS",
-                },
-                {
-                    "stream_id": "336e4cb7-861b-4870-8c29-3ffc530711ef",
-                    "status": "COMPLETED",
-                },
-            ]
+            assert response.json() == self.expected_statuses[:2]
+            assert decode_cursor(response.headers["X-Next-Cursor"]) == (
+                self.created_at,
+                UUID("12345678-1234-5678-1234-567812345678"),
+            )
 
-    def test_get_user_stream_statuses_error_getting_user_stream_ids(self):
+    def test_get_user_stream_statuses_next_page(self):
+        cursor = encode_cursor(
+            self.created_at, UUID("12345678-1234-5678-1234-567812345678")
+        )
         with patch(
-            "src.routers.stream_management.get_user_stream_ids_from_db",
-            side_effect=DatabaseErrorException(),
-        ) as mock_get_user_stream_ids, patch(
-            "src.routers.stream_management.get_stream_from_db",
-            side_effect=[
-                self.mock_evaluator_stream_not_started,
-                self.mock_evaluator_stream_in_progress,
-                self.mock_evaluator_stream_completed,
-            ],
-        ) as mock_get_from_db:
-            response = client.get("/streams/user")
+            "src.routers.stream_management.get_user_streams_page",
+            return_value=self.mock_rows[2:],
+        ) as mock_get_page:
+            response = client.get(
+                f"/streams/user?limit=2&cursor={cursor}&dataset_id=movielens"
+                "&status=COMPLETED&created_after=2024-01-01T00:00:00"
+            )
 
-            mock_get_user_stream_ids.assert_called_once_with(self.mock_user_id)
-            assert mock_get_from_db.call_count == 0
+            _, kwargs = mock_get_page.call_args
+            assert kwargs["after"] == (
+                self.created_at,
+                UUID("12345678-1234-5678-1234-567812345678"),
+            )
+            assert kwargs["dataset_id"] == "movielens"
+            assert kwargs["status"] == "COMPLETED"
+            assert kwargs["created_after"] == datetime(2024, 1, 1)
+            assert response.status_code == 200
+            assert response.json() == self.expected_statuses[2:]
+            assert "X-Next-Cursor" not in response.headers
 
-            assert response.status_code == 500
-            assert response.json() == {"detail": "Database CRUD Error"}
+    def test_get_user_stream_statuses_invalid_cursor(self):
+        with patch(
+            "src.routers.stream_management.get_user_streams_page"
+        ) as mock_get_page:
+            response = client.get("/streams/user?cursor=invalid")
+
+            mock_get_page.assert_not_called()
+            assert response.status_code == 400
+            assert response.json() == {"detail": "Invalid pagination cursor"}
+
+    def test_get_user_stream_statuses_limit_too_large(self):
+        response = client.get(f"/streams/user?limit={STREAM_LIST_MAX_LIMIT + 1}")
+
+        assert response.status_code == 422
 
-    def test_get_user_stream_statuses_error_getting_stream_from_db(self):
+    def test_get_user_stream_statuses_status_not_stored(self):
+        mock_evaluator_streamer = MagicMock()
+        mock_evaluator_streamer.has_started = False
+        rows = [(self.mock_rows[0][0], None, self.created_at), self.mock_rows[1]]
         with patch(
-            "src.routers.stream_management.get_user_stream_ids_from_db",
-            return_value=self.mock_stream_uuids,
-        ) as mock_get_user_stream_ids, patch(
-            "src.routers.stream_management.get_stream_from_db",
-            side_effect=GetEvaluatorStreamErrorException(),
-        ) as mock_get_from_db:
+            "src.routers.stream_management.get_user_streams_page", return_value=rows
+        ), patch(
+            "src.routers.stream_management.get_streams_from_db",
+            return_value={self.mock_rows[0][0]: mock_evaluator_streamer},
+        ) as mock_get_streams_from_db:
             response = client.get("/streams/user")
 
-            mock_get_user_stream_ids.assert_called_once_with(self.mock_user_id)
-            assert mock_get_from_db.call_count == 1
+            mock_get_streams_from_db.assert_called_once_with([self.mock_rows[0][0]])
+            assert response.status_code == 200
+            assert response.json() == self.expected_statuses[:2]
+
+    def test_get_user_stream_statuses_database_error(self):
+        with patch(
+            "src.routers.stream_management.get_user_streams_page",
+            side_effect=DatabaseErrorException(),
+        ):
+            response = client.get("/streams/user")
 
             assert response.status_code == 500
-            assert response.json() == {
-                "detail": "Error getting evaluator stream from database"
-            }
+            assert response.json() == {"detail": "Database CRUD Error"}
 
     def test_get_user_stream_statuses_error(self):
         with patch(
-            "src.routers.stream_management.get_user_stream_ids_from_db",
+            "src.routers.stream_management.get_user_streams_page",
             side_effect=Exception(),
-        ) as mock_get_user_stream_ids, patch(
-            "src.routers.stream_management.get_stream_from_db",
-            side_effect=[
-                self.mock_evaluator_stream_not_started,
-                self.mock_evaluator_stream_in_progress,
-                self.mock_evaluator_stream_completed,
-            ],
-        ) as mock_get_from_db:
+        ):
             response = client.get("/streams/user")
 
-            mock_get_user_stream_ids.assert_called_once_with(self.mock_user_id)
-            assert mock_get_from_db.call_count == 0
-
             assert response.status_code == 500
             assert response.json() == {"detail": "Error getting user stream statuses: "}
 
 
+class TestGetStreamsStatuses(unittest.TestCase):
+    def setUp(self):
+        self.stream_ids = [
+            "336e4cb7-861b-4870-8c29-3ffc530711ef",
+            "12345678-1234-5678-1234-567812345678",
+        ]
+        not_started = MagicMock()
+        not_started.has_started = False
+        completed = MagicMock()
+        completed.has_started = True
+        mock_completed = MagicMock()
+        mock_completed.name = "COMPLETED"
+        completed.get_all_algorithm_status.return_value = {"algorithm1": mock_completed}
+        self.mock_evaluator_streamers = {
+            UUID(self.stream_ids[0]): not_started,
+            UUID(self.stream_ids[1]): completed,
+        }
+        stored_patcher = patch(
+            "src.routers.stream_management.get_stored_stream_statuses",
+            return_value={UUID(stream_id): None for stream_id in self.stream_ids},
+        )
+        self.mock_get_stored_statuses = stored_patcher.start()
+        self.addCleanup(stored_patcher.stop)
+
+    def test_get_streams_statuses(self):
+        with patch(
+            "src.routers.stream_management.get_streams_from_db",
+            return_value=self.mock_evaluator_streamers,
+        ) as mock_get_streams_from_db:
+            response = client.post(
+                "/streams/statuses", json={"stream_ids": self.stream_ids}
+            )
+
+            mock_get_streams_from_db.assert_called_once_with(
+                [UUID(stream_id) for stream_id in self.stream_ids]
+            )
+            assert response.status_code == 200
+            assert response.json() == [
+                {"stream_id": self.stream_ids[0], "status": "NOT_STARTED"},
+                {"stream_id": self.stream_ids[1], "status": "COMPLETED"},
+            ]
+
+    def test_get_streams_statuses_stored(self):
+        self.mock_get_stored_statuses.return_value = {
+            UUID(self.stream_ids[0]): "IN_PROGRESS",
+            UUID(self.stream_ids[1]): None,
+        }
+        with patch(
+            "src.routers.stream_management.get_streams_from_db",
+            return_value={
+                UUID(self.stream_ids[1]): self.mock_evaluator_streamers[
+                    UUID(self.stream_ids[1])
+                ]
+            },
+        ) as mock_get_streams_from_db:
+            response = client.post(
+                "/streams/statuses", json={"stream_ids": self.stream_ids}
+            )
+
+            # only the stream without a stored status is unpickled
+            mock_get_streams_from_db.assert_called_once_with([UUID(self.stream_ids[1])])
+            assert response.status_code == 200
+            assert response.json() == [
+                {"stream_id": self.stream_ids[0], "status": "IN_PROGRESS"},
+                {"stream_id": self.stream_ids[1], "status": "COMPLETED"},
+            ]
+
+    def test_get_streams_statuses_invalid_uuid(self):
+        with patch(
+            "src.routers.stream_management.get_streams_from_db"
+        ) as mock_get_streams_from_db:
+            response = client.post(
+                "/streams/statuses", json={"stream_ids": ["invalid_uuid"]}
+            )
+
+            mock_get_streams_from_db.assert_not_called()
+            assert response.status_code == 400
+            assert response.json() == {"detail": "Invalid Stream UUID format"}
+
+    def test_get_streams_statuses_empty(self):
+        response = client.post("/streams/statuses", json={"stream_ids": []})
+
+        assert response.status_code == 422
+
+    def test_get_streams_statuses_too_many(self):
+        response = client.post(
+            "/streams/statuses",
+            json={"stream_ids": [self.stream_ids[0]] * (STREAM_STATUSES_MAX_IDS + 1)},
+        )
+
+        assert response.status_code == 422
+        self.mock_get_stored_statuses.assert_not_called()
+
+    def test_get_streams_statuses_not_found(self):
+        self.mock_get_stored_statuses.side_effect = GetEvaluatorStreamErrorException(
+            message=f"Evaluator streams not found: {self.stream_ids[1]}",
+            status_code=404,
+        )
+        with patch(
+            "src.routers.stream_management.get_streams_from_db"
+        ) as mock_get_streams_from_db:
+            response = client.post(
+                "/streams/statuses", json={"stream_ids": self.stream_ids}
+            )
+
+            mock_get_streams_from_db.assert_not_called()
+            assert response.status_code == 404
+            assert response.json() == {
+                "detail": f"Evaluator streams not found: {self.stream_ids[1]}"
+            }
+
+
 class TestGetStreamSettings(unittest.TestCase):
     def setUp(self):
+        version_patcher = patch(
+            "src.routers.stream_management.get_stream_version", return_value=1
+        )
+        self.mock_get_stream_version = version_patcher.start()
+        self.addCleanup(version_patcher.stop)
+        # streams created before settings were stored
+        stored_settings_patcher = patch(
+            "src.routers.stream_management.get_stored_stream_settings",
+            return_value=(None, "mock_dataset_id", 0),
+        )
+        self.mock_get_stored_settings = stored_settings_patcher.start()
+        self.addCleanup(stored_settings_patcher.stop)
+        save_settings_patcher = patch(
+            "src.routers.stream_management.save_stream_settings"
+        )
+        self.mock_save_settings = save_settings_patcher.start()
+        self.addCleanup(save_settings_patcher.stop)
         self.mock_evaluator_stream = self.create_mock_evaluator_stream()
         self.unsupported_mock_evaluator_stream = (
             self.create_unsupported_mock_evaluator_stream()
@@ -646,8 +852,46 @@ class TestGetStreamSettings(unittest.TestCase):
                 "336e4cb7-861b-4870-8c29-3ffc530711ef"
             )
             mock_get_from_db.assert_called_once_with(
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"), 1
+            )
+
+            assert response.status_code == 200
+            assert response.json() == {
+                "n_seq_data": 100,
+                "window_size": 50,
+                "background_t": 5,
+                "top_k": 10,
+                "metrics": ["PrecisionK", "RecallK"],
+                "dataset_id": self.mock_dataset_id,
+                "number_of_windows": 2,
+                "current_window": 1,
+            }
+
+    def test_get_stream_settings_stored(self):
+        self.mock_get_stored_settings.return_value = (
+            {
+                "n_seq_data": 100,
+                "window_size": 50,
+                "background_t": 5,
+                "top_k": 10,
+                "metrics": ["PrecisionK", "RecallK"],
+                "number_of_windows": 2,
+            },
+            self.mock_dataset_id,
+            1,
+        )
+        with patch(
+            "src.routers.stream_management.get_stream_from_db_with_dataset_id"
+        ) as mock_get_from_db:
+            response = client.get(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/settings"
+            )
+
+            self.mock_get_stored_settings.assert_called_once_with(
                 UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
             )
+            mock_get_from_db.assert_not_called()
+            self.mock_save_settings.assert_not_called()
 
             assert response.status_code == 200
             assert response.json() == {
@@ -661,6 +905,37 @@ class TestGetStreamSettings(unittest.TestCase):
                 "current_window": 1,
             }
 
+    def test_get_stream_settings_saved_when_not_stored(self):
+        with patch(
+            "src.routers.stream_management.get_stream_from_db_with_dataset_id",
+            return_value=(self.mock_evaluator_stream, self.mock_dataset_id),
+        ):
+            response = client.get(
+                "/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/settings"
+            )
+
+            assert response.status_code == 200
+            self.mock_save_settings.assert_called_once_with(
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"),
+                {
+                    "n_seq_data": 100,
+                    "window_size": 50,
+                    "background_t": 5,
+                    "top_k": 10,
+                    "metrics": ["PrecisionK", "RecallK"],
+                    "number_of_windows": 2,
+                },
+            )
+
+    def test_get_stream_settings_stored_not_found(self):
+        self.mock_get_stored_settings.side_effect = GetEvaluatorStreamErrorException(
+            message="Evaluator stream not found", status_code=404
+        )
+        response = client.get("/streams/336e4cb7-861b-4870-8c29-3ffc530711ef/settings")
+
+        assert response.status_code == 404
+        assert response.json() == {"detail": "Evaluator stream not found"}
+
     def test_get_stream_setting_not_supported(self):
         with patch(
             "src.routers.stream_management.get_stream_from_db_with_dataset_id",
@@ -677,7 +952,7 @@ class TestGetStreamSettings(unittest.TestCase):
                 "336e4cb7-861b-4870-8c29-3ffc530711ef"
             )
             mock_get_from_db.assert_called_once_with(
-                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"), 1
             )
 
             assert response.status_code == 501
@@ -719,7 +994,7 @@ class TestGetStreamSettings(unittest.TestCase):
                 "336e4cb7-861b-4870-8c29-3ffc530711ef"
             )
             mock_get_from_db.assert_called_once_with(
-                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"), 1
             )
 
             assert response.status_code == 404
@@ -740,7 +1015,7 @@ class TestGetStreamSettings(unittest.TestCase):
                 "336e4cb7-861b-4870-8c29-3ffc530711ef"
             )
             mock_get_from_db.assert_called_once_with(
-                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"), 1
             )
             assert response.status_code == 500
             assert response.json() == {
@@ -763,7 +1038,7 @@ class TestGetStreamSettings(unittest.TestCase):
                 "336e4cb7-861b-4870-8c29-3ffc530711ef"
             )
             mock_get_from_db.assert_called_once_with(
-                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+                UUID("336e4cb7-861b-4870-8c29-3ffc530711ef"), 1
             )
             assert response.status_code == 500
             assert response.json() == {"detail": "Error fetching from DB"}
@@ -980,6 +1255,140 @@ class TestStartStream(unittest.TestCase):
             assert response.json() == {"detail": "Update stream error"}
 
 
+class TestStreamLease(unittest.TestCase):
+    def setUp(self):
+        self.stream_id = "336e4cb7-861b-4870-8c29-3ffc530711ef"
+        self.lease_id = "12345678-1234-5678-1234-567812345678"
+        self.expires_at = datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc)
+        self.mock_lease = MagicMock()
+        self.mock_lease.lease_id = UUID(self.lease_id)
+        self.mock_lease.expires_at = self.expires_at
+
+    def test_lease_stream(self):
+        with patch(
+            "src.routers.stream_management.acquire_stream_lease",
+            return_value=self.mock_lease,
+        ) as mock_acquire:
+            response = client.post(f"/streams/{self.stream_id}/lease?duration=60")
+
+            mock_acquire.assert_called_once_with(UUID(self.stream_id), 60)
+            assert response.status_code == 201
+            assert response.json() == {
+                "lease_id": self.lease_id,
+                "expires_at": "2024-01-01T12:00:00Z",
+            }
+
+    def test_lease_stream_default_duration(self):
+        with patch(
+            "src.routers.stream_management.acquire_stream_lease",
+            return_value=self.mock_lease,
+        ) as mock_acquire:
+            client.post(f"/streams/{self.stream_id}/lease")
+
+            mock_acquire.assert_called_once_with(
+                UUID(self.stream_id), STREAM_LEASE_DEFAULT_SECONDS
+            )
+
+    def test_lease_stream_duration_too_long(self):
+        with patch(
+            "src.routers.stream_management.acquire_stream_lease"
+        ) as mock_acquire:
+            response = client.post(
+                f"/streams/{self.stream_id}/lease"
+                f"?duration={STREAM_LEASE_MAX_SECONDS + 1}"
+            )
+
+            mock_acquire.assert_not_called()
+            assert response.status_code == 422
+
+    def test_lease_stream_already_leased(self):
+        with patch(
+            "src.routers.stream_management.acquire_stream_lease",
+            side_effect=StreamLeaseException(),
+        ):
+            response = client.post(f"/streams/{self.stream_id}/lease")
+
+            assert response.status_code == 409
+            assert response.json() == {"detail": "Evaluator stream is already leased"}
+
+    def test_lease_stream_not_found(self):
+        with patch(
+            "src.routers.stream_management.acquire_stream_lease",
+            side_effect=GetEvaluatorStreamErrorException(
+                message="Evaluator stream not found", status_code=404
+            ),
+        ):
+            response = client.post(f"/streams/{self.stream_id}/lease")
+
+            assert response.status_code == 404
+
+    def test_lease_stream_invalid_uuid(self):
+        with patch(
+            "src.routers.stream_management.acquire_stream_lease"
+        ) as mock_acquire:
+            response = client.post("/streams/invalid_uuid/lease")
+
+            mock_acquire.assert_not_called()
+            assert response.status_code == 400
+            assert response.json() == {"detail": "Invalid Stream UUID format"}
+
+    def test_renew_stream_lease(self):
+        with patch(
+            "src.routers.stream_management.extend_stream_lease",
+            return_value=self.expires_at,
+        ) as mock_extend:
+            response = client.post(
+                f"/streams/{self.stream_id}/lease/{self.lease_id}/renew?duration=60"
+            )
+
+            mock_extend.assert_called_once_with(
+                UUID(self.stream_id), UUID(self.lease_id), 60
+            )
+            assert response.status_code == 200
+            assert response.json() == {
+                "lease_id": self.lease_id,
+                "expires_at": "2024-01-01T12:00:00Z",
+            }
+
+    def test_renew_stream_lease_invalid_lease_uuid(self):
+        response = client.post(f"/streams/{self.stream_id}/lease/invalid/renew")
+
+        assert response.status_code == 400
+        assert response.json() == {"detail": "Invalid Lease UUID format"}
+
+    def test_release_stream_lease(self):
+        with patch(
+            "src.routers.stream_management.release_stream_lease"
+        ) as mock_release:
+            response = client.delete(f"/streams/{self.stream_id}/lease/{self.lease_id}")
+
+            mock_release.assert_called_once_with(
+                UUID(self.stream_id), UUID(self.lease_id)
+            )
+            assert response.status_code == 200
+            assert response.json() == {"status": True}
+
+    def test_release_stream_lease_held_by_other_worker(self):
+        with patch(
+            "src.routers.stream_management.release_stream_lease",
+            side_effect=StreamLeaseException(message="Lease is not held"),
+        ):
+            response = client.delete(f"/streams/{self.stream_id}/lease/{self.lease_id}")
+
+            assert response.status_code == 409
+            assert response.json() == {"detail": "Lease is not held"}
+
+    def test_release_stream_lease_database_error(self):
+        with patch(
+            "src.routers.stream_management.release_stream_lease",
+            side_effect=DatabaseErrorException(message="Flush error"),
+        ):
+            response = client.delete(f"/streams/{self.stream_id}/lease/{self.lease_id}")
+
+            assert response.status_code == 500
+            assert response.json() == {"detail": "Flush error"}
+
+
 class TestCheckStreamAccess(unittest.TestCase):
     def setUp(self):
         app.dependency_overrides[is_user_authenticated] = (
@@ -0,0 +1,122 @@
+import gzip
+import unittest
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from src.compression import (
+    CompressionMiddleware,
+    CompressionRule,
+    brotli,
+    negotiate_encoding,
+    zstandard,
+)
+
+OPTIONAL_ENCODERS_MISSING = brotli is None or zstandard is None
+
+LARGE_BODY = "streamsight " * 1000
+
+app = FastAPI()
+app.add_middleware(
+    CompressionMiddleware,
+    rules=[CompressionRule(path_pattern=r"/small-threshold", minimum_size=10)],
+    default_rule=CompressionRule(minimum_size=2048),
+    offload_threshold=4096,
+)
+
+
+@app.get("/large")
+def large():
+    return PlainTextResponse(LARGE_BODY, headers={"ETag": '"stream-1"'})
+
+
+@app.get("/small-threshold")
+def small_threshold():
+    return PlainTextResponse("x" * 100)
+
+
+@app.get("/tiny")
+def tiny():
+    return PlainTextResponse("x" * 100)
+
+
+@app.get("/npz")
+def npz():
+    return Response(LARGE_BODY.encode(), media_type="application/x-npz")
+
+
+@app.get("/stream")
+def stream():
+    return StreamingResponse(iter([LARGE_BODY, LARGE_BODY]), media_type="text/plain")
+
+
+client = TestClient(app)
+
+
+class TestNegotiateEncoding(unittest.TestCase):
+    def test_negotiate_encoding_without_optional_encoders(self):
+        with patch("src.compression.zstandard", None), patch(
+            "src.compression.brotli", None
+        ):
+            self.assertEqual(negotiate_encoding("gzip, br, zstd"), "gzip")
+            self.assertEqual(negotiate_encoding("*"), "gzip")
+            self.assertIsNone(negotiate_encoding("br"))
+
+    @unittest.skipIf(OPTIONAL_ENCODERS_MISSING, "compression extras not installed")
+    def test_negotiate_encoding_preference(self):
+        self.assertEqual(negotiate_encoding("gzip, br, zstd"), "zstd")
+        self.assertEqual(negotiate_encoding("gzip, br"), "br")
+
+    def test_negotiate_encoding_quality(self):
+        self.assertEqual(negotiate_encoding("zstd;q=0, br;q=0, gzip;q=0.5"), "gzip")
+        self.assertIsNone(negotiate_encoding("identity"))
+        self.assertIsNone(negotiate_encoding(None))
+
+
+class TestCompressionMiddleware(unittest.TestCase):
+    def test_large_response_compressed(self):
+        response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+
+        assert response.status_code == 200
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.headers["Vary"] == "Accept-Encoding"
+        assert response.headers["ETag"] == 'W/"stream-1"'
+        assert response.text == LARGE_BODY
+
+    @unittest.skipIf(OPTIONAL_ENCODERS_MISSING, "compression extras not installed")
+    def test_brotli_and_zstd_responses(self):
+        for encoding in ["br", "zstd"]:
+            response = client.get("/large", headers={"Accept-Encoding": encoding})
+            assert response.headers["Content-Encoding"] == encoding
+            assert response.text == LARGE_BODY
+
+    def test_per_route_threshold(self):
+        response = client.get("/small-threshold", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["Content-Encoding"] == "gzip"
+
+        response = client.get("/tiny", headers={"Accept-Encoding": "gzip"})
+        assert "Content-Encoding" not in response.headers
+
+    def test_compressed_media_type_bypassed(self):
+        response = client.get("/npz", headers={"Accept-Encoding": "gzip"})
+        assert "Content-Encoding" not in response.headers
+        assert response.content == LARGE_BODY.encode()
+
+    def test_streaming_response_bypassed(self):
+        response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+        assert "Content-Encoding" not in response.headers
+        assert response.text == LARGE_BODY * 2
+
+    def test_no_accept_encoding(self):
+        response = client.get("/large", headers={"Accept-Encoding": "identity"})
+        assert "Content-Encoding" not in response.headers
+        assert response.headers["ETag"] == '"stream-1"'
+
+    def test_gzip_body_decodes(self):
+        with client.stream(
+            "GET", "/large", headers={"Accept-Encoding": "gzip"}
+        ) as response:
+            raw = b"".join(response.iter_raw())
+        assert gzip.decompress(raw).decode() == LARGE_BODY
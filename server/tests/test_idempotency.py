@@ -0,0 +1,193 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from src.idempotency import IdempotencyMiddleware, get_scoped_idempotency_key
+from src.utils.db_utils import DatabaseErrorException
+
+
+class FakeIdempotencyStore:
+    def __init__(self):
+        self.records = {}
+
+    def claim(self, idempotency_key, method, path, request_hash):
+        if idempotency_key in self.records:
+            return self.records[idempotency_key]
+        self.records[idempotency_key] = SimpleNamespace(
+            method=method,
+            path=path,
+            request_hash=request_hash,
+            status_code=None,
+            response_headers=None,
+            response_body=None,
+        )
+        return None
+
+    def save(self, idempotency_key, status_code, response_headers, response_body):
+        record = self.records[idempotency_key]
+        record.status_code = status_code
+        record.response_headers = response_headers
+        record.response_body = response_body
+
+    def release(self, idempotency_key):
+        if self.records[idempotency_key].status_code is None:
+            del self.records[idempotency_key]
+
+
+def create_app():
+    app = FastAPI()
+    app.state.calls = 0
+    app.add_middleware(IdempotencyMiddleware, excluded_path_pattern=r"/excluded")
+
+    @app.post("/items")
+    def create_item(item: dict):
+        app.state.calls += 1
+        return {"call": app.state.calls, "item": item}
+
+    @app.post("/fail")
+    def fail():
+        app.state.calls += 1
+        raise HTTPException(status_code=500, detail="failed")
+
+    @app.post("/busy")
+    def busy():
+        app.state.calls += 1
+        raise HTTPException(status_code=429, detail="busy")
+
+    @app.post("/excluded")
+    def excluded():
+        app.state.calls += 1
+        return {"call": app.state.calls}
+
+    @app.get("/items")
+    def get_items():
+        app.state.calls += 1
+        return {"call": app.state.calls}
+
+    return app
+
+
+class TestIdempotencyMiddleware(unittest.TestCase):
+    def setUp(self):
+        self.store = FakeIdempotencyStore()
+        for name, method in (
+            ("claim_idempotency_key", self.store.claim),
+            ("save_idempotency_response", self.store.save),
+            ("release_idempotency_key", self.store.release),
+        ):
+            patcher = patch(f"src.idempotency.{name}", side_effect=method)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.app = create_app()
+        self.client = TestClient(self.app)
+
+    def test_replays_stored_response(self):
+        headers = {"Idempotency-Key": "key-1"}
+        first = self.client.post("/items", json={"a": 1}, headers=headers)
+        second = self.client.post("/items", json={"a": 1}, headers=headers)
+
+        self.assertEqual(first.json(), {"call": 1, "item": {"a": 1}})
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second.headers["Idempotent-Replayed"], "true")
+        self.assertNotIn("Idempotent-Replayed", first.headers)
+        self.assertEqual(self.app.state.calls, 1)
+
+    def test_without_key_runs_every_time(self):
+        self.client.post("/items", json={"a": 1})
+        self.client.post("/items", json={"a": 1})
+        self.assertEqual(self.app.state.calls, 2)
+
+    def test_key_reused_for_different_request(self):
+        headers = {"Idempotency-Key": "key-1"}
+        self.client.post("/items", json={"a": 1}, headers=headers)
+        response = self.client.post("/items", json={"a": 2}, headers=headers)
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(
+            response.json(),
+            {"detail": "Idempotency-Key was already used for a different request"},
+        )
+        self.assertEqual(self.app.state.calls, 1)
+
+    def test_key_scoped_to_caller(self):
+        first = self.client.post(
+            "/items",
+            json={"a": 1},
+            headers={"Idempotency-Key": "key-1", "Authorization": "Bearer first"},
+        )
+        second = self.client.post(
+            "/items",
+            json={"a": 1},
+            headers={"Idempotency-Key": "key-1", "Authorization": "Bearer second"},
+        )
+
+        self.assertEqual(first.json(), {"call": 1, "item": {"a": 1}})
+        self.assertEqual(second.json(), {"call": 2, "item": {"a": 1}})
+        self.assertNotIn("Idempotent-Replayed", second.headers)
+        self.assertEqual(len(self.store.records), 2)
+
+    def test_request_in_progress(self):
+        scoped_key = get_scoped_idempotency_key(
+            {"type": "http", "headers": []}, "key-1"
+        )
+        self.store.claim(scoped_key, "POST", "/items", "other")
+        self.store.records[scoped_key].request_hash = None
+        with patch(
+            "src.idempotency.get_request_hash", return_value=None
+        ) as mock_get_request_hash:
+            response = self.client.post(
+                "/items", json={"a": 1}, headers={"Idempotency-Key": "key-1"}
+            )
+            mock_get_request_hash.assert_called_once()
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.app.state.calls, 0)
+
+    def test_server_error_is_not_stored(self):
+        headers = {"Idempotency-Key": "key-1"}
+        self.client.post("/fail", headers=headers)
+        response = self.client.post("/fail", headers=headers)
+
+        self.assertEqual(response.status_code, 500)
+        self.assertNotIn("Idempotent-Replayed", response.headers)
+        self.assertEqual(self.app.state.calls, 2)
+        self.assertEqual(self.store.records, {})
+
+    def test_retryable_rejection_is_not_stored(self):
+        headers = {"Idempotency-Key": "key-1"}
+        self.client.post("/busy", headers=headers)
+        self.client.post("/busy", headers=headers)
+        self.assertEqual(self.app.state.calls, 2)
+
+    def test_safe_methods_and_excluded_paths_are_ignored(self):
+        headers = {"Idempotency-Key": "key-1"}
+        self.client.get("/items", headers=headers)
+        self.client.get("/items", headers=headers)
+        self.client.post("/excluded", headers=headers)
+        self.client.post("/excluded", headers=headers)
+        self.assertEqual(self.app.state.calls, 4)
+        self.assertEqual(self.store.records, {})
+
+    def test_invalid_key(self):
+        response = self.client.post(
+            "/items", json={"a": 1}, headers={"Idempotency-Key": "k" * 256}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.app.state.calls, 0)
+
+    def test_database_error(self):
+        with patch(
+            "src.idempotency.claim_idempotency_key",
+            side_effect=DatabaseErrorException("Error claiming idempotency key"),
+        ):
+            response = self.client.post(
+                "/items", json={"a": 1}, headers={"Idempotency-Key": "key-1"}
+            )
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json(), {"detail": "Error claiming idempotency key"})
+        self.assertEqual(self.app.state.calls, 0)
@@ -0,0 +1,63 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.utils.dataframe_utils import (
+    MAIN_COLUMNS,
+    InvalidColumnsException,
+    project_interaction_columns,
+    resolve_columns,
+)
+
+
+class TestResolveColumns(unittest.TestCase):
+    def setUp(self):
+        self.available_columns = ["interactionid", "uid", "iid", "ts", "rating"]
+
+    def test_resolve_columns_default(self):
+        result = resolve_columns(self.available_columns, None, False)
+        self.assertEqual(result, MAIN_COLUMNS)
+
+    def test_resolve_columns_additional_features(self):
+        result = resolve_columns(self.available_columns, None, True)
+        self.assertEqual(result, self.available_columns)
+
+    def test_resolve_columns_requested(self):
+        result = resolve_columns(self.available_columns, " uid,iid,uid ", True)
+        self.assertEqual(result, ["uid", "iid"])
+
+    def test_resolve_columns_unknown(self):
+        with self.assertRaises(InvalidColumnsException) as context:
+            resolve_columns(self.available_columns, "uid,price", False)
+        self.assertEqual(context.exception.status_code, 400)
+        self.assertEqual(context.exception.message, "Unknown columns requested: price")
+
+    def test_resolve_columns_empty(self):
+        with self.assertRaises(InvalidColumnsException):
+            resolve_columns(self.available_columns, " , ", False)
+
+
+class TestProjectInteractionColumns(unittest.TestCase):
+    def test_project_interaction_columns_downcasts(self):
+        df = pd.DataFrame(
+            {
+                "interactionid": np.array([0, 1], dtype=np.int64),
+                "uid": np.array([3, 4], dtype=np.int64),
+                "iid": np.array([5, 6], dtype=np.int64),
+                "ts": np.array([7, 8], dtype=np.int32),
+                "rating": [1.5, 2.5],
+            }
+        )
+        projected = project_interaction_columns(df, ["uid", "ts", "rating"])
+
+        self.assertEqual(list(projected.columns), ["uid", "ts", "rating"])
+        self.assertEqual(projected["uid"].dtype, np.int32)
+        self.assertEqual(projected["ts"].dtype, np.int64)
+        self.assertEqual(projected["rating"].dtype, np.float64)
+        self.assertEqual(df["uid"].dtype, np.int64)
+
+    def test_project_interaction_columns_keeps_large_ids(self):
+        df = pd.DataFrame({"uid": np.array([0, 2**40], dtype=np.int64)})
+        projected = project_interaction_columns(df, ["uid"])
+        self.assertEqual(projected["uid"].dtype, np.int64)
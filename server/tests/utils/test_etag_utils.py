@@ -0,0 +1,26 @@
+import unittest
+from uuid import UUID
+
+from src.utils.etag_utils import get_stream_etag, is_etag_match, not_modified_response
+
+STREAM_ID = UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+
+
+class TestEtagUtils(unittest.TestCase):
+    def test_get_stream_etag(self):
+        self.assertEqual(
+            get_stream_etag(STREAM_ID, 3), '"336e4cb7-861b-4870-8c29-3ffc530711ef-3"'
+        )
+
+    def test_is_etag_match(self):
+        etag = get_stream_etag(STREAM_ID, 3)
+        self.assertTrue(is_etag_match(etag, etag))
+        self.assertTrue(is_etag_match(f'"other", W/{etag}', etag))
+        self.assertTrue(is_etag_match("*", etag))
+        self.assertFalse(is_etag_match(None, etag))
+        self.assertFalse(is_etag_match(get_stream_etag(STREAM_ID, 2), etag))
+
+    def test_not_modified_response(self):
+        response = not_modified_response('"etag"')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["ETag"], '"etag"')
@@ -0,0 +1,100 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+from uuid import UUID
+
+from src.utils.db_utils import DatabaseErrorException, StreamLeaseException
+from src.utils.lease_manager import (
+    expire_stream_leases,
+    extend_stream_lease,
+    release_stream_lease,
+)
+from src.utils.stream_leases import (
+    StreamLease,
+    add_stream_lease,
+    get_stream_lease,
+    remove_stream_lease,
+)
+
+STREAM_ID = UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+LEASE_ID = UUID("12345678-1234-5678-1234-567812345678")
+
+
+class TestLeaseManager(unittest.TestCase):
+    def setUp(self):
+        self.lease = self.create_lease(expires_in=60)
+        add_stream_lease(self.lease)
+        self.addCleanup(remove_stream_lease, self.lease)
+
+    def create_lease(self, expires_in):
+        return StreamLease(
+            STREAM_ID,
+            LEASE_ID,
+            datetime.now(timezone.utc) + timedelta(seconds=expires_in),
+            "test",
+            MagicMock(),
+            MagicMock(),
+            MagicMock(),
+        )
+
+    def test_release_stream_lease(self):
+        with patch(
+            "src.utils.lease_manager.flush_stream_lease", return_value=3
+        ) as mock_flush:
+            self.assertEqual(release_stream_lease(STREAM_ID, LEASE_ID), 3)
+
+            mock_flush.assert_called_once_with(self.lease, release=True)
+            self.assertIsNone(get_stream_lease(STREAM_ID))
+
+    def test_release_stream_lease_not_held(self):
+        with patch("src.utils.lease_manager.flush_stream_lease") as mock_flush:
+            with self.assertRaises(StreamLeaseException) as context:
+                release_stream_lease(
+                    STREAM_ID, UUID("87654321-4321-8765-4321-876543218765")
+                )
+
+            self.assertEqual(context.exception.status_code, 409)
+            mock_flush.assert_not_called()
+            self.assertIs(get_stream_lease(STREAM_ID), self.lease)
+
+    def test_release_stream_lease_database_error_keeps_lease(self):
+        with patch(
+            "src.utils.lease_manager.flush_stream_lease",
+            side_effect=DatabaseErrorException(),
+        ):
+            with self.assertRaises(DatabaseErrorException):
+                release_stream_lease(STREAM_ID, LEASE_ID)
+
+            # the release can be retried
+            self.assertIs(get_stream_lease(STREAM_ID), self.lease)
+
+    def test_extend_stream_lease_ended(self):
+        with patch(
+            "src.utils.lease_manager.renew_stream_lease",
+            side_effect=StreamLeaseException(),
+        ):
+            with self.assertRaises(StreamLeaseException):
+                extend_stream_lease(STREAM_ID, LEASE_ID, 60)
+
+            self.assertIsNone(get_stream_lease(STREAM_ID))
+
+    def test_expire_stream_leases(self):
+        with patch("src.utils.lease_manager.flush_stream_lease") as mock_flush:
+            expire_stream_leases()
+            mock_flush.assert_not_called()
+            self.assertIs(get_stream_lease(STREAM_ID), self.lease)
+
+            self.lease.expires_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+            expire_stream_leases()
+            mock_flush.assert_called_once_with(self.lease, release=True)
+            self.assertIsNone(get_stream_lease(STREAM_ID))
+
+    def test_expire_stream_leases_flush_error(self):
+        with patch(
+            "src.utils.lease_manager.flush_stream_lease",
+            side_effect=DatabaseErrorException(),
+        ):
+            expire_stream_leases(release_all=True)
+
+            # recovered from the recorded operations once the lease runs out
+            self.assertIsNone(get_stream_lease(STREAM_ID))
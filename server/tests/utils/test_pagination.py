@@ -0,0 +1,23 @@
+import unittest
+from datetime import datetime
+from uuid import UUID
+
+from src.utils.pagination import InvalidCursorException, decode_cursor, encode_cursor
+
+
+class TestPagination(unittest.TestCase):
+    def test_encode_decode_cursor(self):
+        created_at = datetime(2024, 1, 1, 12, 30, 15, 123456)
+        stream_id = UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+
+        cursor = encode_cursor(created_at, stream_id)
+
+        self.assertEqual(decode_cursor(cursor), (created_at, stream_id))
+
+    def test_decode_invalid_cursor(self):
+        for cursor in [
+            "invalid",
+            encode_cursor(datetime(2024, 1, 1), UUID(int=1))[:-4],
+        ]:
+            with self.assertRaises(InvalidCursorException):
+                decode_cursor(cursor)
@@ -0,0 +1,43 @@
+import unittest
+from unittest.mock import patch
+from uuid import UUID
+
+from src.utils.payload_cache import (
+    PayloadCacheKey,
+    clear_payload_cache,
+    get_cached_payload,
+    set_cached_payload,
+)
+
+STREAM_ID = UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+
+
+class TestPayloadCache(unittest.TestCase):
+    def setUp(self):
+        clear_payload_cache()
+
+    def test_get_cached_payload_miss(self):
+        key = PayloadCacheKey(STREAM_ID, 1, "training_data", "json", ("*",))
+        self.assertIsNone(get_cached_payload(key))
+
+    def test_set_and_get_cached_payload(self):
+        key = PayloadCacheKey(STREAM_ID, 1, "training_data", "json", ("*",))
+        set_cached_payload(key, b"payload")
+        self.assertEqual(get_cached_payload(key), b"payload")
+
+    def test_new_window_evicts_previous_window(self):
+        old_key = PayloadCacheKey(STREAM_ID, 1, "unlabeled_data", "json", ("*",))
+        new_key = PayloadCacheKey(STREAM_ID, 2, "unlabeled_data", "json", ("*",))
+        set_cached_payload(old_key, b"old")
+        set_cached_payload(new_key, b"new")
+        self.assertIsNone(get_cached_payload(old_key))
+        self.assertEqual(get_cached_payload(new_key), b"new")
+
+    def test_least_recently_used_payload_evicted_when_full(self):
+        first_key = PayloadCacheKey(STREAM_ID, 1, "training_data", "json", ("*",))
+        second_key = PayloadCacheKey(STREAM_ID, 1, "unlabeled_data", "json", ("*",))
+        with patch("src.utils.payload_cache.PAYLOAD_CACHE_MAX_BYTES", 8):
+            set_cached_payload(first_key, b"12345")
+            set_cached_payload(second_key, b"67890")
+        self.assertIsNone(get_cached_payload(first_key))
+        self.assertEqual(get_cached_payload(second_key), b"67890")
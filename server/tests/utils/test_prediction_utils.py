@@ -0,0 +1,292 @@
+import io
+import unittest
+
+import numpy as np
+from scipy.sparse import csr_matrix, save_npz
+
+from src.utils import prediction_utils
+from src.utils.prediction_utils import (
+    PREDICTION_COLUMNS,
+    InvalidPredictionException,
+    parse_shape,
+    prediction_frame_from_columns,
+    prediction_from_arrow,
+    prediction_from_buffers,
+    prediction_from_concatenated_buffer,
+    prediction_from_coordinates,
+    prediction_from_npz,
+    prediction_from_top_k,
+)
+
+
+class TestPredictionFromBuffers(unittest.TestCase):
+    def setUp(self):
+        self.data = np.array([1, 2, 3, 4, 5, 6], dtype="<f8")
+        self.indices = np.array([0, 2, 2, 0, 1, 2], dtype="<i4")
+        self.indptr = np.array([0, 2, 3, 6], dtype="<i4")
+
+    def test_prediction_from_buffers(self):
+        result = prediction_from_buffers(
+            self.data.tobytes(), self.indices.tobytes(), self.indptr.tobytes(), (3, 3)
+        )
+        self.assertIsInstance(result, csr_matrix)
+        self.assertEqual(result.shape, (3, 3))
+        np.testing.assert_array_equal(
+            result.toarray(), [[1, 0, 2], [0, 0, 3], [4, 5, 6]]
+        )
+        self.assertTrue(result.data.flags.writeable)
+
+    def test_prediction_from_buffers_float32_int64(self):
+        result = prediction_from_buffers(
+            self.data.astype("<f4").tobytes(),
+            self.indices.astype("<i8").tobytes(),
+            self.indptr.astype("<i8").tobytes(),
+            (3, 3),
+            data_dtype="float32",
+            index_dtype="int64",
+        )
+        self.assertEqual(result.nnz, 6)
+
+    def test_prediction_from_buffers_unsupported_dtype(self):
+        with self.assertRaises(InvalidPredictionException):
+            prediction_from_buffers(
+                self.data.tobytes(),
+                self.indices.tobytes(),
+                self.indptr.tobytes(),
+                (3, 3),
+                data_dtype="object",
+            )
+
+    def test_prediction_from_buffers_truncated(self):
+        with self.assertRaises(InvalidPredictionException):
+            prediction_from_buffers(
+                self.data.tobytes()[:-1],
+                self.indices.tobytes(),
+                self.indptr.tobytes(),
+                (3, 3),
+            )
+
+    def test_prediction_from_buffers_wrong_indptr_length(self):
+        with self.assertRaises(InvalidPredictionException):
+            prediction_from_buffers(
+                self.data.tobytes(),
+                self.indices.tobytes(),
+                self.indptr.tobytes(),
+                (4, 3),
+            )
+
+    def test_prediction_from_buffers_index_out_of_bounds(self):
+        with self.assertRaises(InvalidPredictionException):
+            prediction_from_buffers(
+                self.data.tobytes(),
+                self.indices.tobytes(),
+                self.indptr.tobytes(),
+                (3, 2),
+            )
+
+    def test_prediction_from_buffers_decreasing_indptr(self):
+        indptr = np.array([0, 3, 2, 6], dtype="<i4")
+        with self.assertRaises(InvalidPredictionException):
+            prediction_from_buffers(
+                self.data.tobytes(), self.indices.tobytes(), indptr.tobytes(), (3, 3)
+            )
+
+    def test_prediction_from_buffers_not_finite(self):
+        data = self.data.copy()
+        data[0] = np.nan
+        with self.assertRaises(InvalidPredictionException):
+            prediction_from_buffers(
+                data.tobytes(), self.indices.tobytes(), self.indptr.tobytes(), (3, 3)
+            )
+
+    def test_prediction_from_concatenated_buffer(self):
+        buffer = self.data.tobytes() + self.indices.tobytes() + self.indptr.tobytes()
+        result = prediction_from_concatenated_buffer(buffer, (3, 3), 6)
+        np.testing.assert_array_equal(
+            result.toarray(), [[1, 0, 2], [0, 0, 3], [4, 5, 6]]
+        )
+
+    def test_prediction_from_concatenated_buffer_wrong_size(self):
+        buffer = self.data.tobytes() + self.indices.tobytes() + self.indptr.tobytes()
+        with self.assertRaises(InvalidPredictionException):
+            prediction_from_concatenated_buffer(buffer, (3, 3), 5)
+
+
+class TestPredictionFromNpz(unittest.TestCase):
+    def test_prediction_from_save_npz(self):
+        matrix = csr_matrix(np.array([[1.0, 0, 2.0], [0, 0, 3.0]]))
+        buffer = io.BytesIO()
+        save_npz(buffer, matrix)
+        result = prediction_from_npz(buffer.getvalue())
+        np.testing.assert_array_equal(result.toarray(), matrix.toarray())
+
+    def test_prediction_from_savez(self):
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            data=np.array([1.0, 2.0]),
+            indices=np.array([1, 0]),
+            indptr=np.array([0, 1, 2]),
+            shape=np.array([2, 2]),
+        )
+        result = prediction_from_npz(buffer.getvalue())
+        np.testing.assert_array_equal(result.toarray(), [[0, 1], [2, 0]])
+
+    def test_prediction_from_npz_missing_arrays(self):
+        buffer = io.BytesIO()
+        np.savez(buffer, data=np.array([1.0]))
+        with self.assertRaises(InvalidPredictionException) as context:
+            prediction_from_npz(buffer.getvalue())
+        self.assertIn("indices, indptr, shape", context.exception.message)
+
+    def test_prediction_from_npz_invalid_file(self):
+        with self.assertRaises(InvalidPredictionException):
+            prediction_from_npz(b"not an npz file")
+
+
+class TestPredictionFromCoordinates(unittest.TestCase):
+    def test_prediction_from_coordinates_inferred_shape(self):
+        result = prediction_from_coordinates(
+            np.array([0, 2]), np.array([1, 3]), np.array([0.5, 1.0]), None
+        )
+        self.assertEqual(result.shape, (3, 4))
+        self.assertEqual(result[2, 3], 1.0)
+
+    def test_prediction_from_coordinates_out_of_bounds(self):
+        with self.assertRaises(InvalidPredictionException):
+            prediction_from_coordinates(
+                np.array([0, 2]), np.array([1, 3]), np.array([0.5, 1.0]), (2, 4)
+            )
+
+    def test_prediction_from_arrow_without_pyarrow(self):
+        original = prediction_utils.pyarrow
+        prediction_utils.pyarrow = None
+        try:
+            with self.assertRaises(InvalidPredictionException) as context:
+                prediction_from_arrow(b"", None)
+            self.assertEqual(context.exception.status_code, 415)
+        finally:
+            prediction_utils.pyarrow = original
+
+    @unittest.skipIf(prediction_utils.pyarrow is None, "pyarrow is not installed")
+    def test_prediction_from_arrow(self):
+        import pyarrow
+
+        table = pyarrow.table({"uid": [0, 1], "iid": [2, 0], "score": [0.5, 1.5]})
+        sink = pyarrow.BufferOutputStream()
+        with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        result = prediction_from_arrow(sink.getvalue().to_pybytes(), (2, 3))
+        np.testing.assert_array_equal(result.toarray(), [[0, 0, 0.5], [1.5, 0, 0]])
+
+
+class TestParseShape(unittest.TestCase):
+    def test_parse_shape(self):
+        self.assertEqual(parse_shape("3, 4"), (3, 4))
+        self.assertIsNone(parse_shape(None))
+
+    def test_parse_shape_invalid(self):
+        for shape in ("3", "a,b", "3,-1", "1,2,3"):
+            with self.assertRaises(InvalidPredictionException):
+                parse_shape(shape)
+
+
+class TestPredictionFrameFromColumns(unittest.TestCase):
+    def setUp(self):
+        self.columns = {
+            "interactionid": [10, 11],
+            "uid": [1, 2],
+            "iid": [3, 4],
+            "ts": [100, 200],
+        }
+
+    def test_prediction_frame_from_columns(self):
+        result = prediction_frame_from_columns(self.columns)
+        self.assertEqual(list(result.columns), list(PREDICTION_COLUMNS))
+        self.assertEqual(result["uid"].tolist(), [1, 2])
+        self.assertEqual(result["uid"].dtype, np.int64)
+
+    def test_prediction_frame_from_columns_default_interaction_ids(self):
+        del self.columns["interactionid"]
+        result = prediction_frame_from_columns(self.columns)
+        self.assertEqual(result["interactionid"].tolist(), [0, 1])
+
+    def test_prediction_frame_from_columns_missing_column(self):
+        del self.columns["ts"]
+        with self.assertRaises(InvalidPredictionException) as context:
+            prediction_frame_from_columns(self.columns)
+        self.assertEqual(context.exception.message, "Missing columns: ts")
+
+    def test_prediction_frame_from_columns_non_integer(self):
+        for values in ([1, 2.5], [1, "2"], [1, None], [True, False]):
+            self.columns["iid"] = values
+            with self.assertRaises(InvalidPredictionException):
+                prediction_frame_from_columns(self.columns)
+
+    def test_prediction_frame_from_columns_length_mismatch(self):
+        self.columns["uid"] = [1]
+        with self.assertRaises(InvalidPredictionException):
+            prediction_frame_from_columns(self.columns)
+
+    def test_prediction_frame_from_columns_negative_id(self):
+        self.columns["uid"] = [1, -1]
+        with self.assertRaises(InvalidPredictionException):
+            prediction_frame_from_columns(self.columns)
+
+    def test_prediction_frame_from_columns_not_object(self):
+        with self.assertRaises(InvalidPredictionException):
+            prediction_frame_from_columns([{"uid": 1}])
+
+
+class TestPredictionFromTopK(unittest.TestCase):
+    def test_prediction_from_top_k_rank_scores(self):
+        result = prediction_from_top_k(
+            {"user_ids": [0, 2], "item_indices": [[3, 1], [0, -1]], "shape": [3, 4]}
+        )
+        self.assertEqual(result.shape, (3, 4))
+        np.testing.assert_array_equal(
+            result.toarray(), [[0, 1, 0, 2], [0, 0, 0, 0], [2, 0, 0, 0]]
+        )
+
+    def test_prediction_from_top_k_scores(self):
+        result = prediction_from_top_k(
+            {"user_ids": [1], "item_indices": [[2, 0]], "scores": [[0.9, 0.4]]}
+        )
+        self.assertEqual(result.shape, (2, 3))
+        np.testing.assert_array_equal(result.toarray(), [[0, 0, 0], [0.4, 0, 0.9]])
+
+    def test_prediction_from_top_k_ragged(self):
+        with self.assertRaises(InvalidPredictionException):
+            prediction_from_top_k({"user_ids": [0, 1], "item_indices": [[1, 2], [3]]})
+
+    def test_prediction_from_top_k_row_mismatch(self):
+        with self.assertRaises(InvalidPredictionException):
+            prediction_from_top_k({"user_ids": [0, 1], "item_indices": [[1, 2]]})
+
+    def test_prediction_from_top_k_rows_without_user_ids(self):
+        with self.assertRaises(InvalidPredictionException) as context:
+            prediction_from_top_k({"user_ids": [], "item_indices": [[1, 2]]})
+        self.assertEqual(
+            context.exception.message, "item_indices must have one row per user id"
+        )
+
+    def test_prediction_from_top_k_scores_shape_mismatch(self):
+        with self.assertRaises(InvalidPredictionException):
+            prediction_from_top_k(
+                {"user_ids": [0], "item_indices": [[1, 2]], "scores": [[1.0]]}
+            )
+
+    def test_prediction_from_top_k_duplicate_item(self):
+        with self.assertRaises(InvalidPredictionException) as context:
+            prediction_from_top_k({"user_ids": [0], "item_indices": [[1, 1]]})
+        self.assertEqual(
+            context.exception.message, "Each item may only be predicted once per user"
+        )
+
+    def test_prediction_from_top_k_invalid_padding(self):
+        with self.assertRaises(InvalidPredictionException):
+            prediction_from_top_k({"user_ids": [0], "item_indices": [[1, -2]]})
+
+    def test_prediction_from_top_k_missing_field(self):
+        with self.assertRaises(InvalidPredictionException):
+            prediction_from_top_k({"user_ids": [0]})
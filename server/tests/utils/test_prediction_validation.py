@@ -0,0 +1,175 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+from uuid import UUID
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from streamsightv2.matrix import InteractionMatrix
+
+from src.utils.prediction_utils import InvalidPredictionException
+from src.utils.prediction_validation import (
+    build_validation_index,
+    clear_validation_indexes,
+    get_validation_index,
+    prevalidate_prediction,
+    set_validation_index,
+    validate_loaded_prediction,
+    validate_prediction,
+)
+
+STREAM_ID = UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+OTHER_STREAM_ID = UUID("87654321-4321-8765-4321-876543218765")
+
+
+def create_streamer(run_step=1, ignore_unknown_user=False, ignore_unknown_item=False):
+    return SimpleNamespace(
+        _run_step=run_step,
+        _ground_truth_data_cache=SimpleNamespace(shape=(3, 4)),
+        ignore_unknown_user=ignore_unknown_user,
+        ignore_unknown_item=ignore_unknown_item,
+        user_item_base=SimpleNamespace(
+            global_user_ids={2, 0, 1}, global_item_ids={0, 1, 2, 3}
+        ),
+    )
+
+
+def create_prediction_im(user_ids, item_ids):
+    df = pd.DataFrame(
+        {
+            "interactionid": range(len(user_ids)),
+            "uid": user_ids,
+            "iid": item_ids,
+            "ts": [10] * len(user_ids),
+        }
+    )
+    return InteractionMatrix(df, item_ix="iid", user_ix="uid", timestamp_ix="ts")
+
+
+class TestPredictionValidation(unittest.TestCase):
+    def setUp(self):
+        clear_validation_indexes()
+        self.addCleanup(clear_validation_indexes)
+
+    def test_build_validation_index(self):
+        index = build_validation_index(create_streamer())
+
+        assert index.window == 1
+        assert index.ground_truth_shape == (3, 4)
+        np.testing.assert_array_equal(index.user_ids, [0, 1, 2])
+        np.testing.assert_array_equal(index.item_ids, [0, 1, 2, 3])
+
+    def test_validate_prediction_im(self):
+        index = build_validation_index(create_streamer())
+
+        validate_prediction(index, create_prediction_im([0, 2], [1, 3]))
+
+    def test_validate_prediction_im_unknown_user(self):
+        index = build_validation_index(create_streamer())
+
+        with self.assertRaises(InvalidPredictionException) as context:
+            validate_prediction(index, create_prediction_im([0, 7], [1, 3]))
+        assert context.exception.status_code == 400
+        assert (
+            context.exception.message
+            == "Prediction contains user ids unknown to the stream"
+        )
+
+    def test_validate_prediction_im_unknown_item(self):
+        index = build_validation_index(create_streamer())
+
+        with self.assertRaises(InvalidPredictionException) as context:
+            validate_prediction(index, create_prediction_im([0, 1], [1, 9]))
+        assert (
+            context.exception.message
+            == "Prediction contains item ids unknown to the stream"
+        )
+
+    def test_validate_prediction_im_unknown_ids_not_ignored(self):
+        index = build_validation_index(
+            create_streamer(ignore_unknown_user=True, ignore_unknown_item=True)
+        )
+
+        with self.assertRaises(InvalidPredictionException) as context:
+            validate_prediction(index, create_prediction_im([0, 7], [1, 9]))
+        assert context.exception.status_code == 400
+        assert (
+            context.exception.message
+            == "Prediction contains user ids unknown to the stream"
+        )
+
+    def test_validate_prediction_csr_too_few_rows(self):
+        index = build_validation_index(create_streamer())
+
+        with self.assertRaises(InvalidPredictionException) as context:
+            validate_prediction(index, csr_matrix((2, 4)))
+        assert (
+            context.exception.message == "Prediction must have at least 3 rows, got 2"
+        )
+
+    def test_validate_prediction_csr_too_few_rows_ignored(self):
+        index = build_validation_index(create_streamer(ignore_unknown_user=True))
+
+        validate_prediction(index, csr_matrix((2, 4)))
+
+    def test_validate_prediction_csr_item_out_of_range(self):
+        index = build_validation_index(create_streamer())
+        prediction = csr_matrix(
+            (np.array([1.0]), np.array([5]), np.array([0, 1, 1, 1])), shape=(3, 6)
+        )
+
+        with self.assertRaises(InvalidPredictionException) as context:
+            validate_prediction(index, prediction)
+        assert (
+            context.exception.message
+            == "Prediction contains item ids beyond the 4 items of the current window"
+        )
+
+    def test_prevalidate_prediction_without_index(self):
+        # nothing is known about the window yet, the check happens after load
+        prevalidate_prediction(STREAM_ID, 1, csr_matrix((1, 4)))
+
+    def test_prevalidate_prediction_stale_window(self):
+        set_validation_index(STREAM_ID, build_validation_index(create_streamer()))
+
+        prevalidate_prediction(STREAM_ID, 2, csr_matrix((1, 4)))
+        assert get_validation_index(STREAM_ID, 2) is None
+
+    def test_prevalidate_prediction_rejected(self):
+        set_validation_index(STREAM_ID, build_validation_index(create_streamer()))
+
+        with self.assertRaises(InvalidPredictionException):
+            prevalidate_prediction(STREAM_ID, 1, csr_matrix((1, 4)))
+
+    def test_validate_loaded_prediction_caches_index(self):
+        streamer = create_streamer()
+
+        validate_loaded_prediction(STREAM_ID, streamer, csr_matrix((3, 4)))
+
+        index = get_validation_index(STREAM_ID, 1)
+        assert index is not None
+        with patch(
+            "src.utils.prediction_validation.build_validation_index"
+        ) as mock_build:
+            validate_loaded_prediction(STREAM_ID, streamer, csr_matrix((3, 4)))
+            mock_build.assert_not_called()
+
+    def test_validate_loaded_prediction_replaces_stale_index(self):
+        validate_loaded_prediction(STREAM_ID, create_streamer(), csr_matrix((3, 4)))
+
+        validate_loaded_prediction(
+            STREAM_ID, create_streamer(run_step=2), csr_matrix((3, 4))
+        )
+
+        assert get_validation_index(STREAM_ID, 1) is None
+        assert get_validation_index(STREAM_ID, 2) is not None
+
+    def test_set_validation_index_evicts_least_recently_used(self):
+        index = build_validation_index(create_streamer())
+        with patch("src.utils.prediction_validation.VALIDATION_INDEX_CACHE_SIZE", 1):
+            set_validation_index(STREAM_ID, index)
+            set_validation_index(OTHER_STREAM_ID, index)
+
+        assert get_validation_index(STREAM_ID, 1) is None
+        assert get_validation_index(OTHER_STREAM_ID, 1) is index
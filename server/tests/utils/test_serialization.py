@@ -0,0 +1,63 @@
+import json
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.utils.serialization import (
+    dataframe_to_json_records,
+    encode_json,
+    encode_json_object,
+    json_bytes_response,
+)
+
+
+class TestSerialization(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame(
+            {
+                "uid": np.array([0, 1], dtype=np.int32),
+                "ts": np.array([10, 11], dtype=np.int64),
+                "score": [0.123456789012, np.nan],
+            }
+        )
+
+    def test_encode_json(self):
+        self.assertEqual(encode_json({"a": [1, 2]}), b'{"a":[1,2]}')
+
+    def test_dataframe_to_json_records(self):
+        self.assertEqual(
+            json.loads(dataframe_to_json_records(self.df)),
+            [
+                {"uid": 0, "ts": 10, "score": 0.123456789012},
+                {"uid": 1, "ts": 11, "score": None},
+            ],
+        )
+
+    def test_dataframe_to_json_records_float_round_trip(self):
+        df = pd.DataFrame({"uid": [0], "score": [0.1 + 0.2]})
+
+        records = json.loads(dataframe_to_json_records(df))
+
+        self.assertEqual(records, [{"uid": 0, "score": 0.1 + 0.2}])
+        self.assertEqual(records[0]["score"], 0.30000000000000004)
+
+    def test_encode_json_object(self):
+        payload = encode_json_object({"shape": [2, 3]}, {"data": self.df[["uid"]]})
+        self.assertEqual(
+            json.loads(payload), {"shape": [2, 3], "data": [{"uid": 0}, {"uid": 1}]}
+        )
+
+    def test_encode_json_object_empty_frame(self):
+        payload = encode_json_object({}, {"data": pd.DataFrame(columns=["uid"])})
+        self.assertEqual(json.loads(payload), {"data": []})
+
+    def test_encode_json_object_payloads(self):
+        payload = encode_json_object({"state": "READY"}, payloads={"data": b'{"a":1}'})
+        self.assertEqual(json.loads(payload), {"state": "READY", "data": {"a": 1}})
+
+    def test_json_bytes_response(self):
+        response = json_bytes_response(b"{}", headers={"ETag": '"1"'})
+        self.assertEqual(response.body, b"{}")
+        self.assertEqual(response.media_type, "application/json")
+        self.assertEqual(response.headers["ETag"], '"1"')
@@ -0,0 +1,65 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from src.utils.single_flight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_calls_share_one_result(self):
+        single_flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def load():
+            calls.append(1)
+            started.set()
+            release.wait(timeout=5)
+            return object()
+
+        results = []
+        leader = threading.Thread(
+            target=lambda: results.append(single_flight.do("stream", load))
+        )
+        leader.start()
+        self.assertTrue(started.wait(timeout=5))
+        followers = [
+            threading.Thread(
+                target=lambda: results.append(single_flight.do("stream", load))
+            )
+            for _ in range(3)
+        ]
+        for follower in followers:
+            follower.start()
+        # give the followers time to join the running call
+        time.sleep(0.1)
+        release.set()
+        for thread in [leader, *followers]:
+            thread.join(timeout=5)
+
+        self.assertEqual(len(results), 4)
+        self.assertEqual(len(set(map(id, results))), 1)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(single_flight.get_in_flight_count(), 0)
+
+    def test_sequential_calls_not_cached(self):
+        single_flight = SingleFlight()
+        fn = MagicMock(side_effect=["first", "second"])
+
+        self.assertEqual(single_flight.do("stream", fn), "first")
+        self.assertEqual(single_flight.do("stream", fn), "second")
+
+    def test_different_keys_not_shared(self):
+        single_flight = SingleFlight()
+
+        self.assertEqual(single_flight.do(("stream", 1), lambda: 1), 1)
+        self.assertEqual(single_flight.do(("stream", 2), lambda: 2), 2)
+
+    def test_error_raised(self):
+        single_flight = SingleFlight()
+
+        with self.assertRaises(ValueError):
+            single_flight.do("stream", MagicMock(side_effect=ValueError("not found")))
+        self.assertEqual(single_flight.get_in_flight_count(), 0)
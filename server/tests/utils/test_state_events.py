@@ -0,0 +1,119 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from uuid import UUID
+
+from src.utils.state_events import (
+    STATE_EVENTS_CHANNEL,
+    AlgorithmStatesEvent,
+    decode_event,
+    encode_event,
+    get_algorithm_states,
+    get_subscriber_count,
+    publish_algorithm_states,
+    publish_local,
+    subscribe,
+    unsubscribe,
+)
+
+STREAM_ID = UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+STATES = {"ItemKNN_12345678-1234-5678-1234-567812345678": "READY"}
+
+
+class TestStateEvents(unittest.TestCase):
+    def test_get_algorithm_states(self):
+        evaluator_streamer = MagicMock()
+        evaluator_streamer.get_all_algorithm_status.return_value = {
+            "ItemKNN_12345678-1234-5678-1234-567812345678": SimpleNamespace(
+                name="READY"
+            )
+        }
+
+        self.assertEqual(get_algorithm_states(evaluator_streamer), STATES)
+
+    def test_encode_decode_event(self):
+        event = AlgorithmStatesEvent(STREAM_ID, 3, STATES)
+
+        self.assertEqual(decode_event(encode_event(event)), event)
+
+    def test_publish_local(self):
+        async def receive():
+            queue = subscribe(STREAM_ID)
+            try:
+                # published from another thread, as update_stream does
+                await asyncio.to_thread(
+                    publish_local, AlgorithmStatesEvent(STREAM_ID, 1, STATES)
+                )
+                return await asyncio.wait_for(queue.get(), timeout=1)
+            finally:
+                unsubscribe(STREAM_ID, queue)
+
+        event = asyncio.run(receive())
+        self.assertEqual(event, AlgorithmStatesEvent(STREAM_ID, 1, STATES))
+        self.assertEqual(get_subscriber_count(STREAM_ID), 0)
+
+    def test_publish_local_other_stream(self):
+        async def receive():
+            queue = subscribe(STREAM_ID)
+            try:
+                publish_local(
+                    AlgorithmStatesEvent(
+                        UUID("87654321-4321-8765-4321-876543218765"), 1, STATES
+                    )
+                )
+                await asyncio.sleep(0)
+                return queue.empty()
+            finally:
+                unsubscribe(STREAM_ID, queue)
+
+        self.assertTrue(asyncio.run(receive()))
+
+    def test_publish_algorithm_states_local(self):
+        with patch("src.utils.state_events.publish_local") as mock_publish_local, patch(
+            "src.utils.state_events.get_sql_connection"
+        ) as mock_get_sql_connection:
+            publish_algorithm_states(STREAM_ID, 2, STATES)
+
+            mock_publish_local.assert_called_once_with(
+                AlgorithmStatesEvent(STREAM_ID, 2, STATES)
+            )
+            mock_get_sql_connection.assert_not_called()
+
+    @patch("src.utils.state_events.STATE_EVENTS_LISTEN_NOTIFY", True)
+    def test_publish_algorithm_states_notify(self):
+        with patch("src.utils.state_events.publish_local") as mock_publish_local, patch(
+            "src.utils.state_events.get_sql_connection"
+        ) as mock_get_sql_connection:
+            publish_algorithm_states(STREAM_ID, 2, STATES)
+
+            connection = mock_get_sql_connection.return_value.begin.return_value
+            _, parameters = connection.__enter__.return_value.execute.call_args[0]
+            self.assertEqual(parameters["channel"], STATE_EVENTS_CHANNEL)
+            self.assertEqual(
+                decode_event(parameters["payload"]),
+                AlgorithmStatesEvent(STREAM_ID, 2, STATES),
+            )
+            # delivered to this process by the listener instead
+            mock_publish_local.assert_not_called()
+
+    @patch("src.utils.state_events.STATE_EVENTS_LISTEN_NOTIFY", True)
+    def test_publish_algorithm_states_notify_error(self):
+        with patch("src.utils.state_events.publish_local") as mock_publish_local, patch(
+            "src.utils.state_events.get_sql_connection",
+            side_effect=Exception("connection refused"),
+        ):
+            publish_algorithm_states(STREAM_ID, 2, STATES)
+
+            mock_publish_local.assert_called_once()
+
+    @patch("src.utils.state_events.STATE_EVENTS_LISTEN_NOTIFY", True)
+    @patch("src.utils.state_events.MAX_NOTIFY_PAYLOAD_BYTES", 10)
+    def test_publish_algorithm_states_payload_too_large(self):
+        with patch("src.utils.state_events.publish_local") as mock_publish_local, patch(
+            "src.utils.state_events.get_sql_connection"
+        ) as mock_get_sql_connection:
+            publish_algorithm_states(STREAM_ID, 2, STATES)
+
+            mock_publish_local.assert_called_once()
+            mock_get_sql_connection.assert_not_called()
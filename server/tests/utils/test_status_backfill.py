@@ -0,0 +1,67 @@
+import threading
+import unittest
+from unittest.mock import patch
+from uuid import UUID
+
+from src.utils import status_backfill
+from src.utils.db_utils import DatabaseErrorException
+from src.utils.status_backfill import (
+    run_stream_status_backfill,
+    start_stream_status_backfill,
+    stop_stream_status_backfill,
+)
+
+FIRST_STREAM_ID = UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+SECOND_STREAM_ID = UUID("436e4cb7-861b-4870-8c29-3ffc530711ef")
+
+
+class TestStreamStatusBackfill(unittest.TestCase):
+    def setUp(self):
+        patcher = patch(
+            "src.utils.status_backfill.STREAM_STATUS_BACKFILL_BATCH_SIZE", 2
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # set when a previous backfill was stopped
+        status_backfill._backfill_stop.clear()
+
+    def test_backfill_continues_after_last_batch(self):
+        with patch(
+            "src.utils.status_backfill.backfill_stream_statuses",
+            side_effect=[FIRST_STREAM_ID, SECOND_STREAM_ID, None],
+        ) as mock_backfill:
+            run_stream_status_backfill()
+
+            self.assertEqual(
+                [call.args for call in mock_backfill.call_args_list],
+                [(None, 2), (FIRST_STREAM_ID, 2), (SECOND_STREAM_ID, 2)],
+            )
+
+    def test_backfill_stops_on_database_error(self):
+        with patch(
+            "src.utils.status_backfill.backfill_stream_statuses",
+            side_effect=DatabaseErrorException("Error backfilling stream statuses"),
+        ) as mock_backfill:
+            run_stream_status_backfill()
+
+            mock_backfill.assert_called_once_with(None, 2)
+
+    def test_backfill_runs_in_background_until_stopped(self):
+        started = threading.Event()
+        thread_names = []
+
+        def backfill(after, batch_size):
+            thread_names.append(threading.current_thread().name)
+            started.set()
+            return FIRST_STREAM_ID
+
+        with patch(
+            "src.utils.status_backfill.backfill_stream_statuses",
+            side_effect=backfill,
+        ):
+            start_stream_status_backfill()
+            self.assertTrue(started.wait(5))
+            stop_stream_status_backfill()
+            self.assertIsNone(status_backfill._backfill_thread)
+
+        self.assertEqual(set(thread_names), {"stream-status-backfill"})
@@ -0,0 +1,198 @@
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+from uuid import UUID
+
+from src.utils import stream_actor
+from src.utils.stream_actor import (
+    QueuedStreamOperation,
+    apply_batch,
+    run_stream_operation,
+)
+from src.utils.stream_leases import StreamLease, replay_stream_operations
+
+STREAM_ID = UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+
+
+class FakeStreamer:
+    def __init__(self):
+        self.algorithms = []
+
+    def register_algorithm(self, name):
+        self.algorithms.append(name)
+        if name == "invalid":
+            raise ValueError("invalid algorithm name")
+        return len(self.algorithms)
+
+
+def create_lease():
+    operations = {}
+
+    def record_operation(lease, method, arguments):
+        operations[len(operations) + 1] = (method, arguments)
+        return len(operations)
+
+    def discard_operations(lease, operation_ids):
+        for operation_id in operation_ids:
+            operations.pop(operation_id)
+        evaluator_streamer = FakeStreamer()
+        replay_stream_operations(evaluator_streamer, operations.values())
+        return evaluator_streamer
+
+    return StreamLease(
+        STREAM_ID,
+        UUID("12345678-1234-5678-1234-567812345678"),
+        datetime.now(timezone.utc) + timedelta(seconds=60),
+        "test",
+        FakeStreamer(),
+        record_operation,
+        discard_operations,
+    )
+
+
+def register(name):
+    return lambda evaluator_streamer: evaluator_streamer.register_algorithm(name)
+
+
+def get_queued_count(stream_id):
+    with stream_actor._queues_lock:
+        return len(stream_actor._queues.get(stream_id, []))
+
+
+class TestRunStreamOperation(unittest.TestCase):
+    def test_single_operation(self):
+        streamer = FakeStreamer()
+        load_stream = MagicMock(return_value=streamer)
+        persist_stream = MagicMock(return_value=4)
+
+        result = run_stream_operation(
+            STREAM_ID, register("a"), load_stream, persist_stream
+        )
+
+        self.assertEqual(result, (1, 4))
+        load_stream.assert_called_once_with(STREAM_ID)
+        persist_stream.assert_called_once_with(STREAM_ID, streamer)
+        self.assertNotIn(STREAM_ID, stream_actor._queues)
+
+    def test_queued_operations_share_one_load_and_persist(self):
+        loading = threading.Event()
+        release_load = threading.Event()
+        streamers = []
+
+        def load_stream(stream_id):
+            streamers.append(FakeStreamer())
+            if len(streamers) == 1:
+                loading.set()
+                release_load.wait(timeout=5)
+            return streamers[-1]
+
+        persist_stream = MagicMock(side_effect=[1, 2])
+        results = {}
+
+        def run(name):
+            results[name] = run_stream_operation(
+                STREAM_ID, register(name), load_stream, persist_stream
+            )
+
+        threads = [threading.Thread(target=run, args=("first",))]
+        threads[0].start()
+        self.assertTrue(loading.wait(timeout=5))
+        for name in ("b", "c", "d"):
+            threads.append(threading.Thread(target=run, args=(name,)))
+            threads[-1].start()
+        # hold the first batch until the others are queued behind it
+        deadline = time.monotonic() + 5
+        while get_queued_count(STREAM_ID) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        release_load.set()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        self.assertEqual(results["first"], (1, 1))
+        self.assertEqual(len(streamers), 2)
+        self.assertEqual(sorted(streamers[1].algorithms), ["b", "c", "d"])
+        self.assertEqual(persist_stream.call_count, 2)
+        self.assertEqual({results[name][1] for name in ("b", "c", "d")}, {2})
+        self.assertNotIn(STREAM_ID, stream_actor._queues)
+
+    def test_failed_operation_only_persists_nothing(self):
+        load_stream = MagicMock(return_value=FakeStreamer())
+        persist_stream = MagicMock()
+
+        with self.assertRaises(ValueError):
+            run_stream_operation(
+                STREAM_ID, register("invalid"), load_stream, persist_stream
+            )
+
+        persist_stream.assert_not_called()
+        load_stream.assert_called_once()
+
+    def test_persist_error_raised(self):
+        with self.assertRaises(Exception) as context:
+            run_stream_operation(
+                STREAM_ID,
+                register("a"),
+                MagicMock(return_value=FakeStreamer()),
+                MagicMock(side_effect=Exception("database down")),
+            )
+
+        self.assertEqual(str(context.exception), "database down")
+        self.assertNotIn(STREAM_ID, stream_actor._queues)
+
+
+class TestApplyBatch(unittest.TestCase):
+    def test_failed_operation_is_rolled_back(self):
+        streamers = []
+
+        def load_stream(stream_id):
+            streamers.append(FakeStreamer())
+            return streamers[-1]
+
+        persist_stream = MagicMock(return_value=5)
+        batch = [
+            QueuedStreamOperation(register(name)) for name in ("a", "invalid", "b")
+        ]
+
+        apply_batch(STREAM_ID, batch, load_stream, persist_stream)
+
+        self.assertIsInstance(batch[1].error, ValueError)
+        self.assertEqual([queued.result for queued in batch], [1, None, 2])
+        self.assertEqual([queued.version for queued in batch], [5, None, 5])
+        # reloaded and the operation before the failed one applied again
+        self.assertEqual(streamers[-1].algorithms, ["a", "b"])
+        persist_stream.assert_called_once_with(STREAM_ID, streamers[-1])
+
+    def test_failed_operation_on_leased_streamer_is_rolled_back(self):
+        lease = create_lease()
+        load_stream = MagicMock(return_value=lease.streamer)
+        persist_stream = MagicMock(return_value=5)
+
+        def register_twice(evaluator_streamer):
+            evaluator_streamer.register_algorithm("b")
+            evaluator_streamer.register_algorithm("invalid")
+
+        batch = [
+            QueuedStreamOperation(operation)
+            for operation in (register("a"), register_twice, register("c"))
+        ]
+
+        apply_batch(STREAM_ID, batch, load_stream, persist_stream)
+
+        self.assertIsInstance(batch[1].error, ValueError)
+        self.assertEqual([queued.version for queued in batch], [5, None, 5])
+        # every change of the failed operation is dropped without a reload
+        load_stream.assert_called_once_with(STREAM_ID)
+        self.assertEqual(lease.evaluator_streamer.algorithms, ["a", "c"])
+        self.assertEqual(len(lease.operation_ids), 2)
+        persist_stream.assert_called_once_with(STREAM_ID, lease.streamer)
+
+    def test_load_error_fails_batch(self):
+        batch = [QueuedStreamOperation(register(name)) for name in ("a", "b")]
+
+        apply_batch(
+            STREAM_ID, batch, MagicMock(side_effect=Exception("not found")), MagicMock()
+        )
+
+        self.assertEqual([str(queued.error) for queued in batch], ["not found"] * 2)
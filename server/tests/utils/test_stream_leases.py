@@ -0,0 +1,218 @@
+import pickle
+import threading
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+from uuid import UUID
+
+from src.utils.stream_leases import (
+    LeasedEvaluatorStreamer,
+    StreamLease,
+    add_stream_lease,
+    as_utc,
+    get_stream_lease,
+    get_stream_leases,
+    remove_stream_lease,
+    replay_stream_operations,
+)
+
+STREAM_ID = UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+LEASE_ID = UUID("12345678-1234-5678-1234-567812345678")
+
+
+class FakeStreamer:
+    def __init__(self):
+        self.calls = []
+        self._run_step = 0
+
+    def register_algorithm(self, name):
+        self.calls.append(("register_algorithm", name))
+        return name
+
+    def get_data(self, algorithm_id):
+        if algorithm_id == "unknown":
+            raise ValueError("unknown algorithm")
+        self._run_step += 1
+        self.calls.append(("get_data", algorithm_id))
+
+    def get_unlabeled_data(self, algorithm_id):
+        self.calls.append(("get_unlabeled_data", algorithm_id))
+
+    def metric_results(self, level):
+        self.calls.append(("metric_results", level))
+
+    def get_algorithm_state(self, algorithm_id):
+        return self._run_step
+
+    def submit_prediction(self, algorithm_id, prediction):
+        self.calls.append(("submit_prediction", algorithm_id))
+        if prediction is None:
+            raise ValueError("invalid prediction")
+
+
+class OperationLog:
+    """Write-ahead log kept in memory, rebuilding the streamer like the database"""
+
+    def __init__(self):
+        self.operations = {}
+
+    def record(self, lease, method, arguments):
+        operation_id = len(self.operations) + 1
+        self.operations[operation_id] = (method, arguments)
+        return operation_id
+
+    def discard(self, lease, operation_ids):
+        for operation_id in operation_ids:
+            del self.operations[operation_id]
+        evaluator_streamer = FakeStreamer()
+        replay_stream_operations(evaluator_streamer, self.operations.values())
+        return evaluator_streamer
+
+
+def create_lease(record_operation, expires_in=60, discard_operations=None):
+    return StreamLease(
+        STREAM_ID,
+        LEASE_ID,
+        datetime.now(timezone.utc) + timedelta(seconds=expires_in),
+        "test",
+        FakeStreamer(),
+        record_operation,
+        discard_operations or MagicMock(),
+    )
+
+
+class TestStreamLease(unittest.TestCase):
+    def test_operations_recorded_before_applied(self):
+        events = []
+
+        def record_operation(lease, method, arguments):
+            events.append(("record", method, pickle.loads(arguments)))
+
+        lease = create_lease(record_operation)
+        streamer = lease.streamer
+        self.assertIsInstance(streamer, LeasedEvaluatorStreamer)
+
+        self.assertEqual(streamer.register_algorithm("ItemKNN"), "ItemKNN")
+        streamer.get_data(algorithm_id="ItemKNN")
+
+        self.assertEqual(
+            events,
+            [
+                ("record", "register_algorithm", (("ItemKNN",), {})),
+                ("record", "get_data", ((), {"algorithm_id": "ItemKNN"})),
+            ],
+        )
+        self.assertEqual(
+            lease.evaluator_streamer.calls,
+            [("register_algorithm", "ItemKNN"), ("get_data", "ItemKNN")],
+        )
+        # reads go to the streamer without being recorded
+        self.assertEqual(streamer._run_step, 1)
+
+    def test_persisted_operations_are_recorded(self):
+        record_operation = MagicMock()
+        lease = create_lease(record_operation)
+
+        lease.streamer.get_unlabeled_data("ItemKNN")
+        lease.streamer.metric_results("micro")
+
+        self.assertEqual(
+            [call.args[1] for call in record_operation.call_args_list],
+            ["get_unlabeled_data", "metric_results"],
+        )
+
+    def test_reads_hold_lease_lock(self):
+        lease = create_lease(MagicMock())
+        results = []
+
+        def read():
+            results.append(lease.streamer.get_algorithm_state("ItemKNN"))
+            results.append(lease.streamer._run_step)
+
+        with lease.lock:
+            reader = threading.Thread(target=read)
+            reader.start()
+            reader.join(0.1)
+            # the read waits until the lease is no longer in use
+            self.assertTrue(reader.is_alive())
+            lease.evaluator_streamer._run_step = 2
+        reader.join(5)
+
+        self.assertEqual(results, [2, 2])
+
+    def test_failed_operation_rolled_back(self):
+        log = OperationLog()
+        lease = create_lease(log.record, discard_operations=log.discard)
+        lease.streamer.register_algorithm("ItemKNN")
+
+        with self.assertRaises(ValueError):
+            lease.streamer.submit_prediction("ItemKNN", None)
+
+        # the partial change is dropped from the streamer and from the log
+        self.assertEqual(
+            lease.evaluator_streamer.calls, [("register_algorithm", "ItemKNN")]
+        )
+        self.assertEqual(
+            [method for method, _ in log.operations.values()], ["register_algorithm"]
+        )
+        self.assertEqual(lease.operation_ids, [1])
+
+    def test_rollback_failure_ends_lease(self):
+        lease = create_lease(
+            MagicMock(return_value=1),
+            discard_operations=MagicMock(side_effect=Exception("database down")),
+        )
+
+        with self.assertRaises(Exception):
+            lease.streamer.submit_prediction("ItemKNN", None)
+
+        self.assertTrue(lease.is_released)
+
+    def test_operation_not_applied_when_recording_fails(self):
+        lease = create_lease(MagicMock(side_effect=Exception("database down")))
+
+        with self.assertRaises(Exception):
+            lease.streamer.register_algorithm("ItemKNN")
+
+        self.assertEqual(lease.evaluator_streamer.calls, [])
+
+    def test_is_expired(self):
+        self.assertFalse(create_lease(MagicMock()).is_expired())
+        self.assertTrue(create_lease(MagicMock(), expires_in=-1).is_expired())
+
+    def test_as_utc(self):
+        naive = datetime(2024, 1, 1, 12, 0)
+        self.assertEqual(as_utc(naive), naive.replace(tzinfo=timezone.utc))
+
+
+class TestReplayStreamOperations(unittest.TestCase):
+    def test_replay_matches_leased_streamer(self):
+        log = OperationLog()
+        lease = create_lease(log.record, discard_operations=log.discard)
+        lease.streamer.register_algorithm("ItemKNN")
+        lease.streamer.get_data("ItemKNN")
+        with self.assertRaises(ValueError):
+            lease.streamer.get_data("unknown")
+
+        replayed = FakeStreamer()
+        replay_stream_operations(replayed, log.operations.values())
+
+        self.assertEqual(replayed.calls, lease.evaluator_streamer.calls)
+        self.assertEqual(replayed._run_step, 1)
+
+
+class TestStreamLeaseRegistry(unittest.TestCase):
+    def test_add_and_remove(self):
+        lease = create_lease(MagicMock())
+        add_stream_lease(lease)
+        self.assertIs(get_stream_lease(STREAM_ID), lease)
+        self.assertIn(lease, get_stream_leases())
+
+        # a newer lease of the stream is not removed by an older one
+        newer = create_lease(MagicMock())
+        add_stream_lease(newer)
+        remove_stream_lease(lease)
+        self.assertIs(get_stream_lease(STREAM_ID), newer)
+
+        remove_stream_lease(newer)
+        self.assertIsNone(get_stream_lease(STREAM_ID))
@@ -0,0 +1,40 @@
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+
+from src.utils.stream_settings import get_streamer_settings
+
+
+class TestGetStreamerSettings(unittest.TestCase):
+    def create_evaluator_streamer(self, sliding_window: bool):
+        setting = SimpleNamespace(
+            _sliding_window_setting=sliding_window,
+            n_seq_data=np.int64(3),
+            window_size=25920000,
+            t=1406851200,
+            top_K=10,
+            num_split=4,
+        )
+        metric_entries = [SimpleNamespace(name="PrecisionK")]
+        return SimpleNamespace(setting=setting, metric_entries=metric_entries)
+
+    def test_sliding_window_settings(self):
+        settings = get_streamer_settings(self.create_evaluator_streamer(True))
+
+        self.assertEqual(
+            settings,
+            {
+                "n_seq_data": 3,
+                "window_size": 25920000,
+                "background_t": 1406851200,
+                "top_k": 10,
+                "metrics": ["PrecisionK"],
+                "number_of_windows": 4,
+            },
+        )
+        # stored in a JSON column
+        self.assertIs(type(settings["n_seq_data"]), int)
+
+    def test_other_settings(self):
+        self.assertIsNone(get_streamer_settings(self.create_evaluator_streamer(False)))
@@ -0,0 +1,54 @@
+import asyncio
+import threading
+import unittest
+from unittest.mock import patch
+
+from src.utils import submission_executor
+from src.utils.submission_executor import (
+    SubmissionQueueFullException,
+    get_pending_submissions,
+    run_submission,
+    shutdown_submission_executor,
+)
+
+
+class TestRunSubmission(unittest.TestCase):
+    def tearDown(self):
+        shutdown_submission_executor()
+
+    def test_run_submission_off_event_loop(self):
+        async def submit():
+            return await run_submission(threading.current_thread)
+
+        thread = asyncio.run(submit())
+        self.assertNotEqual(thread, threading.main_thread())
+        self.assertTrue(thread.name.startswith("prediction-submission"))
+        self.assertEqual(get_pending_submissions(), 0)
+
+    def test_run_submission_propagates_exception(self):
+        def fail():
+            raise ValueError("evaluation failed")
+
+        with self.assertRaises(ValueError):
+            asyncio.run(run_submission(fail))
+        self.assertEqual(get_pending_submissions(), 0)
+
+    def test_run_submission_queue_full(self):
+        release = threading.Event()
+
+        async def submit():
+            blocked = asyncio.ensure_future(run_submission(release.wait))
+            await asyncio.sleep(0)
+            try:
+                with self.assertRaises(SubmissionQueueFullException) as context:
+                    await run_submission(lambda: None)
+                self.assertEqual(context.exception.status_code, 429)
+            finally:
+                release.set()
+                await blocked
+
+        with patch.object(
+            submission_executor, "SUBMISSION_MAX_WORKERS", 1
+        ), patch.object(submission_executor, "SUBMISSION_MAX_QUEUE", 0):
+            asyncio.run(submit())
+        self.assertEqual(get_pending_submissions(), 0)
@@ -0,0 +1,241 @@
+import pickle
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from uuid import UUID
+
+from src.utils.prediction_utils import InvalidPredictionException
+from src.utils.submission_worker import (
+    evaluate_pending_submissions,
+    resume_pending_submissions,
+    schedule_stream_evaluation,
+    shutdown_drain_executor,
+)
+
+STREAM_ID = UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+
+
+def create_submission(submission_id: str, algorithm_id: str, prediction):
+    return SimpleNamespace(
+        submission_id=UUID(submission_id),
+        algorithm_id=UUID(algorithm_id),
+        prediction=pickle.dumps(prediction),
+    )
+
+
+def create_streamer(state: str = "PREDICTED"):
+    streamer = MagicMock()
+    streamer.get_algorithm_state.return_value.name = state
+    return streamer
+
+
+class TestEvaluatePendingSubmissions(unittest.TestCase):
+    def setUp(self):
+        self.submissions = [
+            create_submission(
+                "00000000-0000-0000-0000-000000000001",
+                "12345678-1234-5678-1234-567812345678",
+                [1, 2],
+            ),
+            create_submission(
+                "00000000-0000-0000-0000-000000000002",
+                "87654321-4321-8765-4321-876543218765",
+                [3],
+            ),
+        ]
+        patchers = {
+            "claim": patch(
+                "src.utils.submission_worker.claim_pending_prediction_submissions",
+                return_value=self.submissions,
+            ),
+            "validate": patch("src.utils.submission_worker.validate_loaded_prediction"),
+            "complete": patch(
+                "src.utils.submission_worker.complete_prediction_submissions",
+                return_value=2,
+            ),
+            "mark": patch("src.utils.submission_worker.mark_prediction_submissions"),
+            "release": patch(
+                "src.utils.submission_worker.release_prediction_submissions"
+            ),
+        }
+        self.mocks = {}
+        for name, patcher in patchers.items():
+            self.mocks[name] = patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_evaluate_pending_submissions_batches_stream_update(self):
+        mock_streamer = create_streamer()
+        with patch(
+            "src.utils.submission_worker.get_stream_from_db",
+            return_value=mock_streamer,
+        ) as mock_get_from_db:
+            result = evaluate_pending_submissions(STREAM_ID)
+
+            self.assertEqual(result, 2)
+            mock_get_from_db.assert_called_once_with(STREAM_ID)
+            self.assertEqual(mock_streamer.submit_prediction.call_count, 2)
+            mock_streamer.submit_prediction.assert_any_call(
+                UUID("12345678-1234-5678-1234-567812345678"), [1, 2]
+            )
+            self.assertEqual(self.mocks["validate"].call_count, 2)
+            self.mocks["complete"].assert_called_once_with(
+                STREAM_ID,
+                mock_streamer,
+                {
+                    UUID("00000000-0000-0000-0000-000000000001"): None,
+                    UUID("00000000-0000-0000-0000-000000000002"): None,
+                },
+            )
+            self.mocks["mark"].assert_not_called()
+            self.mocks["release"].assert_not_called()
+
+    def test_evaluate_pending_submissions_failed_submission_not_persisted(self):
+        failing_streamer = create_streamer()
+        failing_streamer.submit_prediction.side_effect = [
+            None,
+            Exception("bad shape"),
+        ]
+        mock_streamer = create_streamer()
+        with patch(
+            "src.utils.submission_worker.get_stream_from_db",
+            side_effect=[failing_streamer, mock_streamer],
+        ) as mock_get_from_db:
+            self.assertEqual(evaluate_pending_submissions(STREAM_ID), 2)
+
+            # the partly changed streamer is dropped and the rest applied again
+            self.assertEqual(mock_get_from_db.call_count, 2)
+            mock_streamer.submit_prediction.assert_called_once_with(
+                UUID("12345678-1234-5678-1234-567812345678"), [1, 2]
+            )
+            self.mocks["complete"].assert_called_once_with(
+                STREAM_ID,
+                mock_streamer,
+                {
+                    UUID("00000000-0000-0000-0000-000000000001"): None,
+                    UUID("00000000-0000-0000-0000-000000000002"): "bad shape",
+                },
+            )
+
+    def test_evaluate_pending_submissions_invalid_prediction(self):
+        self.mocks["validate"].side_effect = [
+            None,
+            InvalidPredictionException(message="unknown user ids"),
+        ]
+        mock_streamer = create_streamer()
+        with patch(
+            "src.utils.submission_worker.get_stream_from_db",
+            return_value=mock_streamer,
+        ) as mock_get_from_db:
+            evaluate_pending_submissions(STREAM_ID)
+
+            mock_get_from_db.assert_called_once_with(STREAM_ID)
+            mock_streamer.submit_prediction.assert_called_once()
+            self.mocks["complete"].assert_called_once_with(
+                STREAM_ID,
+                mock_streamer,
+                {
+                    UUID("00000000-0000-0000-0000-000000000001"): None,
+                    UUID("00000000-0000-0000-0000-000000000002"): "unknown user ids",
+                },
+            )
+
+    def test_evaluate_pending_submissions_prediction_not_accepted(self):
+        with patch(
+            "src.utils.submission_worker.get_stream_from_db",
+            side_effect=lambda stream_id: create_streamer("READY"),
+        ):
+            evaluate_pending_submissions(STREAM_ID)
+
+            # nothing was applied, so only the submissions are marked
+            self.mocks["complete"].assert_not_called()
+            self.mocks["mark"].assert_called_once_with(
+                {
+                    UUID("00000000-0000-0000-0000-000000000001"): (
+                        "Prediction was not accepted: READY"
+                    ),
+                    UUID("00000000-0000-0000-0000-000000000002"): (
+                        "Prediction was not accepted: READY"
+                    ),
+                }
+            )
+
+    def test_evaluate_pending_submissions_error_releases_claims(self):
+        with patch(
+            "src.utils.submission_worker.get_stream_from_db",
+            side_effect=Exception("database down"),
+        ):
+            with self.assertRaises(Exception):
+                evaluate_pending_submissions(STREAM_ID)
+
+            self.mocks["complete"].assert_not_called()
+            self.mocks["release"].assert_called_once_with(
+                [
+                    UUID("00000000-0000-0000-0000-000000000001"),
+                    UUID("00000000-0000-0000-0000-000000000002"),
+                ]
+            )
+
+    def test_evaluate_pending_submissions_nothing_pending(self):
+        self.mocks["claim"].return_value = []
+        with patch(
+            "src.utils.submission_worker.get_stream_from_db"
+        ) as mock_get_from_db:
+            self.assertEqual(evaluate_pending_submissions(STREAM_ID), 0)
+            mock_get_from_db.assert_not_called()
+            self.mocks["complete"].assert_not_called()
+
+
+class TestResumePendingSubmissions(unittest.TestCase):
+    def test_resume_releases_stale_claims_first(self):
+        calls = []
+        with patch(
+            "src.utils.submission_worker.release_stale_submission_claims",
+            side_effect=lambda: calls.append("release"),
+        ), patch(
+            "src.utils.submission_worker.get_streams_with_pending_submissions",
+            side_effect=lambda: calls.append("pending") or [STREAM_ID],
+        ), patch(
+            "src.utils.submission_worker.schedule_stream_evaluation"
+        ) as mock_schedule:
+            resume_pending_submissions()
+
+        self.assertEqual(calls, ["release", "pending"])
+        mock_schedule.assert_called_once_with(STREAM_ID)
+
+
+class TestScheduleStreamEvaluation(unittest.TestCase):
+    def tearDown(self):
+        shutdown_drain_executor()
+
+    def test_schedule_stream_evaluation_coalesces_requests(self):
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+        thread_names = []
+
+        def evaluate(stream_id):
+            calls.append(stream_id)
+            thread_names.append(threading.current_thread().name)
+            if len(calls) == 1:
+                started.set()
+                release.wait(5)
+            return 0
+
+        with patch(
+            "src.utils.submission_worker.evaluate_pending_submissions",
+            side_effect=evaluate,
+        ):
+            schedule_stream_evaluation(STREAM_ID)
+            self.assertTrue(started.wait(5))
+            # both arrive while the first pass runs and share a single rerun
+            schedule_stream_evaluation(STREAM_ID)
+            schedule_stream_evaluation(STREAM_ID)
+            release.set()
+            shutdown_drain_executor()
+
+        self.assertEqual(calls, [STREAM_ID, STREAM_ID])
+        # drains never take the slots of the request submission pool
+        self.assertTrue(
+            all(name.startswith("prediction-drain") for name in thread_names)
+        )
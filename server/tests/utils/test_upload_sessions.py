@@ -0,0 +1,139 @@
+import unittest
+from unittest.mock import patch
+from uuid import UUID
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from src.utils import upload_sessions
+from src.utils.prediction_utils import InvalidPredictionException
+from src.utils.upload_sessions import (
+    UploadSessionNotFoundException,
+    clear_upload_sessions,
+    create_upload_session,
+    delete_upload_session,
+    get_upload_session,
+)
+
+STREAM_ID = UUID("336e4cb7-861b-4870-8c29-3ffc530711ef")
+ALGORITHM_ID = UUID("12345678-1234-5678-1234-567812345678")
+
+
+def encode_rows(matrix: csr_matrix, start: int, end: int) -> bytes:
+    begin, finish = matrix.indptr[start], matrix.indptr[end]
+    return (
+        matrix.data[begin:finish].astype("<f8").tobytes()
+        + matrix.indices[begin:finish].astype("<i4").tobytes()
+        + matrix.indptr[start : end + 1].astype("<i4").tobytes()
+    )
+
+
+class TestPredictionUploadSession(unittest.TestCase):
+    def setUp(self):
+        clear_upload_sessions()
+        self.matrix = csr_matrix(
+            np.array(
+                [[1.0, 0, 2.0], [0, 0, 3.0], [0, 0, 0], [4.0, 5.0, 6.0]],
+            )
+        )
+        self.session = create_upload_session(
+            STREAM_ID, ALGORITHM_ID, (4, 3), self.matrix.nnz
+        )
+
+    def tearDown(self):
+        clear_upload_sessions()
+
+    def test_upload_out_of_order(self):
+        self.session.write_rows(2, 4, encode_rows(self.matrix, 2, 4))
+        self.assertEqual(self.session.get_missing_ranges(), [(0, 2)])
+        self.session.write_rows(0, 2, encode_rows(self.matrix, 0, 2))
+        self.assertEqual(self.session.get_missing_ranges(), [])
+
+        result = self.session.build_matrix()
+        np.testing.assert_array_equal(result.toarray(), self.matrix.toarray())
+
+    def test_upload_reupload_range(self):
+        self.session.write_rows(0, 4, encode_rows(self.matrix, 0, 4))
+        self.session.write_rows(1, 3, encode_rows(self.matrix, 1, 3))
+        result = self.session.build_matrix()
+        np.testing.assert_array_equal(result.toarray(), self.matrix.toarray())
+
+    def test_missing_ranges(self):
+        self.session.write_rows(1, 2, encode_rows(self.matrix, 1, 2))
+        self.assertEqual(self.session.get_missing_ranges(), [(0, 1), (2, 4)])
+
+    def test_build_matrix_incomplete(self):
+        self.session.write_rows(0, 2, encode_rows(self.matrix, 0, 2))
+        with self.assertRaises(InvalidPredictionException) as context:
+            self.session.build_matrix()
+        self.assertEqual(context.exception.status_code, 409)
+
+    def test_write_rows_conflicting_indptr(self):
+        self.session.write_rows(0, 2, encode_rows(self.matrix, 0, 2))
+        chunk = (
+            np.array([6.0], dtype="<f8").tobytes()
+            + np.array([2], dtype="<i4").tobytes()
+            + np.array([4, 4, 5], dtype="<i4").tobytes()
+        )
+        with self.assertRaises(InvalidPredictionException) as context:
+            self.session.write_rows(2, 4, chunk)
+        self.assertEqual(context.exception.status_code, 409)
+
+    def test_write_rows_invalid_range(self):
+        with self.assertRaises(InvalidPredictionException):
+            self.session.write_rows(3, 5, encode_rows(self.matrix, 3, 4))
+
+    def test_write_rows_size_mismatch(self):
+        with self.assertRaises(InvalidPredictionException):
+            self.session.write_rows(0, 2, encode_rows(self.matrix, 0, 2)[1:])
+
+    def test_write_rows_index_out_of_bounds(self):
+        chunk = (
+            np.array([1.0], dtype="<f8").tobytes()
+            + np.array([3], dtype="<i4").tobytes()
+            + np.array([0, 1], dtype="<i4").tobytes()
+        )
+        with self.assertRaises(InvalidPredictionException):
+            self.session.write_rows(0, 1, chunk)
+
+
+class TestUploadSessionRegistry(unittest.TestCase):
+    def setUp(self):
+        clear_upload_sessions()
+
+    def tearDown(self):
+        clear_upload_sessions()
+
+    def test_get_upload_session(self):
+        session = create_upload_session(STREAM_ID, ALGORITHM_ID, (2, 2), 1)
+        self.assertIs(
+            get_upload_session(session.upload_id, STREAM_ID, ALGORITHM_ID), session
+        )
+
+    def test_get_upload_session_other_algorithm(self):
+        session = create_upload_session(STREAM_ID, ALGORITHM_ID, (2, 2), 1)
+        with self.assertRaises(UploadSessionNotFoundException):
+            get_upload_session(session.upload_id, STREAM_ID, STREAM_ID)
+
+    def test_delete_upload_session(self):
+        session = create_upload_session(STREAM_ID, ALGORITHM_ID, (2, 2), 1)
+        delete_upload_session(session.upload_id)
+        with self.assertRaises(UploadSessionNotFoundException):
+            get_upload_session(session.upload_id, STREAM_ID, ALGORITHM_ID)
+
+    def test_create_upload_session_expires_idle_sessions(self):
+        session = create_upload_session(STREAM_ID, ALGORITHM_ID, (2, 2), 1)
+        with patch.object(upload_sessions, "UPLOAD_SESSION_TTL_SECONDS", -1):
+            with self.assertRaises(UploadSessionNotFoundException):
+                get_upload_session(session.upload_id, STREAM_ID, ALGORITHM_ID)
+
+    def test_create_upload_session_capacity(self):
+        with patch.object(upload_sessions, "UPLOAD_SESSION_MAX_BYTES", 100):
+            with self.assertRaises(InvalidPredictionException) as context:
+                create_upload_session(STREAM_ID, ALGORITHM_ID, (100, 100), 100)
+        self.assertEqual(context.exception.status_code, 503)
+
+    def test_create_upload_session_invalid(self):
+        for shape, nnz in (((2, 2), 5), ((2, 2), -1), ((-1, 2), 0)):
+            with self.assertRaises(InvalidPredictionException):
+                create_upload_session(STREAM_ID, ALGORITHM_ID, shape, nnz)